@@ -0,0 +1,145 @@
+"""
+Startup lifecycle of the heavy components (corpora, embedding model, warm-up).
+
+Components register a ``load`` function and, optionally, a ``check`` that
+verifies their artifacts exist. At startup every check runs first, so a missing
+artifact stops the server with a clear error instead of failing on the first
+request; the loads then run in the background (blocking ones in the thread-pool
+executor, coroutines on the event loop) while the server already answers
+``/health``. ``/ready`` reports the state and load time of every component, plus
+any ``details`` it provides.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class ArtifactsMissingError(RuntimeError):
+    pass
+
+
+class Component:
+    def __init__(
+        self,
+        name: str,
+        load: Callable[[], None],
+        check: Optional[Callable[[], List[str]]] = None,
+        after: Optional[str] = None,
+        details: Optional[Callable[[], Dict]] = None,
+    ):
+        self.name = name
+        self.load = load
+        self.check = check
+        self.after = after
+        self.details = details
+        self.status = PENDING
+        self.seconds = None
+        self.error = None
+
+    def snapshot(self) -> Dict:
+        snapshot = {
+            "status": self.status,
+            "seconds": round(self.seconds, 3) if self.seconds is not None else None,
+            "error": self.error,
+        }
+        if self.details is not None:
+            snapshot["details"] = self.details()
+        return snapshot
+
+
+class Lifecycle:
+    def __init__(self):
+        self.components = OrderedDict()
+        self._tasks = {}
+        self._started_at = None
+
+    def add(
+        self,
+        name: str,
+        load: Callable[[], None],
+        check: Optional[Callable[[], List[str]]] = None,
+        after: Optional[str] = None,
+        details: Optional[Callable[[], Dict]] = None,
+    ):
+        """
+        Register a component; ``load`` is a blocking function or a coroutine function, ``check``
+        returns missing artifacts, ``after`` names a component to wait for and ``details`` adds
+        component-specific state to ``/ready``.
+        """
+        self.components[name] = Component(name, load, check, after, details)
+
+    def check(self):
+        """Raise ``ArtifactsMissingError`` listing every missing artifact of every component."""
+        missing = []
+        for component in self.components.values():
+            if component.check is not None:
+                missing.extend(f"{component.name}: {path}" for path in component.check())
+        if missing:
+            raise ArtifactsMissingError("Missing artifacts, cannot start:\n  " + "\n  ".join(missing))
+
+    def start(self):
+        """Start loading every component in the background (call from a startup event)."""
+        self._started_at = time.perf_counter()
+        for component in self.components.values():
+            self._tasks[component.name] = asyncio.ensure_future(self._load(component))
+
+    async def _load(self, component: Component):
+        if component.after is not None:
+            await self._tasks[component.after]
+            if self.components[component.after].status != READY:
+                component.status = FAILED
+                component.error = f"dependency '{component.after}' failed"
+                return
+
+        component.status = LOADING
+        started = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(component.load):
+                await component.load()
+            else:
+                await asyncio.get_running_loop().run_in_executor(None, component.load)
+        except Exception as e:
+            component.status = FAILED
+            component.error = f"{type(e).__name__}: {e}"
+            print(f"Startup component '{component.name}' failed: {component.error}")
+            return
+        finally:
+            component.seconds = time.perf_counter() - started
+        component.status = READY
+        print(f"Startup component '{component.name}' ready in {component.seconds:.2f}s")
+
+    @property
+    def ready(self) -> bool:
+        return all(component.status == READY for component in self.components.values())
+
+    def status(self) -> Dict:
+        statuses = [component.status for component in self.components.values()]
+        if FAILED in statuses:
+            overall = FAILED
+        elif all(s == READY for s in statuses):
+            overall = READY
+        else:
+            overall = LOADING
+        return {
+            "status": overall,
+            "components": {name: component.snapshot() for name, component in self.components.items()},
+        }
+
+
+lifecycle = Lifecycle()
+
+
+async def require_ready():
+    """Dependency for endpoints that need every component loaded."""
+    if not lifecycle.ready:
+        state = lifecycle.status()["status"]
+        detail = "Service failed to start, see /ready" if state == FAILED else "Service is warming up, retry shortly"
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=detail)
@@ -1,10 +1,14 @@
 import os
 import motor.motor_asyncio
+from pymongo import ReturnDocument, UpdateOne
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import asyncio
+import base64
+import json
 import uuid
 import ssl
+from collections import Counter
 
 from ..models.models import User, UserInDB, Conversation, Message
 
@@ -24,6 +28,11 @@ db = client[DB_NAME]
 # Collections
 users_collection = db["users"]
 conversations_collection = db["conversations"]
+messages_collection = db["messages"]
+stats_collection = db["stats"]
+semantic_cache_collection = db["semantic_cache"]
+schema_migrations_collection = db["schema_migrations"]
+pending_turns_collection = db["pending_turns"]  # write-behind turns not stored yet (see db/write_behind.py)
 
 # Async function to test MongoDB connection; call this in your FastAPI startup event
 async def connect_to_mongo():
@@ -101,6 +110,64 @@ async def get_all_users() -> List[User]:
 
 
 # Conversation database operations
+#
+# Messages live in their own collection, one document per message keyed by
+# (conversation_id, seq); a conversation document only holds its title,
+# timestamps, message_count and a preview of its last message. Conversations
+# created before migration 5 may still carry an embedded "messages" array until
+# the migration has moved it (see db/migrations.py).
+CONVERSATION_PREVIEW_CHARS = 80
+DEFAULT_CONVERSATION_TITLE = "New Conversation"
+MESSAGE_FIELDS = {"_id": 0, "id": 1, "role": 1, "content": 1, "feedback": 1}
+
+def message_preview(content: str) -> str:
+    return content[:CONVERSATION_PREVIEW_CHARS]
+
+def message_doc(message: Dict, conversation_id: str, user_id: str, seq: int, created_at: str) -> Dict:
+    return {
+        "id": message["id"],
+        "conversation_id": conversation_id,
+        "user_id": user_id,
+        "seq": seq,
+        "role": message["role"],
+        "content": message["content"],
+        "feedback": message.get("feedback"),
+        "has_feedback": message.get("feedback") is not None,  # indexed for /admin/questions
+        "created_at": created_at
+    }
+
+def message_docs(messages: List[Dict], conversation_id: str, user_id: str, first_seq: int, created_at: str) -> List[Dict]:
+    """
+    Message documents numbered from ``first_seq``. Every assistant message records
+    the question it answers (``question_id``: the last user message before it), so
+    question/answer pairs can be read without scanning conversations.
+    """
+    docs = []
+    question_id = None
+    for i, message in enumerate(messages):
+        doc = message_doc(message, conversation_id, user_id, first_seq + i, created_at)
+        if doc["role"] == "user":
+            question_id = doc["id"]
+        elif doc["role"] == "assistant" and question_id is not None:
+            doc["question_id"] = question_id
+            question_id = None
+        docs.append(doc)
+    return docs
+
+def conversation_from_doc(doc: Dict, messages: List[Dict]) -> Conversation:
+    return Conversation(
+        id=doc["id"],
+        title=doc["title"],
+        messages=[Message(**m) for m in messages],
+        created_at=datetime.fromisoformat(doc["created_at"]),
+        updated_at=datetime.fromisoformat(doc["updated_at"]),
+        user_id=doc["user_id"]
+    )
+
+async def get_conversation_messages(conversation_id: str) -> List[Dict]:
+    cursor = messages_collection.find({"conversation_id": conversation_id}, MESSAGE_FIELDS).sort("seq", 1)
+    return await cursor.to_list(length=None)
+
 async def create_conversation(user_id: str, title: str, messages: List[Dict] = None) -> Conversation:
     if messages is None:
         messages = []
@@ -111,13 +178,22 @@ async def create_conversation(user_id: str, title: str, messages: List[Dict] = N
     conversation_doc = {
         "id": conversation_id,
         "title": title,
-        "messages": messages,
+        "message_count": len(messages),
+        "preview": message_preview(messages[-1]["content"]) if messages else "",
         "created_at": now.isoformat(),
         "updated_at": now.isoformat(),
         "user_id": user_id
     }
     
-    await conversations_collection.insert_one(conversation_doc)
+    docs = message_docs(messages, conversation_id, user_id, 0, now.isoformat())
+    writes = [
+        conversations_collection.insert_one(conversation_doc),
+        inc_statistics(user_id, conversations=1, messages=len(messages), **message_counts(docs))
+    ]
+    if docs:
+        # Sequence numbers of a new conversation are known, so both inserts go out at once
+        writes.append(messages_collection.insert_many(docs))
+    await asyncio.gather(*writes)
     
     return Conversation(
         id=conversation_id,
@@ -133,50 +209,106 @@ async def get_conversation(conversation_id: str, user_id: Optional[str] = None)
     if user_id:
         query["user_id"] = user_id
     
-    doc = await conversations_collection.find_one(query)
+    doc = await conversations_collection.find_one(query, {"_id": 0})
     if not doc:
         return None
     
-    return Conversation(
-        id=doc["id"],
-        title=doc["title"],
-        messages=[Message(**m) for m in doc["messages"]],
-        created_at=datetime.fromisoformat(doc["created_at"]),
-        updated_at=datetime.fromisoformat(doc["updated_at"]),
-        user_id=doc["user_id"]
-    )
+    messages = doc.get("messages")  # not migrated yet
+    if messages is None:
+        messages = await get_conversation_messages(conversation_id)
+    return conversation_from_doc(doc, messages)
 
-async def get_user_conversations(user_id: str) -> List[Conversation]:
-    cursor = conversations_collection.find({"user_id": user_id})
-    conversations = []
-    
-    async for doc in cursor:
-        conversations.append(Conversation(
-            id=doc["id"],
-            title=doc["title"],
-            messages=[Message(**m) for m in doc["messages"]],
-            created_at=datetime.fromisoformat(doc["created_at"]),
-            updated_at=datetime.fromisoformat(doc["updated_at"]),
-            user_id=doc["user_id"]
-        ))
+async def get_message_page(conversation_id: str, user_id: str, after: int, limit: int) -> Optional[Tuple[List[Dict], Optional[int]]]:
+    """
+    Messages of a conversation with a sequence number above ``after``, oldest first.
+    Returns the messages and the ``after`` value of the next page, or None if the
+    conversation does not exist.
+    """
+    cursor = messages_collection.find(
+        {"conversation_id": conversation_id, "user_id": user_id, "seq": {"$gt": after}},
+        {**MESSAGE_FIELDS, "seq": 1, "created_at": 1}
+    ).sort("seq", 1).limit(limit + 1)
+    messages = await cursor.to_list(length=limit + 1)
+    if not messages and not await conversations_collection.find_one({"id": conversation_id, "user_id": user_id}, {"_id": 1}):
+        return None
     
-    return conversations
+    next_after = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_after = messages[-1]["seq"]
+    return messages, next_after
 
-async def get_all_conversations() -> List[Conversation]:
-    cursor = conversations_collection.find({})
-    conversations = []
-    
-    async for doc in cursor:
-        conversations.append(Conversation(
-            id=doc["id"],
-            title=doc["title"],
-            messages=[Message(**m) for m in doc["messages"]],
-            created_at=datetime.fromisoformat(doc["created_at"]),
-            updated_at=datetime.fromisoformat(doc["updated_at"]),
-            user_id=doc["user_id"]
-        ))
+def encode_page_cursor(updated_at: str, conversation_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([updated_at, conversation_id]).encode("utf-8")).decode("ascii")
+
+def decode_page_cursor(cursor: str) -> Tuple[str, str]:
+    """Inverse of encode_page_cursor; raises ValueError on a malformed cursor."""
+    try:
+        updated_at, conversation_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(updated_at), str(conversation_id)
+
+async def get_user_conversation_summaries(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a user's conversations, most recently updated first, without their
+    messages. Returns the summaries and the cursor of the next page, if any.
+    """
+    match = {"user_id": user_id}
+    if cursor:
+        updated_at, conversation_id = decode_page_cursor(cursor)
+        match["$or"] = [
+            {"updated_at": {"$lt": updated_at}},
+            {"updated_at": updated_at, "id": {"$lt": conversation_id}},
+        ]
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"updated_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {
+            "$project": {
+                "_id": 0,
+                "id": 1,
+                "title": 1,
+                "created_at": 1,
+                "updated_at": 1,
+                # Conversations not migrated yet still have their messages embedded
+                "message_count": {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+                "preview": {
+                    "$ifNull": [
+                        "$preview",
+                        {
+                            "$substrCP": [
+                                {"$ifNull": [{"$arrayElemAt": ["$messages.content", -1]}, ""]},
+                                0,
+                                CONVERSATION_PREVIEW_CHARS
+                            ]
+                        }
+                    ]
+                }
+            }
+        }
+    ]
+    summaries = await conversations_collection.aggregate(pipeline).to_list(length=limit + 1)
+
+    next_cursor = None
+    if len(summaries) > limit:
+        summaries = summaries[:limit]
+        next_cursor = encode_page_cursor(summaries[-1]["updated_at"], summaries[-1]["id"])
+    return summaries, next_cursor
+
+async def replace_conversation_messages(conversation_id: str, user_id: str, messages: List[Dict], old_count: int):
+    """Replace every message of a conversation (PUT /conversations/{id} with messages)."""
+    now = datetime.utcnow().isoformat()
+    old_counted = await counted_messages(conversation_id)
+    docs = message_docs(messages, conversation_id, user_id, 0, now)
+    await messages_collection.delete_many({"conversation_id": conversation_id})
+    if docs:
+        await messages_collection.insert_many(docs)
     
-    return conversations
+    counts = Counter(message_counts(docs))
+    counts.subtract(message_counts(old_counted))
+    await inc_statistics(user_id, messages=len(messages) - old_count, **counts)
 
 async def update_conversation(conversation_id: str, update_data: Dict[str, Any], user_id: Optional[str] = None) -> Optional[Conversation]:
     query = {"id": conversation_id}
@@ -184,11 +316,18 @@ async def update_conversation(conversation_id: str, update_data: Dict[str, Any],
         query["user_id"] = user_id
     
     update_data["updated_at"] = datetime.utcnow().isoformat()
+    messages = update_data.pop("messages", None)
+    if messages is not None:
+        update_data["message_count"] = len(messages)
+        update_data["preview"] = message_preview(messages[-1]["content"]) if messages else ""
     
-    await conversations_collection.update_one(
+    doc = await conversations_collection.find_one_and_update(
         query,
-        {"$set": update_data}
+        {"$set": update_data, "$unset": {"messages": ""}} if messages is not None else {"$set": update_data},
+        projection={"_id": 0, "user_id": 1, "message_count": 1}
     )
+    if doc and messages is not None:
+        await replace_conversation_messages(conversation_id, doc["user_id"], messages, doc.get("message_count", 0))
     
     return await get_conversation(conversation_id, user_id)
 
@@ -197,140 +336,294 @@ async def delete_conversation(conversation_id: str, user_id: Optional[str] = Non
     if user_id:
         query["user_id"] = user_id
     
-    result = await conversations_collection.delete_one(query)
-    return result.deleted_count > 0
+    doc = await conversations_collection.find_one_and_delete(query, projection={"_id": 0, "user_id": 1, "message_count": 1})
+    if doc is None:
+        return False
+    
+    old_counted = await counted_messages(conversation_id)
+    await asyncio.gather(
+        messages_collection.delete_many({"conversation_id": conversation_id}),
+        inc_statistics(
+            doc["user_id"],
+            conversations=-1,
+            messages=-doc.get("message_count", 0),
+            **{k: -v for k, v in message_counts(old_counted).items()}
+        )
+    )
+    return True
 
-async def add_messages_to_conversation(conversation_id: str, messages: List[Dict], user_id: Optional[str] = None) -> Optional[Conversation]:
+async def reserve_messages(
+    conversation_id: str,
+    messages: List[Dict],
+    user_id: Optional[str] = None,
+    title: Optional[str] = None,
+    upsert: bool = False
+) -> Optional[Tuple[List[Dict], Dict[str, int]]]:
+    """
+    Account for new messages in one update of the conversation (count, preview,
+    updated_at) and return their message documents, numbered from the reserved
+    sequence numbers, with the statistics counters they add for their user (for
+    ``inc_statistics``; a caller that gives up on the insert calls
+    ``release_messages``); None if the conversation does not exist. ``title`` replaces the title only while it
+    is still DEFAULT_CONVERSATION_TITLE. With ``upsert`` (requires ``user_id``) a
+    missing conversation is created.
+    """
     query = {"id": conversation_id}
     if user_id:
         query["user_id"] = user_id
     
-    await conversations_collection.update_one(
+    now = datetime.utcnow().isoformat()
+    fields = {
+        "message_count": {"$add": [{"$ifNull": ["$message_count", 0]}, len(messages)]},
+        "updated_at": {"$literal": now},
+        "preview": {"$literal": message_preview(messages[-1]["content"])}
+    }
+    if title is not None:
+        current = {"$ifNull": ["$title", DEFAULT_CONVERSATION_TITLE]}
+        fields["title"] = {"$cond": [{"$eq": [current, DEFAULT_CONVERSATION_TITLE]}, {"$literal": title}, "$title"]}
+    if upsert:
+        fields["created_at"] = {"$ifNull": ["$created_at", {"$literal": now}]}
+    
+    doc = await conversations_collection.find_one_and_update(
         query,
-        {
-            "$push": {
-                "messages": {"$each": messages}
-            },
-            "$set": {"updated_at": datetime.utcnow().isoformat()}
-        }
+        [{"$set": fields}],
+        projection={"_id": 0, "user_id": 1, "message_count": 1, "created_at": 1},
+        upsert=upsert,
+        return_document=ReturnDocument.AFTER
     )
+    if doc is None:
+        return None
     
-    return await get_conversation(conversation_id, user_id)
-
-async def update_message_feedback(conversation_id: str, message_id: str, feedback: Dict, user_id: Optional[str] = None) -> bool:
-    query = {"id": conversation_id}
-    if user_id:
-        query["user_id"] = user_id
+    first_seq = doc["message_count"] - len(messages)
+    docs = message_docs(messages, conversation_id, doc["user_id"], first_seq, now)
     
-    conversation = await get_conversation(conversation_id, user_id)
-    if not conversation:
+    # Counted once per conversation update, so a retried message insert is not counted twice
+    created = upsert and doc.get("created_at") == now
+    return docs, {"conversations": int(created), "messages": len(messages), **message_counts(docs)}
+
+async def add_messages_to_conversation(
+    conversation_id: str,
+    messages: List[Dict],
+    user_id: Optional[str] = None,
+    title: Optional[str] = None
+) -> bool:
+    """Append messages without reading the conversation; False if it does not exist."""
+    # Reserve sequence numbers atomically, then insert only the new messages
+    reserved = await reserve_messages(conversation_id, messages, user_id, title)
+    if reserved is None:
         return False
     
-    messages = [m.dict() for m in conversation.messages]
-    message_found = False
-    
-    for msg in messages:
-        if msg["id"] == message_id:
-            msg["feedback"] = feedback
-            message_found = True
-            break
-    
-    if not message_found:
+    docs, counts = reserved
+    try:
+        await messages_collection.insert_many(docs)
+    except BaseException:
+        # A failed or cancelled insert gives its sequence numbers back, so it leaves no gap
+        await asyncio.shield(release_messages(conversation_id, docs))
+        raise
+    await inc_statistics(docs[0]["user_id"], **counts)
+    return True
+
+async def release_messages(conversation_id: str, docs: List[Dict]) -> bool:
+    """
+    Undo a reservation whose messages could not be inserted: delete any that were,
+    and take them off ``message_count`` while they are still the last ones reserved.
+    False if a later reservation already follows them (their numbers stay unused).
+    """
+    end = docs[0]["seq"] + len(docs)
+    try:
+        await messages_collection.delete_many({"conversation_id": conversation_id, "id": {"$in": [d["id"] for d in docs]}})
+        result = await conversations_collection.update_one(
+            {"id": conversation_id, "message_count": end},
+            {"$inc": {"message_count": -len(docs)}}
+        )
+    except Exception as e:
+        print(f"Could not release messages {docs[0]['seq']}-{end - 1} of conversation {conversation_id}: {e}")
+        return False
+    if result.modified_count == 0:
+        print(f"Messages {docs[0]['seq']}-{end - 1} of conversation {conversation_id} were not written; a later turn already follows them")
         return False
+    return True
+
+async def update_message_feedback(conversation_id: str, message_id: str, feedback: Dict, user_id: Optional[str] = None) -> bool:
+    """Set the feedback of one message with a single targeted update; False if no such message."""
+    query = {"conversation_id": conversation_id, "id": message_id}
+    if user_id:
+        query["user_id"] = user_id
     
-    await conversations_collection.update_one(
+    # The previous feedback comes back with the update, so the vote counters can move by the difference
+    now = datetime.utcnow().isoformat()
+    old = await messages_collection.find_one_and_update(
         query,
-        {
-            "$set": {
-                "messages": messages,
-                "updated_at": datetime.utcnow().isoformat()
-            }
-        }
+        {"$set": {"feedback": feedback, "has_feedback": feedback is not None}},
+        projection={"_id": 0, "user_id": 1, "feedback": 1, "question_id": 1}
     )
+    if old is not None:
+        await asyncio.gather(
+            conversations_collection.update_one({"id": conversation_id}, {"$set": {"updated_at": now}}),
+            inc_statistics(old["user_id"], **feedback_delta(old, feedback))
+        )
+        return True
     
+    # The conversation may not be migrated yet (POST /feedback does not wait for /ready)
+    query = {"id": conversation_id, "messages.id": message_id}
+    if user_id:
+        query["user_id"] = user_id
+    conversation = await conversations_collection.find_one_and_update(
+        query,
+        {"$set": {"messages.$.feedback": feedback, "updated_at": now}},
+        projection={"_id": 0, "user_id": 1, "messages": {"$elemMatch": {"id": message_id}}}
+    )
+    if conversation is None:
+        return False
+    await inc_statistics(conversation["user_id"], **feedback_delta(conversation["messages"][0], feedback))
     return True
 
+# Semantic answer cache operations
+async def get_semantic_cache_entries(corpus_version: str, limit: int) -> List[Dict]:
+    cursor = semantic_cache_collection.find(
+        {"corpus_version": corpus_version},
+        {"_id": 0, "id": 1, "vector": 1, "answer": 1, "created_at": 1}
+    ).sort("created_at", -1).limit(limit)
+    return await cursor.to_list(length=limit)
+
+async def save_semantic_cache_entry(entry: Dict) -> None:
+    await semantic_cache_collection.insert_one(entry)
+
+async def delete_semantic_cache_entries(entry_ids: List[str]) -> None:
+    await semantic_cache_collection.delete_many({"id": {"$in": entry_ids}})
+
+async def purge_semantic_cache(corpus_version: str, min_created_at: Optional[str] = None) -> int:
+    """Delete entries answered from another corpus version (and, optionally, expired ones)."""
+    query = {"corpus_version": {"$ne": corpus_version}}
+    if min_created_at:
+        query = {"$or": [query, {"created_at": {"$lt": min_created_at}}]}
+    result = await semantic_cache_collection.delete_many(query)
+    return result.deleted_count
+
 # Admin statistics operations
-async def get_user_statistics() -> List[Dict]:
-    pipeline = [
-        {
-            "$lookup": {
-                "from": "conversations",
-                "localField": "id",
-                "foreignField": "user_id",
-                "as": "conversations"
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "id": 1,
-                "username": 1,
-                "email": 1,
-                "role": 1,
-                "conversation_count": {"$size": "$conversations"},
-                "message_count": {
-                    "$reduce": {
-                        "input": "$conversations.messages",
-                        "initialValue": 0,
-                        "in": {"$add": ["$$value", {"$size": "$$this"}]}
-                    }
-                }
-            }
-        }
-    ]
+#
+# Counters are materialized in the stats collection: one "global" document and one
+# "user:<id>" document per user, each with conversations, messages, feedback,
+# quality/structure yes/no vote counts and answers (assistant messages linked to
+# their question, i.e. /admin/questions pairs), rated or not. Every write that changes them applies an
+# $inc, so the dashboard reads O(users) small documents instead of scanning every
+# conversation and message. rebuild_statistics() recomputes them from scratch
+# (migration 8 and ``python -m scripts.rebuild_stats``).
+STAT_FIELDS = [
+    "conversations", "messages", "feedback", "quality_yes", "quality_no", "structure_yes", "structure_no",
+    "answers", "rated_answers"
+]
+
+def message_counts(messages: List[Dict]) -> Dict[str, int]:
+    """Answer, feedback and vote counters contributed by these message documents."""
+    counts = Counter()
+    for message in messages:
+        answer = message.get("question_id") is not None
+        counts["answers"] += answer
+        feedback = message.get("feedback")
+        if not feedback:
+            continue
+        counts["feedback"] += 1
+        counts["rated_answers"] += answer
+        for rating, prefix in (("qualityRating", "quality"), ("structureRating", "structure")):
+            if feedback.get(rating) is True:
+                counts[f"{prefix}_yes"] += 1
+            elif feedback.get(rating) is False:
+                counts[f"{prefix}_no"] += 1
+    return dict(counts)
+
+def feedback_delta(old: Dict, feedback: Optional[Dict]) -> Dict[str, int]:
+    """Change of the message_counts counters when ``old`` gets ``feedback`` instead of its own."""
+    counts = Counter(message_counts([{"feedback": feedback, "question_id": old.get("question_id")}]))
+    counts.subtract(message_counts([old]))
+    return dict(counts)
+
+async def counted_messages(conversation_id: str) -> List[Dict]:
+    """The messages of a conversation that count towards message_counts (answers and rated messages)."""
+    return await messages_collection.find(
+        {"conversation_id": conversation_id, "$or": [{"feedback": {"$ne": None}}, {"question_id": {"$ne": None}}]},
+        {"_id": 0, "feedback": 1, "question_id": 1}
+    ).to_list(length=None)
+
+async def inc_statistics(user_id: str, **counts: int) -> None:
+    """Add to the global and the user's counters in one round trip."""
+    counts = {field: value for field, value in counts.items() if value}
+    if not counts:
+        return
+    await stats_collection.bulk_write([
+        UpdateOne({"_id": "global"}, {"$inc": counts}, upsert=True),
+        UpdateOne({"_id": f"user:{user_id}"}, {"$inc": counts, "$set": {"user_id": user_id}}, upsert=True)
+    ], ordered=False)
+
+async def rebuild_statistics() -> Dict:
+    """Recompute every counter from the conversations and messages; returns the global counters."""
+    per_user = {}
     
-    cursor = users_collection.aggregate(pipeline)
-    stats = []
+    def counters(user_id):
+        return per_user.setdefault(user_id, dict.fromkeys(STAT_FIELDS, 0))
     
-    async for doc in cursor:
-        stats.append(doc)
+    async for doc in conversations_collection.aggregate([
+        {"$group": {"_id": "$user_id", "conversations": {"$sum": 1}}}
+    ]):
+        counters(doc["_id"])["conversations"] = doc["conversations"]
     
-    return stats
-
-async def get_feedback_statistics() -> Dict:
-    pipeline = [
-        {"$unwind": "$messages"},
-        {"$match": {"messages.feedback": {"$ne": None}}},
+    is_rating = lambda field, value: {"$sum": {"$cond": [{"$eq": [field, value]}, 1, 0]}}
+    async for doc in messages_collection.aggregate([
         {
             "$group": {
-                "_id": None,
-                "total_count": {"$sum": 1},
-                "quality_yes": {"$sum": {"$cond": [{"$eq": ["$messages.feedback.qualityRating", True]}, 1, 0]}},
-                "quality_no": {"$sum": {"$cond": [{"$eq": ["$messages.feedback.qualityRating", False]}, 1, 0]}},
-                "structure_yes": {"$sum": {"$cond": [{"$eq": ["$messages.feedback.structureRating", True]}, 1, 0]}},
-                "structure_no": {"$sum": {"$cond": [{"$eq": ["$messages.feedback.structureRating", False]}, 1, 0]}}
-            }
-        },
-        {
-            "$project": {
-                "_id": 0,
-                "total_count": 1,
-                "quality_yes": 1,
-                "quality_no": 1,
-                "structure_yes": 1,
-                "structure_no": 1
+                "_id": "$user_id",
+                "messages": {"$sum": 1},
+                "feedback": {"$sum": {"$cond": [{"$ifNull": ["$feedback", False]}, 1, 0]}},
+                "quality_yes": is_rating("$feedback.qualityRating", True),
+                "quality_no": is_rating("$feedback.qualityRating", False),
+                "structure_yes": is_rating("$feedback.structureRating", True),
+                "structure_no": is_rating("$feedback.structureRating", False),
+                "answers": {"$sum": {"$cond": [{"$ifNull": ["$question_id", False]}, 1, 0]}},
+                "rated_answers": {
+                    "$sum": {"$cond": [{"$and": [{"$ifNull": ["$question_id", False]}, {"$ifNull": ["$feedback", False]}]}, 1, 0]}
+                }
             }
         }
+    ]):
+        counters(doc["_id"]).update({field: doc[field] for field in STAT_FIELDS if field != "conversations"})
+    
+    totals = dict.fromkeys(STAT_FIELDS, 0)
+    for values in per_user.values():
+        for field in STAT_FIELDS:
+            totals[field] += values[field]
+    
+    writes = [UpdateOne({"_id": "global"}, {"$set": totals}, upsert=True)]
+    writes += [
+        UpdateOne({"_id": f"user:{user_id}"}, {"$set": {"user_id": user_id, **values}}, upsert=True)
+        for user_id, values in per_user.items()
     ]
+    await stats_collection.bulk_write(writes, ordered=False)
+    await stats_collection.delete_many({"user_id": {"$nin": list(per_user)}, "_id": {"$ne": "global"}})
+    return totals
+
+async def get_global_statistics() -> Dict:
+    doc = await stats_collection.find_one({"_id": "global"}) or {}
+    return {field: doc.get(field, 0) for field in STAT_FIELDS}
+
+async def get_user_statistics() -> List[Dict]:
+    counters = {}
+    async for doc in stats_collection.find({"user_id": {"$exists": True}}, {"_id": 0}):
+        counters[doc["user_id"]] = doc
     
-    cursor = conversations_collection.aggregate(pipeline)
-    result = await cursor.to_list(length=1)
-    
-    if not result:
-        return {
-            "total_feedback_count": 0,
-            "quality_stats": {
-                "yes_percentage": 0,
-                "no_percentage": 0
-            },
-            "structure_stats": {
-                "yes_percentage": 0,
-                "no_percentage": 0
-            }
-        }
+    stats = []
+    async for user in users_collection.find({}, {"_id": 0, "id": 1, "username": 1, "email": 1, "role": 1}):
+        doc = counters.get(user["id"], {})
+        stats.append({
+            **user,
+            "conversation_count": doc.get("conversations", 0),
+            "message_count": doc.get("messages", 0)
+        })
     
-    stats = result[0]
+    return stats
+
+async def get_feedback_statistics(stats: Optional[Dict] = None) -> Dict:
+    if stats is None:
+        stats = await get_global_statistics()
     total_quality_votes = stats.get("quality_yes", 0) + stats.get("quality_no", 0)
     total_structure_votes = stats.get("structure_yes", 0) + stats.get("structure_no", 0)
     
@@ -341,7 +634,7 @@ async def get_feedback_statistics() -> Dict:
     structure_no_pct = round((stats.get("structure_no", 0) / total_structure_votes * 100) if total_structure_votes > 0 else 0)
     
     return {
-        "total_feedback_count": stats.get("total_count", 0),
+        "total_feedback_count": stats.get("feedback", 0),
         "quality_stats": {
             "yes_percentage": quality_yes_pct,
             "no_percentage": quality_no_pct
@@ -350,4 +643,217 @@ async def get_feedback_statistics() -> Dict:
             "yes_percentage": structure_yes_pct,
             "no_percentage": structure_no_pct
         }
-    }
\ No newline at end of file
+    }
+
+# Admin question operations
+def feedback_rating(field: str) -> Dict:
+    # true/false -> 1/0, unrated -> null
+    return {"$cond": [{"$eq": [field, True]}, 1, {"$cond": [{"$eq": [field, False]}, 0, None]}]}
+
+async def get_question_page(
+    page_size: int,
+    has_feedback: Optional[bool] = None,
+    newest_first: bool = True,
+    after: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str], int]:
+    """
+    One page of question/answer pairs with flattened feedback, the cursor of the next
+    page (None on the last one) and the number of pairs matching the filter. Answers
+    are matched and sorted on the (role, has_feedback, created_at, id) and (role,
+    created_at, id) indexes and paged by keyset on (created_at, id), so a page costs
+    the same wherever it is; only the page's questions are looked up (by the
+    ``question_id`` recorded on each answer). The total comes from the statistics.
+    """
+    match = {"role": "assistant", "question_id": {"$ne": None}}
+    if has_feedback is not None:
+        match["has_feedback"] = has_feedback
+    direction = -1 if newest_first else 1
+    if after:
+        created_at, answer_id = decode_page_cursor(after)
+        beyond = "$lt" if newest_first else "$gt"
+        match["$or"] = [
+            {"created_at": {beyond: created_at}},
+            {"created_at": created_at, "id": {beyond: answer_id}},
+        ]
+    
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"created_at": direction, "id": direction}},
+        {"$limit": page_size + 1},
+        {"$lookup": {"from": "messages", "localField": "question_id", "foreignField": "id", "as": "question"}},
+        {
+            "$project": {
+                "_id": 0,
+                "id": 1,
+                "conversation_id": 1,
+                "user_id": 1,
+                "question": {"$ifNull": [{"$arrayElemAt": ["$question.content", 0]}, ""]},
+                "response": "$content",
+                "asked_at": {"$ifNull": [{"$arrayElemAt": ["$question.created_at", 0]}, "$created_at"]},
+                "answered_at": "$created_at",
+                "has_feedback": {"$ne": [{"$ifNull": ["$feedback", None]}, None]},
+                "quality_rating": feedback_rating("$feedback.qualityRating"),
+                "structure_rating": feedback_rating("$feedback.structureRating"),
+                "quality_comment": {"$ifNull": ["$feedback.qualityComment", ""]},
+                "structure_comment": {"$ifNull": ["$feedback.structureComment", ""]}
+            }
+        }
+    ]
+    questions, stats = await asyncio.gather(
+        messages_collection.aggregate(pipeline).to_list(length=page_size + 1),
+        get_global_statistics()
+    )
+    
+    next_cursor = None
+    if len(questions) > page_size:
+        questions = questions[:page_size]
+        next_cursor = encode_page_cursor(questions[-1]["answered_at"], questions[-1]["id"])
+    for question in questions:
+        question.pop("answered_at")
+    
+    if has_feedback is True:
+        total = stats["rated_answers"]
+    elif has_feedback is False:
+        total = stats["answers"] - stats["rated_answers"]
+    else:
+        total = stats["answers"]
+    return questions, next_cursor, total
+
+# Admin export operations
+#
+# Exports walk MongoDB cursors in index order and yield one record at a time, so
+# memory stays bounded whatever the size of the database. Every record carries a
+# "cursor" token; passing the last one received as ``after`` resumes the export
+# right after that record.
+EXPORT_BATCH_SIZE = 200
+
+def encode_export_cursor(*values) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(values)).encode("utf-8")).decode("ascii")
+
+def decode_export_cursor(cursor: str, count: int) -> List:
+    """Inverse of encode_export_cursor; raises ValueError on a malformed cursor."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != count:
+        raise ValueError("Invalid cursor")
+    return values
+
+def date_range_filter(since: Optional[datetime], until: Optional[datetime]) -> Dict:
+    # Timestamps are stored as ISO strings, which compare in time order
+    created_at = {}
+    if since is not None:
+        created_at["$gte"] = since.isoformat()
+    if until is not None:
+        created_at["$lt"] = until.isoformat()
+    return {"created_at": created_at} if created_at else {}
+
+async def iter_conversations_for_export(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None
+):
+    """Conversations created in [since, until) with their messages, in conversation id order."""
+    query = {**date_range_filter(since, until)}
+    if user_id:
+        query["user_id"] = user_id
+    if after:
+        query["id"] = {"$gt": decode_export_cursor(after, 1)[0]}
+    
+    cursor = conversations_collection.find(query, {"_id": 0}).sort("id", 1).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            async for conversation in _with_messages(batch):
+                yield conversation
+            batch = []
+    async for conversation in _with_messages(batch):
+        yield conversation
+
+async def iter_all_conversations():
+    """Every conversation with its messages, read in batches like the export (GET /admin/conversations)."""
+    async for doc in iter_conversations_for_export():
+        yield conversation_from_doc(doc, doc["messages"])
+
+async def _with_messages(conversations: List[Dict]):
+    # One messages query per batch of conversations
+    ids = [doc["id"] for doc in conversations if "messages" not in doc]
+    messages = {}
+    if ids:
+        cursor = messages_collection.find(
+            {"conversation_id": {"$in": ids}},
+            {**MESSAGE_FIELDS, "conversation_id": 1, "seq": 1, "created_at": 1}
+        ).sort([("conversation_id", 1), ("seq", 1)])
+        async for m in cursor:
+            messages.setdefault(m.pop("conversation_id"), []).append(m)
+    for doc in conversations:
+        doc.pop("message_count", None)
+        doc.pop("preview", None)
+        doc["messages"] = doc.get("messages", messages.get(doc["id"], []))
+        doc["cursor"] = encode_export_cursor(doc["id"])
+        yield doc
+
+async def iter_questions_for_export(
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None
+):
+    """
+    Question/answer pairs answered in [since, until), in (conversation_id, seq) order.
+    Same pairing as get_question_page: one pair per assistant message, joined to its
+    question through the ``question_id`` recorded on the answer.
+    """
+    query = {"role": "assistant", "question_id": {"$ne": None}, **date_range_filter(since, until)}
+    if user_id:
+        query["user_id"] = user_id
+    if after:
+        conversation_id, seq = decode_export_cursor(after, 2)
+        query["$or"] = [
+            {"conversation_id": conversation_id, "seq": {"$gt": seq}},
+            {"conversation_id": {"$gt": conversation_id}},
+        ]
+    
+    cursor = messages_collection.find(query, {"_id": 0}).sort([("conversation_id", 1), ("seq", 1)]).batch_size(EXPORT_BATCH_SIZE)
+    batch = []
+    async for answer in cursor:
+        batch.append(answer)
+        if len(batch) == EXPORT_BATCH_SIZE:
+            async for record in _with_questions(batch):
+                yield record
+            batch = []
+    async for record in _with_questions(batch):
+        yield record
+
+async def _with_questions(answers: List[Dict]):
+    # One messages query per batch of answers
+    ids = [answer["question_id"] for answer in answers]
+    questions = {}
+    if ids:
+        async for q in messages_collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "content": 1, "created_at": 1}):
+            questions[q["id"]] = q
+    for answer in answers:
+        yield question_record(questions.get(answer["question_id"], {}), answer)
+
+def question_record(question: Dict, answer: Dict) -> Dict:
+    """Flatten a question/answer pair and the answer's feedback into one record."""
+    feedback = answer.get("feedback") or {}
+    quality = feedback.get("qualityRating")
+    structure = feedback.get("structureRating")
+    return {
+        "id": answer["id"],
+        "conversation_id": answer["conversation_id"],
+        "user_id": answer.get("user_id"),
+        "question": question.get("content", ""),
+        "response": answer["content"],
+        "asked_at": question.get("created_at", answer.get("created_at")),
+        "has_feedback": answer.get("feedback") is not None,
+        "quality_rating": int(quality) if quality is not None else None,
+        "structure_rating": int(structure) if structure is not None else None,
+        "quality_comment": feedback.get("qualityComment") or "",
+        "structure_comment": feedback.get("structureComment") or "",
+        "cursor": encode_export_cursor(answer["conversation_id"], answer["seq"])
+    }
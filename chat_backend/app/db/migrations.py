@@ -0,0 +1,319 @@
+"""
+Schema migrations and index bootstrap, run in the background at startup.
+
+Migrations are applied in version order and recorded in the ``schema_migrations``
+collection (``_id`` is the version). The indexes a migration declares are
+verified on every start: an index whose keys already exist, under any name, is
+left alone, so the step is idempotent, safe for several workers starting at once,
+and recreates an index that was dropped by hand. A migration's ``apply`` step (data
+changes) runs only once, in one worker: pending migrations are applied by the worker
+holding the lease document (``_id: "lease"``, with an owner and an expiry renewed
+while it works); the other workers wait until they are recorded as applied.
+
+``GET /ready`` reports the applied versions and the state of every index under
+``migrations``; chat endpoints answer 503 until the migrations are done.
+"""
+import asyncio
+import os
+import socket
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import ConnectionFailure, DuplicateKeyError
+
+from ..core.lifecycle import lifecycle
+from .database import (
+    conversations_collection,
+    db,
+    message_docs,
+    message_preview,
+    messages_collection,
+    rebuild_statistics,
+    schema_migrations_collection,
+)
+
+MIGRATION_RETRY_SECONDS = 5
+# A worker applying migrations renews its lease every third of this; a lease left by a dead worker expires
+MIGRATION_LEASE_SECONDS = 60
+MIGRATION_LEASE_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+# Pending write-behind turn markers are deleted by MongoDB after this long
+PENDING_TURN_TTL_SECONDS = 3600
+
+
+class IndexSpec:
+    def __init__(
+        self,
+        collection: str,
+        keys: List[Tuple[str, int]],
+        name: str,
+        unique: bool = False,
+        expire_after_seconds: Optional[int] = None,
+    ):
+        self.collection = collection
+        self.keys = keys
+        self.name = name
+        self.unique = unique
+        self.expire_after_seconds = expire_after_seconds  # TTL index
+
+    @property
+    def label(self) -> str:
+        return f"{self.collection}.{self.name}"
+
+
+class Migration:
+    def __init__(
+        self,
+        version: int,
+        description: str,
+        indexes: List[IndexSpec] = (),
+        apply: Optional[Callable[[], Awaitable[None]]] = None,
+    ):
+        self.version = version
+        self.description = description
+        self.indexes = list(indexes)
+        self.apply = apply
+
+
+async def move_embedded_messages():
+    """
+    Move the messages embedded in conversation documents to the messages collection.
+    Messages are upserted on (conversation_id, seq), so an interrupted run can simply
+    be repeated; the array is removed only once its messages are stored.
+    """
+    moved = 0
+    cursor = conversations_collection.find({"messages": {"$exists": True}}, {"_id": 0})
+    async for doc in cursor:
+        messages = doc["messages"]
+        if messages:
+            await messages_collection.bulk_write([
+                UpdateOne({"conversation_id": m["conversation_id"], "seq": m["seq"]}, {"$setOnInsert": m}, upsert=True)
+                for m in message_docs(messages, doc["id"], doc["user_id"], 0, doc["created_at"])
+            ], ordered=False)
+        await conversations_collection.update_one(
+            {"id": doc["id"]},
+            {
+                "$set": {
+                    "message_count": len(messages),
+                    "preview": message_preview(messages[-1]["content"]) if messages else "",
+                },
+                "$unset": {"messages": ""},
+            },
+        )
+        moved += 1
+    print(f"Moved the messages of {moved} conversations to their own collection")
+
+
+async def link_answers_to_questions(batch_size: int = 1000):
+    """Record on every assistant message the id of the user message it answers (``question_id``)."""
+    linked = 0
+    updates = []
+    conversation_id = question_id = None
+    cursor = messages_collection.find(
+        {"role": {"$in": ["user", "assistant"]}},
+        {"_id": 1, "id": 1, "conversation_id": 1, "role": 1, "question_id": 1},
+    ).sort([("conversation_id", ASCENDING), ("seq", ASCENDING)]).batch_size(batch_size)
+    async for m in cursor:
+        if m["conversation_id"] != conversation_id:
+            conversation_id, question_id = m["conversation_id"], None
+        if m["role"] == "user":
+            question_id = m["id"]
+            continue
+        if question_id is not None and m.get("question_id") != question_id:
+            updates.append(UpdateOne({"_id": m["_id"]}, {"$set": {"question_id": question_id}}))
+        question_id = None
+        if len(updates) >= batch_size:
+            await messages_collection.bulk_write(updates, ordered=False)
+            linked += len(updates)
+            updates = []
+    if updates:
+        await messages_collection.bulk_write(updates, ordered=False)
+        linked += len(updates)
+    print(f"Linked {linked} answers to their questions")
+
+
+async def build_statistics():
+    totals = await rebuild_statistics()
+    print(f"Built statistics: {totals}")
+
+
+async def flag_rated_messages():
+    """Set ``has_feedback`` on the messages stored before it existed, then count the answers."""
+    rated = await messages_collection.update_many(
+        {"has_feedback": {"$exists": False}, "feedback": {"$ne": None}},
+        {"$set": {"has_feedback": True}},
+    )
+    unrated = await messages_collection.update_many(
+        {"has_feedback": {"$exists": False}},
+        {"$set": {"has_feedback": False}},
+    )
+    print(f"Flagged {rated.modified_count} rated and {unrated.modified_count} unrated messages")
+    await build_statistics()
+
+
+MIGRATIONS = [
+    Migration(1, "Index users by username and id", [
+        IndexSpec("users", [("username", ASCENDING)], "username_unique", unique=True),
+        IndexSpec("users", [("id", ASCENDING)], "id_unique", unique=True),
+    ]),
+    Migration(2, "Index conversations by id and by user, most recently updated first", [
+        IndexSpec("conversations", [("id", ASCENDING)], "id_unique", unique=True),
+        IndexSpec("conversations", [("user_id", ASCENDING), ("updated_at", DESCENDING)], "user_id_updated_at"),
+    ]),
+    Migration(3, "Index the semantic cache by entry id and corpus version", [
+        IndexSpec("semantic_cache", [("id", ASCENDING)], "id_unique", unique=True),
+        IndexSpec("semantic_cache", [("corpus_version", ASCENDING), ("created_at", DESCENDING)], "corpus_version_created_at"),
+    ]),
+    Migration(4, "Index conversations by user, update time and id for the paginated listing", [
+        IndexSpec(
+            "conversations",
+            [("user_id", ASCENDING), ("updated_at", DESCENDING), ("id", DESCENDING)],
+            "user_id_updated_at_id",
+        ),
+    ]),
+    Migration(5, "Move messages out of conversation documents into the messages collection", [
+        IndexSpec("messages", [("conversation_id", ASCENDING), ("seq", ASCENDING)], "conversation_id_seq_unique", unique=True),
+        IndexSpec("messages", [("id", ASCENDING)], "id"),
+    ], apply=move_embedded_messages),
+    Migration(6, "Index conversations and messages by user for the filtered admin exports", [
+        IndexSpec("conversations", [("user_id", ASCENDING), ("id", ASCENDING)], "user_id_id"),
+        IndexSpec(
+            "messages",
+            [("user_id", ASCENDING), ("conversation_id", ASCENDING), ("seq", ASCENDING)],
+            "user_id_conversation_id_seq",
+        ),
+    ]),
+    Migration(7, "Link answers to their questions and index messages by role and time for /admin/questions", [
+        IndexSpec(
+            "messages",
+            [("role", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            "role_created_at_id",
+        ),
+    ], apply=link_answers_to_questions),
+    Migration(8, "Build the materialized admin statistics", apply=build_statistics),
+    Migration(9, "Flag rated messages, index answers by feedback state and count answers for /admin/questions", [
+        IndexSpec(
+            "messages",
+            [("role", ASCENDING), ("has_feedback", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            "role_has_feedback_created_at_id",
+        ),
+    ], apply=flag_rated_messages),
+    Migration(10, "Index pending write-behind turns by user and expire orphaned ones", [
+        IndexSpec("pending_turns", [("user_id", ASCENDING), ("queued_at", ASCENDING)], "user_id_queued_at"),
+        IndexSpec("pending_turns", [("queued_at", ASCENDING)], "queued_at_ttl", expire_after_seconds=PENDING_TURN_TTL_SECONDS),
+    ]),
+]
+
+# "<collection>.<index>" -> "pending", "building", "exists", "created in <s>s" or "failed: <error>"
+index_status: Dict[str, str] = {spec.label: "pending" for m in MIGRATIONS for spec in m.indexes}
+applied_versions: List[int] = []
+
+
+async def ensure_index(spec: IndexSpec):
+    """Create the index unless an index with the same keys already exists."""
+    collection = db[spec.collection]
+    for name, info in (await collection.index_information()).items():
+        if [(field, int(direction)) for field, direction in info["key"]] == spec.keys:
+            if bool(info.get("unique")) != spec.unique:
+                raise RuntimeError(
+                    f"Index '{name}' on {spec.collection} has the keys of '{spec.name}' but unique={bool(info.get('unique'))}; "
+                    "drop it so it can be recreated"
+                )
+            index_status[spec.label] = "exists"
+            return
+
+    index_status[spec.label] = "building"
+    started = time.perf_counter()
+    options = {"expireAfterSeconds": spec.expire_after_seconds} if spec.expire_after_seconds is not None else {}
+    await collection.create_index(spec.keys, name=spec.name, unique=spec.unique, **options)
+    index_status[spec.label] = f"created in {time.perf_counter() - started:.1f}s"
+    print(f"Created index {spec.label} in {time.perf_counter() - started:.1f}s")
+
+
+async def apply_migration(migration: Migration, applied: bool):
+    for spec in migration.indexes:
+        try:
+            await ensure_index(spec)
+        except ConnectionFailure:
+            raise
+        except Exception as e:
+            index_status[spec.label] = f"failed: {e}"
+            raise
+    if applied:
+        return
+    if migration.apply is not None:
+        await migration.apply()
+    await schema_migrations_collection.update_one(
+        {"_id": migration.version},
+        {"$setOnInsert": {"description": migration.description, "applied_at": datetime.utcnow().isoformat()}},
+        upsert=True,
+    )
+    print(f"Applied migration {migration.version}: {migration.description}")
+
+
+async def acquire_lease() -> bool:
+    """Take (or renew) the migration lease; False while another worker holds it."""
+    now = datetime.utcnow()
+    try:
+        await schema_migrations_collection.find_one_and_update(
+            {"_id": "lease", "$or": [{"owner": MIGRATION_LEASE_OWNER}, {"expires_at": {"$lt": now}}]},
+            {"$set": {"owner": MIGRATION_LEASE_OWNER, "expires_at": now + timedelta(seconds=MIGRATION_LEASE_SECONDS)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # the lease document exists and is held by another worker
+    return True
+
+
+async def keep_lease():
+    while True:
+        await asyncio.sleep(MIGRATION_LEASE_SECONDS / 3)
+        if not await acquire_lease():
+            print("Lost the migration lease to another worker")
+
+
+async def release_lease():
+    await schema_migrations_collection.delete_one({"_id": "lease", "owner": MIGRATION_LEASE_OWNER})
+
+
+async def run_migrations():
+    """
+    Apply pending migrations in order, waiting for MongoDB if it is not reachable yet,
+    and for the worker holding the lease if another one is applying them.
+    """
+    while True:
+        try:
+            applied = {doc["_id"] async for doc in schema_migrations_collection.find({"_id": {"$ne": "lease"}}, {"_id": 1})}
+            pending = any(m.version not in applied for m in MIGRATIONS)
+            if pending and not await acquire_lease():
+                print(f"Migrations are being applied by another worker, checking again in {MIGRATION_RETRY_SECONDS}s")
+                await asyncio.sleep(MIGRATION_RETRY_SECONDS)
+                continue
+            
+            renewal = asyncio.ensure_future(keep_lease()) if pending else None
+            try:
+                for migration in MIGRATIONS:
+                    await apply_migration(migration, migration.version in applied)
+                    if migration.version not in applied_versions:
+                        applied_versions.append(migration.version)
+            finally:
+                if renewal is not None:
+                    renewal.cancel()
+                    await release_lease()
+            return
+        except ConnectionFailure as e:
+            print(f"MongoDB not reachable for migrations, retrying in {MIGRATION_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(MIGRATION_RETRY_SECONDS)
+
+
+def migration_status() -> Dict:
+    return {
+        "applied": sorted(applied_versions),
+        "latest": MIGRATIONS[-1].version,
+        "indexes": dict(index_status),
+    }
+
+
+lifecycle.add("migrations", run_migrations, details=migration_status)
@@ -0,0 +1,340 @@
+"""
+Optional write-behind persistence of chat turns (``CHAT_WRITE_BEHIND=true``).
+
+``/chat`` and ``/chat/stream`` normally wait for the turn to be written before
+answering. In write-behind mode a completed turn is queued in process and the
+response goes out at once; a background task flushes the queue every
+``WRITE_BEHIND_FLUSH_MS`` or as soon as ``WRITE_BEHIND_BATCH_SIZE`` turns are
+waiting. A flush updates each conversation once (count, preview, title, creating
+it if needed) and writes the messages of the whole batch with one ``bulk_write``.
+A turn whose conversation id belongs to another user is rejected (logged and
+counted in ``write_behind_rejected_turns_total``), never saved elsewhere.
+
+Durability: the queue is flushed on shutdown, and whatever cannot be written
+(MongoDB unreachable) is appended to a spill file and replayed at the next
+startup and after the next successful flush. Every process spills to its own
+file, ``WRITE_BEHIND_SPILL_PATH`` with its pid inserted (``write_behind_spill.<pid>.jsonl``);
+a replay first claims a file by renaming it to a unique name, so two workers never
+replay the same file, and leaves alone the spill files of other running processes.
+Replays are idempotent: messages are upserted on (conversation_id, seq), and a
+spilled turn whose messages are already stored (by message id) is skipped. A
+replayed turn is appended after the turns written in the meantime. A crash of the
+process loses the turns still queued (at most one flush interval).
+
+Read-your-writes: every queued turn is recorded in the ``pending_turns``
+collection until its messages are stored (spilled turns stay pending until a
+replay writes them). Before a user's conversations are read or changed, the
+routes call ``sync(user_id)``, which flushes the worker's own queue and then waits
+until no turn of that user is pending in any worker, for at most
+``WRITE_BEHIND_SYNC_TIMEOUT_MS``. Markers older than ``WRITE_BEHIND_PENDING_SECONDS``
+(left by a worker that died) are ignored, and a TTL index removes them.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError, PyMongoError
+
+from ..core.lifecycle import lifecycle
+from ..core.metrics import metrics
+from .database import inc_statistics, messages_collection, pending_turns_collection, reserve_messages
+
+logger = logging.getLogger(__name__)
+
+CHAT_WRITE_BEHIND = (os.getenv("CHAT_WRITE_BEHIND") or "false").lower() == "true"
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE") or 100)
+WRITE_BEHIND_FLUSH_MS = float(os.getenv("WRITE_BEHIND_FLUSH_MS") or 200)
+# Requests wait for a flush instead of queueing more than this many turns
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING") or 10 * WRITE_BEHIND_BATCH_SIZE)
+WRITE_BEHIND_SPILL_PATH = os.getenv("WRITE_BEHIND_SPILL_PATH") or "write_behind_spill.jsonl"
+# Longest a read waits for the user's turns pending in other workers
+WRITE_BEHIND_SYNC_TIMEOUT_MS = float(os.getenv("WRITE_BEHIND_SYNC_TIMEOUT_MS") or 5000)
+# A pending-turn marker older than this is considered orphaned
+WRITE_BEHIND_PENDING_SECONDS = int(os.getenv("WRITE_BEHIND_PENDING_SECONDS") or 60)
+SYNC_POLL_SECONDS = 0.05
+
+
+class WriteBehindQueue:
+    def __init__(
+        self,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_seconds: float = WRITE_BEHIND_FLUSH_MS / 1000,
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        spill_path: str = WRITE_BEHIND_SPILL_PATH,
+        sync_timeout: float = WRITE_BEHIND_SYNC_TIMEOUT_MS / 1000,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.sync_timeout = sync_timeout
+        root, ext = os.path.splitext(spill_path)
+        self._spill_pattern = f"{glob.escape(root)}.*{ext}"
+        self._spill_prefix, self._spill_ext = root, ext
+        self.spill_path = f"{root}.{os.getpid()}{ext}"
+
+        self._turns: List[Dict] = []
+        self._unflushed = Counter()  # user_id -> turns queued or being written
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task = None
+
+        self.queued = metrics.gauge("write_behind_queued_turns")
+        self.written = metrics.counter("write_behind_written_turns_total")
+        self.rejected = metrics.counter("write_behind_rejected_turns_total")
+        self.spilled = metrics.counter("write_behind_spilled_entries_total")
+        self.sync_timeouts = metrics.counter("write_behind_sync_timeouts_total")
+        self.flush_time = metrics.histogram("write_behind_flush_seconds")
+
+    def __len__(self):
+        return len(self._turns)
+
+    async def start(self):
+        """Replay the spill file of a previous run, then start the flusher (lifecycle load)."""
+        await self._replay_spill()
+        self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """Stop the flusher and write (or spill) everything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        while self._turns:
+            await self.flush()
+
+    async def submit(self, conversation_id: str, user_id: str, title: str, messages: List[Dict]):
+        turn_id = uuid.uuid4().hex
+        try:
+            await pending_turns_collection.insert_one({"_id": turn_id, "user_id": user_id, "queued_at": datetime.utcnow()})
+        except PyMongoError as e:
+            logger.warning("Write-behind could not record pending turn %s: %s", turn_id, e)
+        self._turns.append({
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "title": title,
+            "messages": messages,
+            "turn_ids": [turn_id],
+        })
+        self._unflushed[user_id] += 1
+        self.queued.set(len(self._turns))
+        if len(self._turns) >= self.max_pending:
+            await self.flush()
+        elif len(self._turns) >= self.batch_size:
+            self._wake.set()
+
+    async def sync(self, user_id: str):
+        """Return once every turn queued for ``user_id`` so far, by any worker, has been written."""
+        while self._unflushed[user_id] > 0:
+            await self.flush()
+        if not await self._pending(user_id):
+            return
+        if self._spill_files():
+            # Some of them may be spilled here: try them now rather than after the next turn
+            async with self._flush_lock:
+                await self._replay_spill()
+        deadline = time.monotonic() + self.sync_timeout
+        while await self._pending(user_id):
+            if time.monotonic() >= deadline:
+                self.sync_timeouts.inc()
+                logger.warning("Write-behind: turns of user %s still pending after %.1fs", user_id, self.sync_timeout)
+                return
+            await asyncio.sleep(min(SYNC_POLL_SECONDS, self.flush_seconds))
+
+    async def _pending(self, user_id: str) -> bool:
+        orphaned = datetime.utcnow() - timedelta(seconds=WRITE_BEHIND_PENDING_SECONDS)
+        return await pending_turns_collection.find_one(
+            {"user_id": user_id, "queued_at": {"$gt": orphaned}}, {"_id": 1}
+        ) is not None
+
+    async def _settle(self, turn_ids: List[str]):
+        """Drop the pending markers of turns that are stored (or rejected)."""
+        if not turn_ids:
+            return
+        try:
+            await pending_turns_collection.delete_many({"_id": {"$in": turn_ids}})
+        except PyMongoError as e:
+            logger.warning("Write-behind could not clear %d pending turn marker(s): %s", len(turn_ids), e)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("Write-behind flush failed")
+
+    async def flush(self):
+        async with self._flush_lock:
+            turns, self._turns = self._turns, []
+            self.queued.set(0)
+            if not turns:
+                return
+            started = time.perf_counter()
+            try:
+                written = await self._write(turns)
+            finally:
+                for turn in turns:
+                    self._unflushed[turn["user_id"]] -= 1
+                    if self._unflushed[turn["user_id"]] <= 0:
+                        del self._unflushed[turn["user_id"]]
+            self.flush_time.observe(time.perf_counter() - started)
+            if written and self._spill_files():
+                await self._replay_spill()
+
+    async def _write(self, turns: List[Dict], entries: Optional[List[Dict]] = None) -> bool:
+        """
+        Write turns (and spilled ``{"message": doc, "turn_ids": [...]}`` entries, already
+        numbered); spill what fails. True if all was written.
+        """
+        # One conversation update per conversation, in the order the turns were answered
+        groups = {}
+        for turn in turns:
+            key = (turn["conversation_id"], turn["user_id"])
+            if key in groups:
+                groups[key]["messages"] = groups[key]["messages"] + turn["messages"]
+                groups[key]["turn_ids"] = groups[key]["turn_ids"] + turn.get("turn_ids", [])
+            else:
+                groups[key] = {**turn, "turn_ids": list(turn.get("turn_ids", []))}
+
+        results = await asyncio.gather(*(self._reserve(group) for group in groups.values()), return_exceptions=True)
+        entries = list(entries or [])
+        counted = []
+        settled = []
+        failed = []
+        for group, result in zip(groups.values(), results):
+            if isinstance(result, Exception):
+                logger.warning("Write-behind could not update conversation %s: %s", group["conversation_id"], result)
+                failed.append({"turn": group})
+            elif result is None:
+                settled.extend(group["turn_ids"])
+            else:
+                docs, counts = result
+                entries.extend({"message": d, "turn_ids": group["turn_ids"]} for d in docs)
+                counted.append((group["user_id"], counts))
+                self.written.inc()
+
+        # The statistics of reserved turns are applied alongside the message write, never replayed
+        written, *_ = await asyncio.gather(
+            self._write_messages([e["message"] for e in entries]),
+            *(self._count(user_id, counts) for user_id, counts in counted)
+        )
+        if written:
+            settled.extend({turn_id for e in entries for turn_id in e.get("turn_ids", [])})
+        else:
+            failed.extend(entries)
+
+        await self._settle(settled)
+        if failed:
+            self._spill(failed)
+        return not failed
+
+    async def _write_messages(self, docs: List[Dict]) -> bool:
+        if not docs:
+            return True
+        try:
+            await messages_collection.bulk_write([
+                UpdateOne({"conversation_id": d["conversation_id"], "seq": d["seq"]}, {"$setOnInsert": d}, upsert=True)
+                for d in docs
+            ], ordered=False)
+        except PyMongoError as e:
+            logger.warning("Write-behind could not write %d message(s): %s", len(docs), e)
+            return False
+        return True
+
+    async def _count(self, user_id: str, counts: Dict[str, int]):
+        try:
+            await inc_statistics(user_id, **counts)
+        except PyMongoError as e:
+            logger.warning("Write-behind could not update the statistics of user %s: %s", user_id, e)
+
+    async def _reserve(self, turn: Dict) -> Optional[Tuple[List[Dict], Dict[str, int]]]:
+        """Reserve the turn's sequence numbers; None if the conversation id belongs to another user."""
+        try:
+            return await reserve_messages(turn["conversation_id"], turn["messages"], turn["user_id"], turn["title"], upsert=True)
+        except DuplicateKeyError:
+            self.rejected.inc()
+            logger.error(
+                "Write-behind rejected %d message(s) of user %s: conversation %s belongs to another user",
+                len(turn["messages"]), turn["user_id"], turn["conversation_id"]
+            )
+            return None
+
+    def _spill(self, entries: List[Dict]):
+        with open(self.spill_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.spilled.inc(len(entries))
+        logger.warning("Write-behind spilled %d entries to %s", len(entries), self.spill_path)
+
+    def _spill_files(self) -> List[str]:
+        """Spill files waiting for a replay: ours, those of stopped processes and unfinished replays."""
+        files = []
+        for path in sorted(glob.glob(self._spill_pattern)):
+            # <root>.<pid><ext> is being spilled to, <root>.replay-<pid>-<hex><ext> replayed by that pid
+            tag = path[len(self._spill_prefix) + 1:len(path) - len(self._spill_ext)]
+            pid = tag[len("replay-"):].split("-")[0] if tag.startswith("replay-") else tag
+            if pid.isdigit() and int(pid) != os.getpid() and pid_alive(int(pid)):
+                continue  # another running worker owns it
+            files.append(path)
+        return files
+
+    async def _replay_spill(self):
+        for path in self._spill_files():
+            # Claim the file: only one process wins the rename
+            claimed = f"{self._spill_prefix}.replay-{os.getpid()}-{uuid.uuid4().hex}{self._spill_ext}"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue  # claimed by another worker
+
+            with open(claimed, encoding="utf-8") as f:
+                entries = [json.loads(line) for line in f if line.strip()]
+            turns = await self._unwritten([e["turn"] for e in entries if "turn" in e])
+            messages = [e for e in entries if "message" in e]
+            logger.info("Write-behind replaying %d turn(s) and %d message(s) from %s", len(turns), len(messages), path)
+            await self._write(turns, messages)  # failures go to this process' spill file
+            try:
+                os.remove(claimed)
+            except FileNotFoundError:
+                pass
+
+    async def _unwritten(self, turns: List[Dict]) -> List[Dict]:
+        """Drop (and settle) the turns whose messages are already stored (replayed before)."""
+        ids = [m["id"] for turn in turns for m in turn["messages"]]
+        if not ids:
+            return turns
+        stored = {doc["id"] async for doc in messages_collection.find({"id": {"$in": ids}}, {"_id": 0, "id": 1})}
+        unwritten = []
+        for turn in turns:
+            if all(m["id"] in stored for m in turn["messages"]):
+                await self._settle(turn.get("turn_ids", []))
+            else:
+                unwritten.append(turn)
+        return unwritten
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass  # exists, owned by another user
+    return True
+
+
+write_behind = WriteBehindQueue() if CHAT_WRITE_BEHIND else None
+
+if write_behind is not None:
+    lifecycle.add("write-behind", write_behind.start, after="migrations")
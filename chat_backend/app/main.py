@@ -1,7 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from .routes import auth, chat, admin
+from .core.lifecycle import lifecycle
+from .core.metrics import metrics
+from .db import migrations  # registers the startup migrations with the lifecycle
+from .db.write_behind import write_behind
 
 # Create FastAPI app
 app = FastAPI(
@@ -33,10 +38,35 @@ async def root():
         "redoc": "/redoc"
     }
 
+@app.on_event("startup")
+async def load_components():
+    # Fail fast on missing corpora, then load corpora and the model in the background
+    lifecycle.check()
+    lifecycle.start()
+
+@app.on_event("shutdown")
+async def flush_pending_writes():
+    # Write-behind mode: write (or spill) the chat turns still queued
+    if write_behind is not None:
+        await write_behind.close()
+
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once every startup component is loaded; reports per-component load timings."""
+    state = lifecycle.status()
+    if state["status"] != "ready":
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+@app.get("/metrics")
+async def get_metrics():
+    """In-process metrics of this worker (counters, gauges and histograms)."""
+    return metrics.snapshot()
+
 # @app.on_event("startup")
 # async def startup_event():
 #     await create_initial_admin()
\ No newline at end of file
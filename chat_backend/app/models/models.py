@@ -41,6 +41,14 @@ class Message(BaseModel):
     content: str
     feedback: Optional[Feedback] = None
 
+class StoredMessage(Message):
+    seq: int  # position in the conversation, from 0
+    created_at: datetime
+
+class MessagePage(BaseModel):
+    messages: List[StoredMessage]
+    next_after: Optional[int] = None  # pass back as ?after= for the next page
+
 # Conversation models
 class Conversation(BaseModel):
     id: str
@@ -50,6 +58,18 @@ class Conversation(BaseModel):
     updated_at: datetime
     user_id: str
 
+class ConversationSummary(BaseModel):
+    id: str
+    title: str
+    created_at: datetime
+    updated_at: datetime
+    message_count: int
+    preview: str = ""  # start of the last message
+
+class ConversationPage(BaseModel):
+    conversations: List[ConversationSummary]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
+
 class ConversationCreate(BaseModel):
     title: str = "New Conversation"
     messages: List[Message] = []
@@ -84,4 +104,20 @@ class UserStats(BaseModel):
 class FeedbackStats(BaseModel):
     total_feedback_count: int
     quality_stats: dict  # {"yes_percentage": float, "no_percentage": float}
-    structure_stats: dict  # {"yes_percentage": float, "no_percentage": float}
\ No newline at end of file
+    structure_stats: dict  # {"yes_percentage": float, "no_percentage": float}
+
+# Corpus management models
+class CorpusSegmentCreate(BaseModel):
+    texts: List[str]
+    embeddings: List[List[float]]
+
+# Embedding server models
+class EmbedRequest(BaseModel):
+    questions: List[str]
+
+class RetrieveRequest(BaseModel):
+    question: str
+    vector: str  # base64-encoded float32 question embedding
+
+class LookupRequest(BaseModel):
+    refs: List[str]
@@ -0,0 +1,107 @@
+"""
+Micro-batching scheduler for query embeddings.
+
+Questions submitted concurrently are collected for up to ``EMBED_MAX_WAIT_MS``
+milliseconds, or until ``EMBED_MAX_BATCH_SIZE`` are waiting, and encoded with a
+single batched call on a dedicated thread. Every caller gets its own vector back
+through a ``concurrent.futures.Future``: sync code calls ``encode`` and async code
+awaits ``asyncio.wrap_future(batcher.submit(text))``.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List
+
+import numpy as np
+
+from ..core.metrics import metrics
+
+EMBED_MAX_BATCH_SIZE = int(os.getenv("EMBED_MAX_BATCH_SIZE") or 16)
+EMBED_MAX_WAIT_MS = float(os.getenv("EMBED_MAX_WAIT_MS") or 5)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+
+class EmbeddingBatcher:
+    """Collects single-question requests into batched ``encode_fn`` calls."""
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = EMBED_MAX_BATCH_SIZE,
+        max_wait_ms: float = EMBED_MAX_WAIT_MS,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.queue_depth = metrics.gauge("embedding_queue_depth")
+        self.batch_size = metrics.histogram("embedding_batch_size", buckets=BATCH_SIZE_BUCKETS)
+        self.queue_wait = metrics.histogram("embedding_queue_wait_seconds")
+        self.encode_seconds = metrics.histogram("embedding_encode_seconds")
+
+    def submit(self, text: str) -> Future:
+        """Queue ``text`` for encoding; the future resolves to its normalized vector."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        self.queue_depth.set(self._queue.qsize())
+        return future
+
+    def encode(self, text: str) -> np.ndarray:
+        """Blocking helper for synchronous callers."""
+        return self.submit(text).result()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires."""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self.queue_depth.set(self._queue.qsize())
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            # Drop requests whose caller went away (e.g. a cancelled asyncio task)
+            batch = [item for item in batch if item[1].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                self.queue_wait.observe(started - queued_at)
+            self.batch_size.observe(len(batch))
+
+            try:
+                vectors = self.encode_fn([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                self.encode_seconds.observe(time.perf_counter() - started)
+
+            for i, (_, future, _) in enumerate(batch):
+                future.set_result(vectors[i])
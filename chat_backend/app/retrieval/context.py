@@ -0,0 +1,141 @@
+"""
+Token-budgeted context assembly.
+
+Retrieved passages are joined into the prompt context after:
+
+1. dropping repeated paragraphs (HCL summaries that ``final_servicii.py`` inlined
+   into several Servicii passages, or an HCL retrieved from both corpora),
+2. dropping passages that are near-duplicates of a higher-ranked one (word
+   3-gram Jaccard similarity >= ``CONTEXT_DEDUP_THRESHOLD``),
+3. trimming to ``CONTEXT_TOKEN_BUDGET`` tokens per source.
+
+Tokens are counted with tiktoken's ``o200k_base`` encoding (the gpt-4o
+tokenizer). If tiktoken is unavailable a 4-characters-per-token estimate is used.
+"""
+import hashlib
+import os
+import re
+from typing import Dict, List, Tuple
+
+from ..core.metrics import metrics
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET") or 6000)
+CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD") or 0.8)
+TOKENIZER_ENCODING = "o200k_base"
+
+# Paragraphs shorter than this (headers, "Linkuri:" lines) are never deduplicated
+MIN_DEDUP_BLOCK_CHARS = 200
+# A trailing passage is only truncated into the budget if at least this many tokens are left
+MIN_TRUNCATED_TOKENS = 64
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:
+            print(f"tiktoken unavailable ({e}); estimating tokens as characters / 4")
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+
+
+def _block_key(block: str) -> str:
+    return hashlib.sha1(" ".join(block.split()).lower().encode("utf-8")).hexdigest()
+
+
+def _shingles(text: str) -> set:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def build_context(passages: List[str], budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, Dict]:
+    """Deduplicate and trim ranked passages into one context string; return it with statistics."""
+    seen_blocks = set()
+    kept, kept_shingles = [], []
+    duplicates = 0
+
+    for passage in passages:
+        blocks = []
+        for block in re.split(r"\n\s*\n", passage):
+            if len(block) >= MIN_DEDUP_BLOCK_CHARS:
+                key = _block_key(block)
+                if key in seen_blocks:
+                    duplicates += 1
+                    continue
+                seen_blocks.add(key)
+            blocks.append(block)
+        text = "\n\n".join(blocks).strip()
+        if not text:
+            duplicates += 1
+            continue
+
+        shingles = _shingles(text)
+        if any(_jaccard(shingles, other) >= CONTEXT_DEDUP_THRESHOLD for other in kept_shingles):
+            duplicates += 1
+            continue
+        kept.append(text)
+        kept_shingles.append(shingles)
+
+    selected, used, truncated = [], 0, False
+    for text in kept:
+        tokens = count_tokens(text)
+        if used + tokens <= budget:
+            selected.append(text)
+            used += tokens
+            continue
+        remaining = budget - used
+        if remaining >= MIN_TRUNCATED_TOKENS:
+            selected.append(truncate_to_tokens(text, remaining))
+            used += remaining
+        truncated = True
+        break
+
+    context = "\n\n".join(selected)
+    original_tokens = count_tokens("\n\n".join(passages))
+    final_tokens = count_tokens(context)
+    return context, {
+        "original_tokens": original_tokens,
+        "final_tokens": final_tokens,
+        "saved_tokens": max(0, original_tokens - final_tokens),
+        "duplicates_removed": duplicates,
+        "truncated": truncated,
+    }
+
+
+def record_context(source: str, stats: Dict):
+    """Log and export the token savings of one assembled context."""
+    metrics.counter("context_tokens_saved_total", source=source).inc(stats["saved_tokens"])
+    metrics.counter("context_duplicates_removed_total", source=source).inc(stats["duplicates_removed"])
+    metrics.histogram(
+        "context_tokens", buckets=(500, 1000, 2000, 4000, 6000, 8000, 16000, 32000), source=source
+    ).observe(stats["final_tokens"])
+    print(
+        f"Context {source}: {stats['original_tokens']} -> {stats['final_tokens']} tokens "
+        f"({stats['saved_tokens']} saved, {stats['duplicates_removed']} duplicates removed"
+        f"{', truncated' if stats['truncated'] else ''})"
+    )
@@ -0,0 +1,75 @@
+"""
+Registry of the retrieval corpora.
+
+Every corpus is searched concurrently for each question and, when the route
+needs it, answered with its own prompt template before the answers are fused.
+By default the registry holds the Servicii and HCL corpora from
+``EMBEDDINGS_DIR``. Setting ``CORPORA_CONFIG`` to a JSON file replaces it:
+
+    [
+      {"name": "servicii", "prompt": "servicii"},
+      {"name": "hcl", "prompt": "hcl", "top_k": 5},
+      {"name": "faq", "directory": "/data/faq", "top_k": 3,
+       "prompt_template": "Întrebarea: {question}\\nRaspunde pe baza acestui context: {docs}"}
+    ]
+
+Keys: ``name`` (store name of the corpus files), ``directory`` (default
+``EMBEDDINGS_DIR``), ``top_k`` (default 5), ``token_budget`` (default
+``CONTEXT_TOKEN_BUDGET``) and either ``prompt`` (a name from ``PROMPT_TEMPLATES``)
+or ``prompt_template`` (a template with ``{question}`` and ``{docs}``). All corpora
+must be embedded with the same model. The order of the list is the order in
+which contexts and answers are combined.
+"""
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from .context import CONTEXT_TOKEN_BUDGET
+from .prompts import PROMPT_TEMPLATES
+from .store import EMBEDDINGS_DIR
+
+CORPORA_CONFIG = os.getenv("CORPORA_CONFIG")
+DEFAULT_TOP_K = 5
+
+
+class CorpusConfig:
+    def __init__(
+        self,
+        name: str,
+        directory: str = EMBEDDINGS_DIR,
+        top_k: int = DEFAULT_TOP_K,
+        token_budget: int = CONTEXT_TOKEN_BUDGET,
+        prompt: str = "default",
+        prompt_template: Optional[str] = None,
+    ):
+        if prompt_template is None:
+            if prompt not in PROMPT_TEMPLATES:
+                raise ValueError(f"Corpus '{name}': unknown prompt '{prompt}', expected one of {sorted(PROMPT_TEMPLATES)}")
+            prompt_template = PROMPT_TEMPLATES[prompt]
+        if "{question}" not in prompt_template or "{docs}" not in prompt_template:
+            raise ValueError(f"Corpus '{name}': prompt_template needs {{question}} and {{docs}} placeholders")
+        self.name = name
+        self.directory = directory
+        self.top_k = int(top_k)
+        self.token_budget = int(token_budget)
+        self.prompt_template = prompt_template
+
+
+def load_registry(path: Optional[str] = CORPORA_CONFIG) -> "OrderedDict[str, CorpusConfig]":
+    if not path:
+        configs = [CorpusConfig("servicii", prompt="servicii"), CorpusConfig("hcl", prompt="hcl")]
+    else:
+        with open(path, encoding="utf-8") as f:
+            configs = [CorpusConfig(**entry) for entry in json.load(f)]
+    registry = OrderedDict()
+    for config in configs:
+        if config.name in registry:
+            raise ValueError(f"Corpus '{config.name}' is declared twice in {path}")
+        registry[config.name] = config
+    if not registry:
+        raise ValueError(f"No corpora declared in {path}")
+    return registry
+
+
+corpora = load_registry()
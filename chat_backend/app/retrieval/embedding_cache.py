@@ -0,0 +1,127 @@
+"""
+Exact-match cache of question embeddings.
+
+Questions are normalized (whitespace collapsed, case folded) and mapped to their
+normalized float32 vector, so retries, double-clicks and FAQ buttons skip the
+embedding model entirely.
+
+Two tiers:
+
+- an in-process LRU of ``EMBEDDING_CACHE_CAPACITY`` vectors,
+- optionally, a SQLite file at ``EMBEDDING_CACHE_PATH`` shared by every worker on
+  the host (a local stand-in for a shared store such as Redis).
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from ..core.metrics import metrics
+
+EMBEDDING_CACHE_CAPACITY = int(os.getenv("EMBEDDING_CACHE_CAPACITY") or 10000)
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+EMBEDDING_CACHE_SHARED_CAPACITY = int(os.getenv("EMBEDDING_CACHE_SHARED_CAPACITY") or 100000)
+
+
+def normalize_question(text: str) -> str:
+    """Collapse whitespace and fold case so trivially different questions share a key."""
+    return " ".join(text.split()).casefold()
+
+
+class SQLiteVectorStore:
+    """Vectors in a single SQLite file, safe to open from several processes."""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, path: str, capacity: int = EMBEDDING_CACHE_SHARED_CAPACITY):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: bytes):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, vector, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._puts += 1
+            if self._puts % self.PRUNE_EVERY == 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    "SELECT key FROM embeddings ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.capacity,)
+                )
+
+
+class EmbeddingCache:
+    """Question text -> normalized vector, in-process LRU backed by an optional shared store."""
+
+    def __init__(self, namespace: str, capacity: int = EMBEDDING_CACHE_CAPACITY, path: Optional[str] = EMBEDDING_CACHE_PATH):
+        self.namespace = namespace
+        self.capacity = capacity
+        self.shared = SQLiteVectorStore(path) if path else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+        self.memory_hits = metrics.counter("embedding_cache_hits_total", tier="memory")
+        self.shared_hits = metrics.counter("embedding_cache_hits_total", tier="shared")
+        self.misses = metrics.counter("embedding_cache_misses_total")
+
+    def key(self, question: str) -> str:
+        # The namespace (model name) keeps vectors of different encoders apart
+        return hashlib.sha1(f"{self.namespace}\n{normalize_question(question)}".encode("utf-8")).hexdigest()
+
+    def get(self, question: str) -> Optional[np.ndarray]:
+        """In-process lookup only; never blocks on I/O."""
+        key = self.key(question)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+        if vector is not None:
+            self.memory_hits.inc()
+        return vector
+
+    def get_shared(self, question: str) -> Optional[np.ndarray]:
+        """Look up the shared store (blocking, run it in an executor) and promote hits to memory."""
+        if self.shared is None:
+            return None
+        key = self.key(question)
+        value = self.shared.get(key)
+        if value is None:
+            return None
+        vector = np.frombuffer(value, dtype=np.float32)
+        self._remember(key, vector)
+        self.shared_hits.inc()
+        return vector
+
+    def put(self, question: str, vector: np.ndarray):
+        """Remember a vector in memory (the shared store is written by ``put_shared``)."""
+        self._remember(self.key(question), np.asarray(vector, dtype=np.float32))
+
+    def put_shared(self, question: str, vector: np.ndarray):
+        if self.shared is not None:
+            self.shared.put(self.key(question), np.asarray(vector, dtype=np.float32).tobytes())
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
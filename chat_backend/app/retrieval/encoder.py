@@ -0,0 +1,106 @@
+"""
+Query encoder backends.
+
+Questions must be embedded in the same space as the corpora, which were built
+with ``EMBEDDING_MODEL_NAME``. ``EMBEDDING_BACKEND`` selects how:
+
+- ``full`` (default): the model in full precision on ``cuda:1`` when a GPU is
+  available, otherwise on the CPU (seconds per question for a 7B model).
+- ``cpu-int8``: the same model on the CPU with its ``Linear`` layers dynamically
+  quantized to int8 (``torch.quantization.quantize_dynamic``). Vectors stay in the
+  corpus space; the benchmark reports how closely they match the full model.
+- ``distilled``: a small model (``EMBEDDING_DISTILLED_MODEL``) on the CPU whose
+  vectors are mapped into the corpus space by a linear projection fitted offline
+  with ``python -m scripts.fit_query_projection`` (``EMBEDDING_PROJECTION_PATH``).
+
+CPU backends use ``EMBEDDING_THREADS`` intra-op threads (default: torch's choice,
+one per core). Encoding only ever runs on the micro-batching thread (``batcher.py``),
+so these threads are the encoder's own pool and the search executor is not starved.
+Compare backends with ``python -m scripts.benchmark_encoder``.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+import torch
+from sentence_transformers import SentenceTransformer
+
+from .index import normalize
+
+EMBEDDING_MODEL_NAME = "Alibaba-NLP/gte-Qwen2-7B-instruct"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND") or "full"
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS") or 0)
+EMBEDDING_DISTILLED_MODEL = os.getenv("EMBEDDING_DISTILLED_MODEL")
+EMBEDDING_PROJECTION_PATH = os.getenv("EMBEDDING_PROJECTION_PATH")
+
+ENCODER_BACKENDS = ("full", "cpu-int8", "distilled")
+
+device_emb = "cuda:1" if torch.cuda.is_available() else "cpu"
+
+
+class QueryEncoder:
+    """A SentenceTransformer model, optionally int8-quantized and/or followed by a projection."""
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str,
+        quantize: bool = False,
+        projection_path: Optional[str] = None,
+        threads: int = EMBEDDING_THREADS,
+    ):
+        self.model_name = model_name
+        self.device = device
+        self.quantize = quantize
+        self.projection_path = projection_path
+        self.threads = threads
+        self.model = None
+        self.projection = None
+
+    @property
+    def name(self) -> str:
+        """Identifies the vectors this encoder produces (used as the embedding cache namespace)."""
+        name = self.model_name
+        if self.quantize:
+            name += ":int8"
+        if self.projection_path:
+            name += f"+{os.path.basename(self.projection_path)}"
+        return name
+
+    def missing_artifacts(self) -> List[str]:
+        if self.projection_path and not os.path.exists(self.projection_path):
+            return [self.projection_path]
+        return []
+
+    def load(self):
+        if self.model is not None:
+            return
+        if self.device == "cpu" and self.threads > 0:
+            torch.set_num_threads(self.threads)
+        model = SentenceTransformer(self.model_name, trust_remote_code=True).to(self.device)
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        if self.projection_path:
+            self.projection = np.load(self.projection_path).astype(np.float32)
+        self.model = model
+
+    def encode(self, questions: List[str]) -> np.ndarray:
+        """Encode a batch of questions into normalized float32 vectors of the corpus space."""
+        self.load()
+        embeddings = self.model.encode(questions, convert_to_numpy=True, device=self.device, batch_size=len(questions))
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.projection is not None:
+            embeddings = embeddings @ self.projection
+        return normalize(embeddings).astype(np.float32)
+
+
+def make_encoder(backend: str = EMBEDDING_BACKEND) -> QueryEncoder:
+    if backend == "full":
+        return QueryEncoder(EMBEDDING_MODEL_NAME, device_emb)
+    if backend == "cpu-int8":
+        return QueryEncoder(EMBEDDING_MODEL_NAME, "cpu", quantize=True)
+    if backend == "distilled":
+        if not EMBEDDING_DISTILLED_MODEL or not EMBEDDING_PROJECTION_PATH:
+            raise ValueError("EMBEDDING_BACKEND=distilled needs EMBEDDING_DISTILLED_MODEL and EMBEDDING_PROJECTION_PATH")
+        return QueryEncoder(EMBEDDING_DISTILLED_MODEL, "cpu", projection_path=EMBEDDING_PROJECTION_PATH)
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {ENCODER_BACKENDS}")
@@ -0,0 +1,223 @@
+"""
+Vector index backends used for document retrieval.
+
+Every backend exposes ``search(query, k) -> (indices, scores)`` over a matrix of
+row-normalized embeddings, so the inner product is the cosine similarity.
+
+- ``ExactIndex`` scores every row with one matrix-vector product and keeps the
+  top-k with ``np.argpartition`` instead of sorting every score.
+- ``IVFIndex`` clusters the corpus offline (spherical k-means) and at query time
+  only scans the ``nprobe`` clusters closest to the question.
+- ``QuantizedIndex`` scans a float16 or per-dimension int8 copy of the corpus and
+  re-scores the best ``QUANT_RERANK_CANDIDATES`` rows in full precision. It is
+  used by the exact backend when ``VECTOR_QUANTIZATION`` is "float16" or "int8"
+  and the quantized copy was written by ``python -m scripts.convert_corpus --quantize``.
+
+The backend is selected with the ``VECTOR_INDEX_BACKEND`` environment variable
+("exact" or "ivf"). IVF indexes are built with ``python -m scripts.build_index``
+and saved next to the embedding files.
+"""
+import os
+
+import numpy as np
+
+VECTOR_INDEX_BACKEND = os.getenv("VECTOR_INDEX_BACKEND") or "exact"
+IVF_NPROBE = int(os.getenv("IVF_NPROBE") or 8)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION") or "none"
+QUANT_RERANK_CANDIDATES = int(os.getenv("QUANT_RERANK_CANDIDATES") or 50)
+QUANTIZED_DTYPES = ("float16", "int8")
+SCAN_BLOCK_ROWS = 32768
+UPCAST_BLOCK_ROWS = 1024
+
+
+def normalize(embeddings):
+    """Normalize embeddings row-wise."""
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return embeddings / norms
+
+
+def index_path(directory: str, name: str) -> str:
+    """Location of the IVF index built for corpus ``name``."""
+    return os.path.join(directory, f"{name}_ivf_index.npz")
+
+
+def scan(embeddings, query: np.ndarray) -> np.ndarray:
+    """Inner product of every row with ``query``; float16/int8 rows are upcast one block at a time."""
+    if embeddings.dtype == query.dtype:
+        return np.asarray(embeddings @ query)
+    # Small blocks converted into one reused buffer stay in cache between the cast and the product
+    scores = np.empty(len(embeddings), dtype=np.float32)
+    buffer = np.empty((min(UPCAST_BLOCK_ROWS, len(embeddings)), embeddings.shape[1]), dtype=np.float32)
+    for start in range(0, len(embeddings), UPCAST_BLOCK_ROWS):
+        block = buffer[:len(embeddings[start:start + UPCAST_BLOCK_ROWS])]
+        np.copyto(block, embeddings[start:start + UPCAST_BLOCK_ROWS], casting="unsafe")
+        scores[start:start + len(block)] = block @ query
+    return scores
+
+
+def quantize(embeddings, dtype: str):
+    """Return ``(codes, scales)``; int8 codes use one symmetric scale per dimension, float16 has no scales."""
+    if dtype not in QUANTIZED_DTYPES:
+        raise ValueError(f"Unsupported quantization '{dtype}', expected one of {QUANTIZED_DTYPES}")
+    codes = np.empty(embeddings.shape, dtype=dtype)
+    if dtype == "float16":
+        for start in range(0, len(embeddings), SCAN_BLOCK_ROWS):
+            codes[start:start + SCAN_BLOCK_ROWS] = embeddings[start:start + SCAN_BLOCK_ROWS]
+        return codes, None
+
+    max_abs = np.zeros(embeddings.shape[1], dtype=np.float32)
+    for start in range(0, len(embeddings), SCAN_BLOCK_ROWS):
+        block = np.abs(np.asarray(embeddings[start:start + SCAN_BLOCK_ROWS], dtype=np.float32))
+        max_abs = np.maximum(max_abs, block.max(axis=0))
+    scales = np.where(max_abs > 0, max_abs / 127, 1).astype(np.float32)
+    for start in range(0, len(embeddings), SCAN_BLOCK_ROWS):
+        block = np.asarray(embeddings[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+        codes[start:start + len(block)] = np.clip(np.rint(block / scales), -127, 127)
+    return codes, scales
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the positions of the k largest scores, best first, in O(N + k log k)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+class ExactIndex:
+    """Brute-force inner-product search over every row of the corpus."""
+
+    kind = "exact"
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query: np.ndarray, k: int):
+        scores = scan(self.embeddings, query)
+        best = top_k(scores, k)
+        return best, scores[best]
+
+
+class QuantizedIndex:
+    """First-pass scan over quantized codes, then full-precision re-scoring of the best candidates."""
+
+    def __init__(self, embeddings, codes, scales=None, candidates: int = QUANT_RERANK_CANDIDATES):
+        self.embeddings = embeddings
+        self.codes = codes
+        self.scales = scales
+        self.candidates = candidates
+        self.kind = f"exact+{codes.dtype}"
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    def search(self, query: np.ndarray, k: int):
+        # x ~ codes * scales, so x . q ~ codes . (q * scales)
+        scaled = query * self.scales if self.scales is not None else query
+        approx = scan(self.codes, scaled.astype(np.float32))
+        ids = top_k(approx, max(k, self.candidates))
+        ids.sort()  # ascending row order keeps the gather sequential
+        scores = np.asarray(self.embeddings[ids], dtype=np.float32) @ query
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+
+class IVFIndex:
+    """Inverted-file index: only the rows of the closest clusters are scored."""
+
+    kind = "ivf"
+
+    def __init__(self, embeddings, centroids, list_offsets, list_ids, nprobe: int = IVF_NPROBE):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return len(self.embeddings)
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, n_iter: int = 20, sample_size: int = 100_000, seed: int = 0):
+        """Cluster the corpus with spherical k-means and bucket every row by its closest centroid."""
+        n_rows = len(embeddings)
+        if n_lists is None:
+            n_lists = int(np.sqrt(n_rows))
+        n_lists = max(1, min(n_lists, n_rows))
+
+        rng = np.random.default_rng(seed)
+        sample_ids = np.sort(rng.choice(n_rows, min(n_rows, sample_size), replace=False))
+        sample = np.asarray(embeddings[sample_ids], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            counts = np.bincount(assign, minlength=n_lists)
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            non_empty = counts > 0
+            sums = centroids.copy()  # empty clusters keep their previous centroid
+            sums[non_empty] = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+            centroids = sums / np.linalg.norm(sums, axis=1, keepdims=True)
+
+        assign = np.empty(n_rows, dtype=np.int64)
+        for start in range(0, n_rows, SCAN_BLOCK_ROWS):
+            block = np.asarray(embeddings[start:start + SCAN_BLOCK_ROWS], dtype=np.float32)
+            assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))]).astype(np.int64)
+        return cls(embeddings, centroids.astype(np.float32), list_offsets, list_ids)
+
+    def search(self, query: np.ndarray, k: int):
+        probe = top_k(self.centroids @ query, self.nprobe)
+        ids = np.concatenate([self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe])
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids.sort()  # ascending row order keeps the gather sequential
+        scores = np.asarray(self.embeddings[ids], dtype=np.float32) @ query
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+            n_rows=np.int64(len(self.embeddings)),
+        )
+
+    @classmethod
+    def load(cls, path: str, embeddings, nprobe: int = IVF_NPROBE):
+        data = np.load(path)
+        if int(data["n_rows"]) != len(embeddings):
+            raise ValueError(
+                f"IVF index {path} was built for {int(data['n_rows'])} rows but the corpus has "
+                f"{len(embeddings)}; rebuild it with scripts.build_index"
+            )
+        return cls(embeddings, data["centroids"], data["list_offsets"], data["list_ids"], nprobe=nprobe)
+
+
+def load_index(embeddings, path: str, backend: str = None, quantized=None):
+    """
+    Return the configured index for a corpus, falling back to exact search if no IVF file exists.
+    ``quantized`` is an optional ``(codes, scales)`` pair used for the exact backend's first pass.
+    """
+    backend = backend or VECTOR_INDEX_BACKEND
+    if backend == "ivf":
+        if os.path.exists(path):
+            return IVFIndex.load(path, embeddings)
+        print(f"IVF index {path} not found, falling back to exact search. Build it with `python -m scripts.build_index`.")
+    elif backend != "exact":
+        raise ValueError(f"Unknown VECTOR_INDEX_BACKEND '{backend}', expected 'exact' or 'ivf'")
+    if quantized is not None:
+        return QuantizedIndex(embeddings, *quantized)
+    return ExactIndex(embeddings)
@@ -0,0 +1,188 @@
+"""
+Lexical retrieval: BM25 and exact HCL-number lookup.
+
+Questions that name an act ("HCL 155/2009", "Legea nr.215/2001") are matched
+poorly by dense retrieval. ``LexicalIndex`` is an inverted index over a corpus'
+texts kept entirely in numpy arrays (CSR layout, no per-term Python objects):
+
+- ``terms`` (sorted) / ``term_offsets`` / ``doc_ids`` / ``term_freqs``: BM25 postings,
+- ``ref_codes`` (sorted) / ``ref_offsets`` / ``ref_doc_ids``: documents mentioning
+  each HCL, earliest mention first, extracted with the ``regex_hcl`` pattern of
+  ``creating_embeddings/final_servicii.py``.
+
+Indexes are built offline with ``python -m scripts.build_lexical_index`` and
+saved next to the embedding files.
+"""
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import List
+
+import numpy as np
+
+# Same pattern as creating_embeddings/final_servicii.py
+REGEX_HCL = re.compile(r'(?:HCLMT|HCL)\s*(?:nr\.)?\s*(\d+)[/\d\.]*[/\.](\d{4})')
+# Act numbers such as 215/2001 or 1.739/2006 are kept as one token
+TOKEN_RE = re.compile(r"\d+(?:[/.]\d+)+|\w+")
+MAX_TERM_LENGTH = 40
+
+# "dense" (embeddings only) or "hybrid" (BM25 fused with dense results, exact HCL lookups skip embedding)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE") or "dense"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def lexical_index_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}_lexical_index.npz")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, strip diacritics and split into words and act numbers."""
+    folded = unicodedata.normalize("NFKD", text.lower())
+    folded = "".join(c for c in folded if not unicodedata.combining(c))
+    return [t for t in TOKEN_RE.findall(folded) if len(t) <= MAX_TERM_LENGTH]
+
+
+def _match_ref(match) -> str:
+    # "<number>/<yy>", the HCL key format of final_servicii.py
+    return f"{int(match.group(1))}/{match.group(2)[-2:]}"
+
+
+def hcl_references(text: str) -> List[str]:
+    """HCL numbers mentioned in ``text``, in order of first mention."""
+    refs = []
+    for match in REGEX_HCL.finditer(text):
+        ref = _match_ref(match)
+        if ref not in refs:
+            refs.append(ref)
+    return refs
+
+
+def _ref_code(ref: str) -> int:
+    number, year = ref.split("/")
+    return int(number) * 100 + int(year)
+
+
+class LexicalIndex:
+    def __init__(self, terms, term_offsets, doc_ids, term_freqs, doc_lengths, ref_codes, ref_offsets, ref_doc_ids):
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.ref_codes = ref_codes
+        self.ref_offsets = ref_offsets
+        self.ref_doc_ids = ref_doc_ids
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, texts) -> "LexicalIndex":
+        postings = defaultdict(list)
+        mentions = defaultdict(list)
+        doc_lengths = np.zeros(len(texts), dtype=np.int32)
+        for doc_id in range(len(texts)):
+            text = str(texts[doc_id])
+            tokens = tokenize(text)
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+            for match in REGEX_HCL.finditer(text):
+                mentions[_ref_code(_match_ref(match))].append((match.start(), doc_id))
+
+        terms = np.array(sorted(postings), dtype=f"U{MAX_TERM_LENGTH}")
+        counts = [len(postings[t]) for t in terms]
+        term_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        doc_ids = np.fromiter((d for t in terms for d, _ in postings[t]), dtype=np.int32, count=term_offsets[-1])
+        term_freqs = np.fromiter((min(tf, 65535) for t in terms for _, tf in postings[t]), dtype=np.uint16, count=term_offsets[-1])
+
+        ref_codes = np.array(sorted(mentions), dtype=np.int64)
+        ref_lists = []
+        for code in ref_codes:
+            first_mention = {}
+            for position, doc_id in mentions[code]:
+                first_mention[doc_id] = min(position, first_mention.get(doc_id, position))
+            ref_lists.append(sorted(first_mention, key=lambda d: (first_mention[d], d)))
+        ref_offsets = np.concatenate([[0], np.cumsum([len(ids) for ids in ref_lists])]).astype(np.int64)
+        ref_doc_ids = np.array([d for ids in ref_lists for d in ids], dtype=np.int32)
+        return cls(terms, term_offsets, doc_ids, term_freqs, doc_lengths, ref_codes, ref_offsets, ref_doc_ids)
+
+    def _postings(self, term: str):
+        i = int(np.searchsorted(self.terms, term))
+        if i == len(self.terms) or self.terms[i] != term:
+            return None
+        start, end = self.term_offsets[i], self.term_offsets[i + 1]
+        return self.doc_ids[start:end], self.term_freqs[start:end]
+
+    def search(self, question: str, k: int):
+        """Top-k documents by BM25 score, as ``(indices, scores)``."""
+        ids, weights = [], []
+        n_docs = len(self.doc_lengths)
+        for term in set(tokenize(question)):
+            postings = self._postings(term)
+            if postings is None:
+                continue
+            doc_ids, tfs = postings
+            idf = np.log(1 + (n_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            tfs = tfs.astype(np.float32)
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[doc_ids] / self.avg_length)
+            ids.append(doc_ids)
+            weights.append(idf * tfs * (BM25_K1 + 1) / (tfs + norm))
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        scores = np.bincount(np.concatenate(ids), weights=np.concatenate(weights), minlength=n_docs)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        best = np.argpartition(scores, -k)[-k:]
+        best = best[np.argsort(scores[best])[::-1]]
+        return best.astype(np.int64), scores[best].astype(np.float32)
+
+    def lookup(self, refs: List[str], k: int) -> np.ndarray:
+        """Documents mentioning any of ``refs`` ("155/09"), earliest mention first, at most ``k``."""
+        found = {}  # insertion-ordered set
+        for ref in refs:
+            code = _ref_code(ref)
+            i = int(np.searchsorted(self.ref_codes, code))
+            if i < len(self.ref_codes) and self.ref_codes[i] == code:
+                found.update(dict.fromkeys(int(d) for d in self.ref_doc_ids[self.ref_offsets[i]:self.ref_offsets[i + 1]]))
+        return np.array(list(found)[:k], dtype=np.int64)
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            terms=self.terms,
+            term_offsets=self.term_offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths,
+            ref_codes=self.ref_codes,
+            ref_offsets=self.ref_offsets,
+            ref_doc_ids=self.ref_doc_ids,
+        )
+
+    @classmethod
+    def load(cls, path: str, n_docs: int) -> "LexicalIndex":
+        data = np.load(path)
+        if len(data["doc_lengths"]) != n_docs:
+            raise ValueError(
+                f"Lexical index {path} was built for {len(data['doc_lengths'])} documents but the corpus has "
+                f"{n_docs}; rebuild it with scripts.build_lexical_index"
+            )
+        return cls(*(data[key] for key in (
+            "terms", "term_offsets", "doc_ids", "term_freqs", "doc_lengths", "ref_codes", "ref_offsets", "ref_doc_ids"
+        )))
+
+
+def reciprocal_rank_fusion(rankings: List[np.ndarray], k: int, c: int = 60) -> np.ndarray:
+    """Merge several best-first rankings of document ids into the top ``k``."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[int(doc_id)] += 1.0 / (c + rank + 1)
+    return np.array(sorted(scores, key=scores.get, reverse=True)[:k], dtype=np.int64)
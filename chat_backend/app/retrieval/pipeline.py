@@ -0,0 +1,487 @@
+"""
+Retrieval-augmented answer generation for /chat.
+
+The pipeline never blocks the event loop:
+
+1. the question is embedded on the micro-batching thread (``query_batcher``),
+2. every corpus of the registry (``corpora.py``) is searched concurrently in the
+   default thread-pool executor,
+3. the answers of the routed corpora are generated concurrently with the async
+   Azure OpenAI client (``asyncio.gather``),
+4. the answers are fused by a final completion.
+
+Nothing heavy happens at import: the corpora, indexes and embedding model are
+loaded in the background at startup by the lifecycle manager (``core/lifecycle.py``).
+With ``EMBEDDING_SERVER_URL`` set they are not loaded at all: embedding, search and
+HCL lookups go to the shared embedding server (``remote.py``, ``server.py``).
+"""
+import asyncio
+import os
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import numpy as np
+from openai import AsyncAzureOpenAI
+
+from ..core.lifecycle import lifecycle
+from ..core.metrics import metrics
+from .batcher import EmbeddingBatcher
+from .context import build_context, record_context
+from .corpora import corpora
+from .embedding_cache import EmbeddingCache
+from .encoder import make_encoder
+from .index import VECTOR_QUANTIZATION, index_path, load_index
+from .lexical import RETRIEVAL_MODE, LexicalIndex, hcl_references, lexical_index_path, reciprocal_rank_fusion
+from .remote import embedding_server
+from .prompts import DUAL_PROMPT_TEMPLATE, FUSION_PROMPT_TEMPLATE
+from .routing import CACHED, DUAL, EXACT, SINGLE, choose_route, record_route
+from .semantic_cache import SEMANTIC_CACHE_ENABLED, SemanticCache
+from .segments import (
+    CORPUS_MAX_SEGMENTS,
+    Segment,
+    Source,
+    compact,
+    missing_segment_artifacts,
+    read_manifest,
+    remove_superseded,
+    segment_names,
+)
+from .store import load_corpus, load_quantized
+
+# Query encoder selected by EMBEDDING_BACKEND (see encoder.py)
+query_encoder = make_encoder()
+
+# Azure OpenAI client, created on first use so that the credentials loaded by
+# load_dotenv() in routes/chat.py are already in the environment
+class LLMClientSingleton:
+    _instance = None
+
+    @classmethod
+    def get_instance(cls) -> AsyncAzureOpenAI:
+        if cls._instance is None:
+            cls._instance = AsyncAzureOpenAI(
+                api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+                api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+                azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
+            )
+        return cls._instance
+
+def encode_questions(questions: List[str]) -> np.ndarray:
+    """Encode a batch of questions into normalized float32 vectors."""
+    return query_encoder.encode(questions)
+
+# Concurrent questions are encoded together (see EMBED_MAX_BATCH_SIZE / EMBED_MAX_WAIT_MS)
+query_batcher = EmbeddingBatcher(encode_questions)
+
+# Exact-match cache of question embeddings (see EMBEDDING_CACHE_CAPACITY / EMBEDDING_CACHE_PATH)
+embedding_cache = EmbeddingCache(query_encoder.name)
+
+# Every worker checks the manifests this often (while answering questions) and hot-swaps
+# the corpora appended to or compacted by another worker or offline
+CORPUS_POLL_SECONDS = float(os.getenv("CORPUS_POLL_SECONDS") or 5)
+
+# Filled by load_sources() in the background at startup (see core/lifecycle.py) and
+# replaced as a whole by reload_sources(); a request keeps the Source objects it started with
+sources: Dict[str, Source] = {}
+_manifests_checked = 0.0
+corpus_version = None
+semantic_cache = None
+_compacting = set()
+_reload_lock = asyncio.Lock()
+
+def check_sources() -> List[str]:
+    return [
+        path for config in corpora.values()
+        for path in missing_segment_artifacts(config.directory, config.name)
+    ]
+
+def open_segment(directory: str, segment_name: str) -> Segment:
+    """Open one segment with its vector index (VECTOR_INDEX_BACKEND, VECTOR_QUANTIZATION) and lexical index."""
+    corpus = load_corpus(directory, segment_name)
+    quantized = None
+    if VECTOR_QUANTIZATION != "none":
+        quantized = load_quantized(directory, segment_name, VECTOR_QUANTIZATION, corpus.version)
+    index = load_index(corpus.vectors, index_path(directory, segment_name), quantized=quantized)
+    lexical = None
+    if RETRIEVAL_MODE == "hybrid":
+        path = lexical_index_path(directory, segment_name)
+        if os.path.exists(path):
+            lexical = LexicalIndex.load(path, len(corpus))
+        else:
+            print(f"Lexical index {path} not found, using dense retrieval only. Build it with `python -m scripts.build_lexical_index`.")
+    return Segment(segment_name, corpus, index, lexical)
+
+def open_source(name: str, previous: Optional[Source] = None) -> Source:
+    """Open the segments of a corpus, reusing the ones ``previous`` already has open."""
+    directory = corpora[name].directory
+    opened = {segment.name: segment for segment in previous.segments} if previous else {}
+    manifest = read_manifest(directory, name)
+    segments = [opened.get(s) or open_segment(directory, s) for s in segment_names(directory, name)]
+    version = manifest["version"] if manifest else segments[0].corpus.version
+    source = Source(name, segments, version)
+    print(
+        f"Corpus {name} opened: {len(source)} documents in {len(segments)} segment(s) (version {version}, "
+        f"{segments[0].index.kind} index{', lexical index' if source.has_lexical else ''})"
+    )
+    return source
+
+def load_sources():
+    """Open the memory-mapped corpora (or swap in their new segments) and their indexes."""
+    global sources, corpus_version, semantic_cache
+    sources = {name: open_source(name, sources.get(name)) for name in corpora}
+
+    # Cached answers are only valid for the corpus versions they were generated from
+    corpus_version = ",".join(f"{name}:{sources[name].version}" for name in corpora)
+    if SEMANTIC_CACHE_ENABLED and semantic_cache is None:
+        semantic_cache = SemanticCache(corpus_version)
+
+def connect_embedding_server():
+    """Wait for the embedding server to finish loading and take over its corpus version."""
+    global corpus_version, semantic_cache
+    described = embedding_server.wait_ready()
+    corpus_version = ",".join(f"{d['name']}:{d['version']}" for d in described)
+    print(f"Using embedding server {embedding_server.url} (corpora {corpus_version})")
+    if SEMANTIC_CACHE_ENABLED and semantic_cache is None:
+        semantic_cache = SemanticCache(corpus_version)
+
+def track_corpus_version(version: str):
+    """Invalidate cached answers when the embedding server reports a new corpus version."""
+    global corpus_version
+    if version != corpus_version:
+        corpus_version = version
+        if semantic_cache is not None:
+            semantic_cache.set_corpus_version(version)
+
+async def reload_sources():
+    """Hot-swap the live corpora after segments were appended or compacted; in-flight requests are unaffected."""
+    if embedding_server is not None:
+        # One reload of the server swaps the corpora of every worker
+        described = await embedding_server.reload()
+        track_corpus_version(",".join(f"{d['name']}:{d['version']}" for d in described))
+        return described
+    loop = asyncio.get_running_loop()
+    async with _reload_lock:
+        await loop.run_in_executor(None, load_sources)
+        if semantic_cache is not None:
+            semantic_cache.set_corpus_version(corpus_version)
+        # Requests still holding the previous Source objects keep their mappings of the removed files
+        await loop.run_in_executor(None, remove_unused_segments)
+    for name, source in sources.items():
+        if len(source.segments) > CORPUS_MAX_SEGMENTS:
+            start_compaction(name)
+    return sources
+
+def remove_unused_segments():
+    for name, source in sources.items():
+        removed = remove_superseded(corpora[name].directory, name, [s.name for s in source.segments])
+        if removed:
+            print(f"Removed superseded segments of corpus {name}: {', '.join(removed)}")
+
+def manifests_changed() -> bool:
+    return any(
+        segment_names(corpora[name].directory, name) != [s.name for s in source.segments]
+        for name, source in sources.items()
+    )
+
+def poll_manifests():
+    """Reload in the background if a manifest changed, checking at most every CORPUS_POLL_SECONDS."""
+    global _manifests_checked
+    now = time.monotonic()
+    if not sources or now - _manifests_checked < CORPUS_POLL_SECONDS or _reload_lock.locked():
+        return
+    _manifests_checked = now
+    try:
+        changed = manifests_changed()
+    except (OSError, ValueError) as e:
+        print(f"Could not read the corpus manifests: {e}")
+        return
+    if changed:
+        asyncio.ensure_future(reload_changed_sources())
+
+async def reload_changed_sources():
+    try:
+        await reload_sources()
+    except Exception as e:
+        print(f"Reloading the corpora failed: {e}")
+
+def start_compaction(name: str) -> bool:
+    """Compact a corpus in the background and hot-swap the result; False if one is already running."""
+    if name in _compacting:
+        return False
+    _compacting.add(name)
+
+    async def run():
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, compact, corpora[name].directory, name)
+            await reload_sources()
+        except Exception as e:
+            print(f"Compaction of corpus {name} failed: {e}")
+        finally:
+            _compacting.discard(name)
+
+    asyncio.ensure_future(run())
+    return True
+
+async def compact_source(name: str) -> bool:
+    if embedding_server is not None:
+        return await embedding_server.compact(name)
+    return start_compaction(name)
+
+async def describe_corpora() -> List[Dict]:
+    if embedding_server is not None:
+        return await embedding_server.describe()
+    return describe_sources()
+
+def describe_sources() -> List[Dict]:
+    return [
+        {
+            "name": name,
+            "version": source.version,
+            "documents": len(source),
+            "segments": [{"name": s.name, "documents": len(s), "index": s.index.kind} for s in source.segments],
+            "compacting": name in _compacting,
+        }
+        for name, source in sources.items()
+    ]
+
+def load_model():
+    query_encoder.load()
+
+def warm_up():
+    """Run one encode so the first question does not pay for kernel compilation and allocations."""
+    encode_questions(["Care sunt taxele locale?"])
+
+if embedding_server is None:
+    lifecycle.add("sources", load_sources, check=check_sources)
+    lifecycle.add("model", load_model, check=query_encoder.missing_artifacts)
+    lifecycle.add("warmup", warm_up, after="model")
+else:
+    lifecycle.add("embedding-server", connect_embedding_server)
+
+def build_system_prompt(content: str) -> str:
+    return (
+        "Tu esti un asistent virtual menit sa raspunda la intrebarile venite de la public."
+        f"Trb sa raspunzi pe baza acestui context={content}"
+    )
+
+async def get_response(question: str, content: str) -> str:
+    """Call Azure OpenAI to generate a response given a prompt built on content."""
+    prompt = build_system_prompt(content)
+    print(f"prompt:{prompt}")
+    print(f"question:{question}")
+    chat_completion = await LLMClientSingleton.get_instance().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": prompt},
+            {"role": "user", "content": question}
+        ]
+    )
+    return chat_completion.choices[0].message.content
+
+async def stream_response(question: str, content: str) -> AsyncIterator[str]:
+    """Like get_response, but yields the completion token by token."""
+    stream = await LLMClientSingleton.get_instance().chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": build_system_prompt(content)},
+            {"role": "user", "content": question}
+        ],
+        stream=True
+    )
+    async for chunk in stream:
+        # Azure sends chunks without choices (e.g. content filter results)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+async def embed_question(question: str) -> np.ndarray:
+    """Normalized embedding of the question: cached if seen before, otherwise batched with concurrent requests."""
+    vector = embedding_cache.get(question)
+    if vector is not None:
+        return vector
+    loop = asyncio.get_running_loop()
+    if embedding_cache.shared is not None:
+        vector = await loop.run_in_executor(None, embedding_cache.get_shared, question)
+        if vector is not None:
+            return vector
+
+    embedding_cache.misses.inc()
+    if embedding_server is not None:
+        vector = await embedding_server.embed(question)
+    else:
+        vector = await asyncio.wrap_future(query_batcher.submit(question))
+    embedding_cache.put(question, vector)
+    if embedding_cache.shared is not None:
+        loop.run_in_executor(None, embedding_cache.put_shared, question, vector)
+    return vector
+
+def _retrieve(source: Source, question: str, question_embedding: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+    if not source.has_lexical:
+        top_indices, scores = source.search(question_embedding, k)
+        return [source.texts[int(idx)] for idx in top_indices], scores
+    # Hybrid: fuse the dense and BM25 rankings; each document keeps its dense similarity,
+    # which drives routing (one found only by BM25 gets the lowest similarity searched)
+    dense_indices, dense_scores = source.search(question_embedding, 2 * k)
+    lexical_indices = source.lexical_search(question, 2 * k)
+    top_indices = reciprocal_rank_fusion([dense_indices, lexical_indices], k)
+    similarity = dict(zip(dense_indices.tolist(), dense_scores.tolist()))
+    floor = float(dense_scores[-1]) if len(dense_scores) else 0.0
+    scores = np.array([similarity.get(int(idx), floor) for idx in top_indices], dtype=np.float32)
+    return [source.texts[int(idx)] for idx in top_indices], scores
+
+async def retrieve(source: Source, question: str, question_embedding: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+    """Top-k documents of one corpus and their similarities, searched off the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _retrieve, source, question, question_embedding, k)
+
+def _lookup_references(refs: List[str]) -> Dict[str, List[str]]:
+    found = {}
+    for name, source in sources.items():
+        if source.has_lexical:
+            ids = source.lookup(refs, corpora[name].top_k)
+            if len(ids):
+                found[name] = [source.texts[int(idx)] for idx in ids]
+    return found
+
+async def lookup_references(refs: List[str]) -> Dict[str, List[str]]:
+    """Documents of every corpus with a lexical index that mention one of ``refs``."""
+    if embedding_server is not None:
+        return await embedding_server.lookup(refs)
+    if not any(source.has_lexical for source in sources.values()):
+        return {}
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _lookup_references, refs)
+
+async def build_reference_prompt(question: str) -> Optional[Tuple[str, str]]:
+    """
+    If the question names HCL numbers found by the lexical indexes, build the final
+    prompt from the documents mentioning them, without embedding the question.
+    """
+    refs = hcl_references(question)
+    if not refs:
+        return None
+    found = await lookup_references(refs)
+    if not found:
+        return None
+
+    record_route(EXACT, list(found), len(corpora))
+    print(f"Route: {EXACT} {list(found)} for HCL {', '.join(refs)}")
+    if len(found) == 1:
+        name, docs = next(iter(found.items()))
+        return await source_prompt(name, docs, question), EXACT
+    return await combined_prompt(found, question), EXACT
+
+async def assemble_context(source: str, docs: List[str], budget: int) -> str:
+    """Deduplicate and trim retrieved passages (tokenizing runs in the executor)."""
+    loop = asyncio.get_running_loop()
+    context, stats = await loop.run_in_executor(None, build_context, docs, budget)
+    record_context(source, stats)
+    return context
+
+async def source_prompt(name: str, docs: List[str], question: str) -> str:
+    """Prompt answering ``question`` from one source's documents, with that source's template."""
+    config = corpora[name]
+    context = await assemble_context(name, docs, config.token_budget)
+    return config.prompt_template.format(docs=context, question=question)
+
+async def combined_prompt(docs_by_source: Dict[str, List[str]], question: str) -> str:
+    """One prompt over the documents of several sources, in registry order."""
+    names = [name for name in corpora if name in docs_by_source]
+    docs = [doc for name in names for doc in docs_by_source[name]]
+    budget = sum(corpora[name].token_budget for name in names)
+    return DUAL_PROMPT_TEMPLATE.format(docs=await assemble_context("dual", docs, budget), question=question)
+
+async def search_sources(question: str, question_embedding: np.ndarray) -> Dict[str, Tuple[List[str], np.ndarray]]:
+    """Top-k documents and similarities of every corpus, searched concurrently."""
+    if embedding_server is not None:
+        results, version = await embedding_server.retrieve(question, question_embedding)
+        track_corpus_version(version)
+        return results
+    poll_manifests()
+    live = sources
+    names = list(live)
+    results = await asyncio.gather(*(
+        retrieve(live[name], question, question_embedding, corpora[name].top_k) for name in names
+    ))
+    return dict(zip(names, results))
+
+async def build_final_prompt(question: str, question_embedding: np.ndarray) -> Tuple[str, str]:
+    """Run retrieval, routing and any per-source answers; return the final call's prompt and the route."""
+    # Search every corpus concurrently (cosine similarity on normalized vectors)
+    results = await search_sources(question, question_embedding)
+    names = [name for name in corpora if name in results]
+    docs = {name: results[name][0] for name in names}
+
+    # Decide how many LLM calls this question needs from the retrieval scores
+    top_scores = {name: float(np.max(results[name][1])) if len(results[name][1]) else 0.0 for name in names}
+    mode, routed = choose_route(top_scores)
+    record_route(mode, routed, len(top_scores))
+    print(f"Route: {mode} {routed} ({', '.join(f'{name}={score:.3f}' for name, score in top_scores.items())})")
+
+    # Build prompts only for the sources the route uses, from deduplicated, token-budgeted context
+    if mode == SINGLE:
+        return await source_prompt(routed[0], docs[routed[0]], question), mode
+    if mode == DUAL:
+        return await combined_prompt(docs, question), mode
+
+    # Generate the routed sources' answers concurrently, then fuse them in registry order
+    routed = [name for name in names if name in routed]
+    prompts = await asyncio.gather(*(source_prompt(name, docs[name], question) for name in routed))
+    responses = await asyncio.gather(*(get_response(question, prompt) for prompt in prompts))
+    return FUSION_PROMPT_TEMPLATE.format(question=question, responses="\n".join(responses)), mode
+
+async def lookup_cached_answer(question_embedding: np.ndarray) -> Optional[str]:
+    if semantic_cache is None:
+        return None
+    return await semantic_cache.lookup(question_embedding)
+
+def cache_answer(question: str, question_embedding: np.ndarray, answer: str):
+    if semantic_cache is not None and answer:
+        semantic_cache.store(question, question_embedding, answer)
+
+async def generate_ai_response(question: str) -> str:
+    """Generate an AI response by retrieving similar documents and fusing answers."""
+    started = time.perf_counter()
+    exact = await build_reference_prompt(question)
+    if exact is not None:
+        answer = await get_response(question, exact[0])
+        metrics.histogram("chat_pipeline_seconds", mode=EXACT).observe(time.perf_counter() - started)
+        return answer
+
+    question_embedding = await embed_question(question)
+    cached = await lookup_cached_answer(question_embedding)
+    if cached is not None:
+        record_route(CACHED, [], len(corpora))
+        metrics.histogram("chat_pipeline_seconds", mode=CACHED).observe(time.perf_counter() - started)
+        return cached
+
+    final_prompt, mode = await build_final_prompt(question, question_embedding)
+    answer = await get_response(question, final_prompt)
+    metrics.histogram("chat_pipeline_seconds", mode=mode).observe(time.perf_counter() - started)
+    cache_answer(question, question_embedding, answer)
+    return answer
+
+async def stream_ai_response(question: str) -> AsyncIterator[str]:
+    """Same pipeline as generate_ai_response, streaming the tokens of the final answer."""
+    started = time.perf_counter()
+    exact = await build_reference_prompt(question)
+    if exact is not None:
+        async for token in stream_response(question, exact[0]):
+            yield token
+        metrics.histogram("chat_pipeline_seconds", mode=EXACT).observe(time.perf_counter() - started)
+        return
+
+    question_embedding = await embed_question(question)
+    cached = await lookup_cached_answer(question_embedding)
+    if cached is not None:
+        record_route(CACHED, [], len(corpora))
+        yield cached
+        metrics.histogram("chat_pipeline_seconds", mode=CACHED).observe(time.perf_counter() - started)
+        return
+
+    final_prompt, mode = await build_final_prompt(question, question_embedding)
+    parts = []
+    async for token in stream_response(question, final_prompt):
+        parts.append(token)
+        yield token
+    metrics.histogram("chat_pipeline_seconds", mode=mode).observe(time.perf_counter() - started)
+    cache_answer(question, question_embedding, "".join(parts))
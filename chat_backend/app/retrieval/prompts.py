@@ -0,0 +1,53 @@
+"""
+Prompt templates of the /chat pipeline.
+
+Source templates take ``{question}`` and ``{docs}``; the fusion template takes
+``{question}`` and ``{responses}``, the per-source answers joined by newlines.
+"""
+
+general_guidelines = (
+    "In prima parte a raspunsului sa fie rescrisa in intrebarea, iar mai apoi sa vina raspunsul incepand cu urmatorul rand. "
+    "Raspunsul final sa aiba o structura care sa fie usor inteleasa si citita de orice user. "
+    "Mentine in raspunsul final explicit și complet denumirea exactă, numărul/anul și articolele precise ale tuturor actelor legislative și regulamentelor relevante (exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019). "
+    "Mentine in raspunsul final toate linkurile care apar in context fara sa modifici in niciun fel aceste linkuri (exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor). "
+    "Selectează explicit și strict articolele care pot ajuta la raspunsul unei intrebari care aprobă, abrogă sau modifică direct conținutul legislativ, indicatorii tehnico-economici sau regulamentele existente. "
+    "Nu utiliza diacritice, caractere speciale sau spații excesive. "
+    "Nu adăuga observații, comentarii personale sau precizări suplimentare care nu ajută la răspunderea întrebării."
+)
+
+# Define prompt templates for the sources and the fusion of their answers
+HCLS_PROMPT_TEMPLATE = (
+    "Întrebarea: {question}\n"
+    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
+    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
+    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
+    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
+    "Raspunde pe baza acestui context: {docs}"
+)
+SERVICII_PROMPT_TEMPLATE = (
+    "Întrebarea: {question}\n"
+    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
+    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
+    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
+    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
+    "Raspunde pe baza acest context: {docs}" 
+)
+FUSION_PROMPT_TEMPLATE = (
+    "Întrebarea: {question}\n"
+    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
+    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
+    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
+    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
+    "Raspunde la intrebare pe baza acestui context {responses} "
+)
+
+
+# In dual-source mode the contexts of every source are answered in a single call
+DUAL_PROMPT_TEMPLATE = HCLS_PROMPT_TEMPLATE
+
+# Templates a corpus can reference by name in CORPORA_CONFIG
+PROMPT_TEMPLATES = {
+    "hcl": HCLS_PROMPT_TEMPLATE,
+    "servicii": SERVICII_PROMPT_TEMPLATE,
+    "default": HCLS_PROMPT_TEMPLATE,
+}
@@ -0,0 +1,115 @@
+"""
+Client of the out-of-process embedding server (``server.py``).
+
+When ``EMBEDDING_SERVER_URL`` is set, API workers load neither the embedding
+model nor the corpora: questions are embedded, searched and looked up by the
+embedding server, so any number of uvicorn workers share one copy of the model.
+The URL is either ``unix:/path/to/embedding.sock`` (Unix domain socket) or
+``http://127.0.0.1:8100``.
+
+Every worker keeps one pooled ``httpx.AsyncClient`` (keep-alive connections, at
+most ``EMBEDDING_SERVER_CONNECTIONS``); concurrent questions from all workers are
+micro-batched by the server. Vectors travel as base64-encoded float32 bytes.
+"""
+import base64
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL")
+EMBEDDING_SERVER_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_TIMEOUT") or 30)
+EMBEDDING_SERVER_CONNECTIONS = int(os.getenv("EMBEDDING_SERVER_CONNECTIONS") or 32)
+# How long a worker waits at startup for the server to finish loading the model
+EMBEDDING_SERVER_STARTUP_TIMEOUT = float(os.getenv("EMBEDDING_SERVER_STARTUP_TIMEOUT") or 900)
+
+
+def encode_vector(vector: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+class EmbeddingServerClient:
+    def __init__(
+        self,
+        url: str,
+        timeout: float = EMBEDDING_SERVER_TIMEOUT,
+        max_connections: int = EMBEDDING_SERVER_CONNECTIONS,
+    ):
+        if url.startswith("unix:"):
+            self.uds = url[len("unix:"):]
+            self.base_url = "http://embedding-server"
+        else:
+            self.uds = None
+            self.base_url = url.rstrip("/")
+        self.url = url
+        self.timeout = timeout
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use, inside the worker's event loop
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=httpx.AsyncHTTPTransport(uds=self.uds, limits=self.limits, retries=1),
+                timeout=self.timeout,
+            )
+        return self._client
+
+    async def _post(self, path: str, payload: Optional[dict] = None):
+        response = await self.client.post(path, json=payload)
+        response.raise_for_status()
+        return response.json()
+
+    def wait_ready(self, timeout: float = EMBEDDING_SERVER_STARTUP_TIMEOUT) -> List[Dict]:
+        """Block until the server reports ready (it may still be loading the model); return its corpora."""
+        deadline = time.monotonic() + timeout
+        with httpx.Client(base_url=self.base_url, transport=httpx.HTTPTransport(uds=self.uds), timeout=self.timeout) as client:
+            while True:
+                try:
+                    if client.get("/ready").status_code == 200:
+                        response = client.get("/corpora")
+                        response.raise_for_status()
+                        return response.json()
+                except httpx.TransportError:
+                    pass  # not listening yet
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"Embedding server {self.url} not ready after {timeout:.0f}s")
+                time.sleep(2)
+
+    async def embed(self, question: str) -> np.ndarray:
+        data = await self._post("/embed", {"questions": [question]})
+        return decode_vector(data["vectors"][0])
+
+    async def retrieve(self, question: str, vector: np.ndarray) -> Tuple[Dict[str, Tuple[List[str], np.ndarray]], str]:
+        """Top-k documents and similarities of every corpus, and the corpus version they come from."""
+        data = await self._post("/retrieve", {"question": question, "vector": encode_vector(vector)})
+        results = {
+            name: (found["docs"], np.asarray(found["scores"], dtype=np.float32))
+            for name, found in data["results"].items()
+        }
+        return results, data["corpus_version"]
+
+    async def lookup(self, refs: List[str]) -> Dict[str, List[str]]:
+        return (await self._post("/lookup", {"refs": refs}))["results"]
+
+    async def describe(self) -> List[Dict]:
+        response = await self.client.get("/corpora")
+        response.raise_for_status()
+        return response.json()
+
+    async def reload(self) -> List[Dict]:
+        return await self._post("/corpora/reload")
+
+    async def compact(self, name: str) -> bool:
+        return (await self._post(f"/corpora/{name}/compact"))["status"] == "started"
+
+
+embedding_server = EmbeddingServerClient(EMBEDDING_SERVER_URL) if EMBEDDING_SERVER_URL else None
@@ -0,0 +1,64 @@
+"""
+Adaptive routing between answer modes.
+
+After retrieval, the best similarity score of each source decides how many LLM
+calls a question needs:
+
+- ``single``: one source clearly wins (it is the only one above
+  ``ROUTE_MIN_SCORE`` or beats the runner-up by ``ROUTE_SINGLE_MARGIN``); only that
+  source is answered, and its answer is final (1 call).
+- ``dual``: no source reaches ``ROUTE_MIN_SCORE``; the contexts of every source
+  are answered together in one prompt (1 call).
+- ``fusion``: several sources are relevant and close; each is answered separately
+  and the answers are fused (N + 1 calls, the original pipeline).
+
+``ROUTING_MODE=fusion`` disables routing and always runs the full pipeline.
+
+Questions answered from an exact HCL-number lookup (``RETRIEVAL_MODE=hybrid``)
+are reported as ``exact``: one call, no embedding. Questions answered from the
+semantic answer cache are reported as ``cached``: no call at all.
+"""
+import os
+from typing import Dict, List, Tuple
+
+from ..core.metrics import metrics
+
+ROUTING_MODE = os.getenv("ROUTING_MODE") or "auto"
+ROUTE_MIN_SCORE = float(os.getenv("ROUTE_MIN_SCORE") or 0.35)
+ROUTE_SINGLE_MARGIN = float(os.getenv("ROUTE_SINGLE_MARGIN") or 0.08)
+
+SINGLE = "single"
+DUAL = "dual"
+FUSION = "fusion"
+EXACT = "exact"
+CACHED = "cached"
+
+
+def llm_calls(mode: str, n_sources: int) -> int:
+    """Number of completions a mode needs."""
+    if mode == CACHED:
+        return 0
+    return n_sources + 1 if mode == FUSION else 1
+
+
+def choose_route(top_scores: Dict[str, float]) -> Tuple[str, List[str]]:
+    """Pick the answer mode and the sources it uses from each source's best similarity."""
+    ranked = sorted(top_scores, key=top_scores.get, reverse=True)
+    if ROUTING_MODE == FUSION or len(ranked) < 2:
+        return (FUSION if len(ranked) > 1 else SINGLE), ranked
+
+    best, runner_up = ranked[0], ranked[1]
+    relevant = [name for name in ranked if top_scores[name] >= ROUTE_MIN_SCORE]
+    if len(relevant) == 1 or (relevant and top_scores[best] - top_scores[runner_up] >= ROUTE_SINGLE_MARGIN):
+        return SINGLE, [best]
+    if not relevant:
+        return DUAL, ranked
+    return FUSION, relevant
+
+
+def record_route(mode: str, sources: List[str], n_sources: int):
+    """Count the chosen mode and the completions it saves compared to fusing all ``n_sources``."""
+    metrics.counter("chat_route_total", mode=mode).inc()
+    used = llm_calls(mode, len(sources))
+    metrics.counter("llm_calls_total").inc(used)
+    metrics.counter("llm_calls_saved_total").inc(llm_calls(FUSION, n_sources) - used)
@@ -0,0 +1,252 @@
+"""
+Segmented corpora: a base store plus append-only delta segments.
+
+Every segment is an ordinary memory-mapped store (see ``store.py``) named
+``<name>.seg-<timestamp>`` (appended documents) or ``<name>.gen-<timestamp>``
+(output of a compaction). ``<name>.manifest.json`` lists the live segments in
+order and the corpus version; without a manifest the corpus is the single
+``<name>`` store, as before.
+
+- ``append_segment`` writes new vectors and texts as a delta segment (with a
+  lexical index if the base segment has one) and publishes it in a new manifest.
+  Existing segments are never rewritten, so a running process can pick the delta
+  up without re-reading them.
+- ``compact`` merges all segments into one and publishes it under the same
+  version, so cached answers stay valid. The merged segments are listed under
+  ``superseded`` in the manifest.
+
+Manifests are replaced atomically (``os.replace``); readers see either the old or
+the new list of segments. ``remove_superseded`` deletes the files of superseded
+delta/compacted segments that the calling process no longer has open (the base
+``<name>`` store is kept). Workers that still map them are unaffected: a file
+that is memory-mapped stays readable after it is unlinked.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+from .index import IVFIndex, QUANTIZED_DTYPES, index_path, top_k
+from .lexical import LexicalIndex, lexical_index_path, reciprocal_rank_fusion
+from .store import (
+    CorpusStore,
+    corpus_exists,
+    missing_artifacts,
+    read_meta,
+    store_files,
+    write_corpus,
+    write_quantized,
+)
+
+CORPUS_MAX_SEGMENTS = int(os.getenv("CORPUS_MAX_SEGMENTS") or 8)
+
+# Serializes manifest updates within a process
+_manifest_lock = threading.Lock()
+
+
+def manifest_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.manifest.json")
+
+
+def read_manifest(directory: str, name: str) -> Optional[dict]:
+    path = manifest_path(directory, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def segment_names(directory: str, name: str) -> List[str]:
+    manifest = read_manifest(directory, name)
+    return manifest["segments"] if manifest else [name]
+
+
+def missing_segment_artifacts(directory: str, name: str) -> List[str]:
+    return [path for segment in segment_names(directory, name) for path in missing_artifacts(directory, segment)]
+
+
+def _write_manifest(
+    directory: str,
+    name: str,
+    segments: List[str],
+    version: Optional[str] = None,
+    superseded: Optional[Iterable[str]] = None,
+) -> dict:
+    if version is None:
+        digest = hashlib.sha1("|".join(read_meta(directory, s)["version"] for s in segments).encode("utf-8"))
+        version = digest.hexdigest()[:12]
+    if superseded is None:
+        superseded = (read_manifest(directory, name) or {}).get("superseded", [])
+    superseded = set(superseded) - set(segments) - {name}
+    manifest = {
+        "segments": segments,
+        "version": version,
+        "updated_at": datetime.utcnow().isoformat(),
+        "superseded": sorted(superseded),
+    }
+    path = manifest_path(directory, name)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
+
+
+def _new_segment_name(name: str, kind: str) -> str:
+    return f"{name}.{kind}-{datetime.utcnow():%Y%m%d%H%M%S%f}"
+
+
+def append_segment(directory: str, name: str, embeddings, texts) -> dict:
+    """Write ``embeddings``/``texts`` as a delta segment of corpus ``name`` and publish it; return the manifest."""
+    with _manifest_lock:
+        segments = segment_names(directory, name)
+        if not corpus_exists(directory, segments[0]):
+            raise ValueError(f"Corpus '{name}' has no memory-mapped store; convert it with scripts.convert_corpus first")
+        base = read_meta(directory, segments[0])
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.ndim != 2 or embeddings.shape[1] != base["dim"]:
+            raise ValueError(f"Expected vectors of dimension {base['dim']}, got shape {embeddings.shape}")
+
+        segment = _new_segment_name(name, "seg")
+        write_corpus(directory, segment, embeddings, texts, dtype=base["dtype"])
+        if os.path.exists(lexical_index_path(directory, segments[0])):
+            LexicalIndex.build(texts).save(lexical_index_path(directory, segment))
+        return _write_manifest(directory, name, segments + [segment])
+
+
+def compact(directory: str, name: str) -> dict:
+    """Merge every segment of ``name`` into one, with the same auxiliary indexes as the base segment."""
+    with _manifest_lock:
+        manifest = read_manifest(directory, name)
+    if manifest is None or len(manifest["segments"]) < 2:
+        return manifest
+
+    segments = manifest["segments"]
+    stores = [CorpusStore.open(directory, s) for s in segments]
+    vectors = np.concatenate([np.asarray(s.vectors, dtype=np.float32) for s in stores])
+    texts = [store.texts[i] for store in stores for i in range(len(store))]
+    merged = _new_segment_name(name, "gen")
+    write_corpus(directory, merged, vectors, texts, dtype=stores[0].vectors.dtype.name)
+
+    if os.path.exists(lexical_index_path(directory, segments[0])):
+        LexicalIndex.build(texts).save(lexical_index_path(directory, merged))
+    if os.path.exists(index_path(directory, segments[0])):
+        IVFIndex.build(CorpusStore.open(directory, merged).vectors).save(index_path(directory, merged))
+    for dtype in QUANTIZED_DTYPES:
+        if os.path.exists(os.path.join(directory, f"{segments[0]}.{dtype}.meta.json")):
+            write_quantized(directory, merged, dtype)
+
+    with _manifest_lock:
+        current = read_manifest(directory, name)
+        # Segments appended while compacting stay live after the merged one
+        appended = current["segments"][len(segments):]
+        superseded = current.get("superseded", []) + segments
+        if appended:
+            return _write_manifest(directory, name, [merged] + appended, superseded=superseded)
+        return _write_manifest(directory, name, [merged], version=manifest["version"], superseded=superseded)
+
+
+def segment_files(directory: str, segment: str) -> List[str]:
+    """Every file a segment may have: store, vector and lexical indexes, quantized vectors."""
+    return store_files(directory, segment, QUANTIZED_DTYPES) + [index_path(directory, segment), lexical_index_path(directory, segment)]
+
+
+def remove_superseded(directory: str, name: str, in_use: Iterable[str]) -> List[str]:
+    """Delete the files of the superseded segments of ``name`` not in ``in_use``; return the removed segments."""
+    with _manifest_lock:
+        manifest = read_manifest(directory, name)
+        if not manifest or not manifest.get("superseded"):
+            return []
+        in_use = set(in_use) | set(manifest["segments"])
+        # Only delta and compacted segments written by this module, never the base store
+        pattern = re.compile(re.escape(name) + r"\.(seg|gen)-\d+")
+        removed = [s for s in manifest["superseded"] if s not in in_use and pattern.fullmatch(s)]
+        for segment in removed:
+            for path in segment_files(directory, segment):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if removed:
+            kept = [s for s in manifest["superseded"] if s not in removed]
+            _write_manifest(directory, name, manifest["segments"], version=manifest["version"], superseded=kept)
+    return removed
+
+
+class Segment:
+    """One opened segment: its store, vector index and optional lexical index."""
+
+    def __init__(self, name: str, corpus, index, lexical: Optional[LexicalIndex] = None):
+        self.name = name
+        self.corpus = corpus
+        self.index = index
+        self.lexical = lexical
+
+    def __len__(self):
+        return len(self.corpus)
+
+
+class SegmentedTexts:
+    """Texts of several segments addressed by global document id."""
+
+    def __init__(self, segments: List[Segment], offsets: np.ndarray):
+        self.parts = [s.corpus.texts for s in segments]
+        self.offsets = offsets
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, i: int) -> str:
+        part = int(np.searchsorted(self.offsets, i, side="right")) - 1
+        return self.parts[part][i - int(self.offsets[part])]
+
+
+class Source:
+    """A retrieval source: its segments searched as one corpus with global document ids."""
+
+    def __init__(self, name: str, segments: List[Segment], version: str):
+        self.name = name
+        self.segments = segments
+        self.version = version
+        self.offsets = np.concatenate([[0], np.cumsum([len(s) for s in segments])]).astype(np.int64)
+        self.texts = SegmentedTexts(segments, self.offsets)
+        # Hybrid search needs every segment indexed, or it would only cover the indexed ones
+        self.has_lexical = all(s.lexical is not None for s in segments)
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def _merge(self, results, k: int):
+        if not results:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        ids = np.concatenate([found + self.offsets[i] for i, (found, _) in results])
+        scores = np.concatenate([scores for _, (_, scores) in results]).astype(np.float32)
+        best = top_k(scores, k)
+        return ids[best], scores[best]
+
+    def search(self, query: np.ndarray, k: int):
+        if len(self.segments) == 1:
+            return self.segments[0].index.search(query, k)
+        return self._merge([(i, s.index.search(query, k)) for i, s in enumerate(self.segments)], k)
+
+    def lexical_search(self, question: str, k: int) -> np.ndarray:
+        """
+        Global ids of the BM25 top ``k``, best first. Each segment scores with its own
+        document frequencies and average length, so raw scores of different segments
+        are not comparable: the per-segment rankings are fused by rank instead.
+        """
+        rankings = [
+            s.lexical.search(question, k)[0] + self.offsets[i]
+            for i, s in enumerate(self.segments) if s.lexical is not None
+        ]
+        if len(rankings) == 1:
+            return rankings[0]
+        return reciprocal_rank_fusion(rankings, k)
+
+    def lookup(self, refs: List[str], k: int) -> np.ndarray:
+        found = [s.lexical.lookup(refs, k) + self.offsets[i] for i, s in enumerate(self.segments) if s.lexical is not None]
+        return np.concatenate(found)[:k] if found else np.empty(0, dtype=np.int64)
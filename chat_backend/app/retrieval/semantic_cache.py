@@ -0,0 +1,190 @@
+"""
+Semantic answer cache (``SEMANTIC_CACHE_ENABLED=true``, off by default).
+
+Final answers are cached by the normalized embedding of their question. A new
+question whose embedding has cosine similarity >= ``SEMANTIC_CACHE_THRESHOLD``
+with a cached one gets the stored answer back, skipping retrieval and every LLM
+call.
+
+Entries are kept in a fixed-size matrix (one row per slot) with LRU eviction and
+a TTL, mirrored to the ``semantic_cache`` MongoDB collection so they survive
+restarts. Every entry records the corpus version it was answered from; entries
+of another version are dropped on load and when the corpus changes.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+import numpy as np
+
+from ..core.metrics import metrics
+from ..db.database import (
+    delete_semantic_cache_entries,
+    get_semantic_cache_entries,
+    purge_semantic_cache,
+    save_semantic_cache_entry,
+)
+
+# Off by default: the cache is shared by all users, and questions that differ by one
+# word (e.g. "casa" vs "teren") can be close enough to get each other's answer.
+# Enable it once SEMANTIC_CACHE_THRESHOLD is calibrated on real questions.
+SEMANTIC_CACHE_ENABLED = (os.getenv("SEMANTIC_CACHE_ENABLED") or "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD") or 0.95)
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY") or 5000)
+SEMANTIC_CACHE_TTL_HOURS = float(os.getenv("SEMANTIC_CACHE_TTL_HOURS") or 24)
+
+
+class SemanticCache:
+    def __init__(
+        self,
+        corpus_version: str,
+        capacity: int = SEMANTIC_CACHE_CAPACITY,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_HOURS * 3600,
+    ):
+        self.corpus_version = corpus_version
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._vectors = None  # (capacity, dim) matrix, allocated on first insert
+        self._valid = np.zeros(capacity, dtype=bool)
+        self._entries = [None] * capacity  # slot -> entry dict
+        self._lru = OrderedDict()  # entry id -> slot, least recently used first
+        self._loaded = False
+        self._load_lock = asyncio.Lock()
+        self._pending = set()  # background persistence tasks
+
+        self.hits = metrics.counter("semantic_cache_hits_total")
+        self.misses = metrics.counter("semantic_cache_misses_total")
+        self.hit_rate = metrics.gauge("semantic_cache_hit_rate")
+        self.size = metrics.gauge("semantic_cache_size")
+
+    def __len__(self):
+        return len(self._lru)
+
+    # In-memory operations (thread-safe, run in the executor)
+
+    def _clear(self):
+        self._valid[:] = False
+        self._entries = [None] * self.capacity
+        self._lru.clear()
+
+    def _evict(self, entry_id: str):
+        slot = self._lru.pop(entry_id)
+        self._valid[slot] = False
+        self._entries[slot] = None
+
+    def _insert(self, entry: dict, vector: np.ndarray) -> Optional[str]:
+        """Place an entry in a free slot; return the id of the evicted entry, if any."""
+        evicted = None
+        if self._vectors is None:
+            self._vectors = np.zeros((self.capacity, len(vector)), dtype=np.float32)
+        if len(self._lru) >= self.capacity:
+            evicted = next(iter(self._lru))
+            self._evict(evicted)
+        slot = int(np.flatnonzero(~self._valid)[0])
+        self._vectors[slot] = vector
+        self._valid[slot] = True
+        self._entries[slot] = entry
+        self._lru[entry["id"]] = slot
+        return evicted
+
+    def _lookup(self, vector: np.ndarray):
+        with self._lock:
+            if not self._lru:
+                return None, []
+            scores = np.where(self._valid, self._vectors @ vector, -np.inf)
+            slot = int(np.argmax(scores))
+            if scores[slot] < self.threshold:
+                return None, []
+            entry = self._entries[slot]
+            if time.time() - entry["created_ts"] > self.ttl_seconds:
+                self._evict(entry["id"])
+                return None, [entry["id"]]
+            self._lru.move_to_end(entry["id"])
+            return entry, []
+
+    def _record(self, hit: bool):
+        (self.hits if hit else self.misses).inc()
+        total = self.hits.value + self.misses.value
+        self.hit_rate.set(round(self.hits.value / total, 4) if total else 0)
+        self.size.set(len(self._lru))
+
+    # Async API used by the pipeline
+
+    async def load(self):
+        """Fill the cache from MongoDB once, dropping entries of other corpus versions."""
+        if self._loaded:
+            return
+        async with self._load_lock:
+            if self._loaded:
+                return
+            min_created_at = (datetime.utcnow() - timedelta(seconds=self.ttl_seconds)).isoformat()
+            await purge_semantic_cache(self.corpus_version, min_created_at)
+            docs = await get_semantic_cache_entries(self.corpus_version, self.capacity)
+            with self._lock:
+                for doc in reversed(docs):  # oldest first, so the newest end up most recently used
+                    entry = {
+                        "id": doc["id"],
+                        "answer": doc["answer"],
+                        "created_ts": datetime.fromisoformat(doc["created_at"]).timestamp(),
+                    }
+                    self._insert(entry, np.frombuffer(doc["vector"], dtype=np.float32))
+            self.size.set(len(self._lru))
+            self._loaded = True
+            print(f"Semantic cache loaded {len(docs)} entries for corpus version {self.corpus_version}")
+
+    async def lookup(self, vector: np.ndarray) -> Optional[str]:
+        """Return the cached answer of the most similar question, if it passes the threshold."""
+        await self.load()
+        loop = asyncio.get_running_loop()
+        entry, expired = await loop.run_in_executor(None, self._lookup, vector)
+        if expired:
+            self._persist(delete_semantic_cache_entries(expired))
+        self._record(entry is not None)
+        return entry["answer"] if entry else None
+
+    def store(self, question: str, vector: np.ndarray, answer: str):
+        """Cache an answer and persist it in the background."""
+        now = datetime.utcnow()
+        entry = {"id": str(uuid.uuid4()), "answer": answer, "created_ts": now.timestamp()}
+        with self._lock:
+            evicted = self._insert(entry, vector)
+        self.size.set(len(self._lru))
+        self._persist(save_semantic_cache_entry({
+            "id": entry["id"],
+            "question": question,
+            "vector": np.asarray(vector, dtype=np.float32).tobytes(),
+            "answer": answer,
+            "corpus_version": self.corpus_version,
+            "created_at": now.isoformat(),
+        }))
+        if evicted:
+            self._persist(delete_semantic_cache_entries([evicted]))
+
+    def set_corpus_version(self, corpus_version: str):
+        """Invalidate every entry when the retrieval corpus changes."""
+        if corpus_version == self.corpus_version:
+            return
+        with self._lock:
+            self._clear()
+        self.corpus_version = corpus_version
+        self.size.set(0)
+        self._persist(purge_semantic_cache(corpus_version))
+
+    def _persist(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._persisted)
+
+    def _persisted(self, task: asyncio.Task):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception():
+            print(f"Semantic cache persistence error: {task.exception()}")
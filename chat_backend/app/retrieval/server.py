@@ -0,0 +1,89 @@
+"""
+Embedding server: one process owning the embedding model and the corpora.
+
+API workers started with ``EMBEDDING_SERVER_URL`` (see ``remote.py``) send their
+questions here instead of loading the 7B model themselves, so the API tier can
+run many uvicorn workers with a single copy of the model and of the corpus
+matrices. Questions from every worker go through the same micro-batcher and
+question-embedding cache.
+
+Run it with a single worker (from chat_backend/):
+    python embedding_server.py --uds /run/gptprimarie/embedding.sock
+"""
+import asyncio
+import os
+
+# This process is the embedding server: load the model and corpora locally even if
+# the shared .env points the API workers at it
+os.environ.pop("EMBEDDING_SERVER_URL", None)
+
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.responses import JSONResponse
+
+from ..core.lifecycle import lifecycle, require_ready
+from ..core.metrics import metrics
+from ..models.models import EmbedRequest, LookupRequest, RetrieveRequest
+from . import pipeline
+from .corpora import corpora
+from .remote import decode_vector, encode_vector
+
+app = FastAPI(title="Embedding server", description="Question embedding and corpus search shared by the API workers")
+
+@app.on_event("startup")
+async def load_components():
+    lifecycle.check()
+    lifecycle.start()
+
+@app.get("/health")
+async def health_check():
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def readiness_check():
+    state = lifecycle.status()
+    if state["status"] != "ready":
+        return JSONResponse(status_code=503, content=state)
+    return state
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
+
+@app.post("/embed", dependencies=[Depends(require_ready)])
+async def embed(request: EmbedRequest):
+    """Normalized float32 embeddings of the questions, base64-encoded."""
+    vectors = await asyncio.gather(*(pipeline.embed_question(q) for q in request.questions))
+    return {"vectors": [encode_vector(v) for v in vectors]}
+
+@app.post("/retrieve", dependencies=[Depends(require_ready)])
+async def retrieve(request: RetrieveRequest):
+    """Top-k documents and similarities of every corpus for an embedded question."""
+    results = await pipeline.search_sources(request.question, decode_vector(request.vector))
+    return {
+        "corpus_version": pipeline.corpus_version,
+        "results": {
+            name: {"docs": [str(doc) for doc in docs], "scores": [float(s) for s in scores]}
+            for name, (docs, scores) in results.items()
+        },
+    }
+
+@app.post("/lookup", dependencies=[Depends(require_ready)])
+async def lookup(request: LookupRequest):
+    """Documents mentioning the given HCL numbers, per corpus with a lexical index."""
+    return {"results": await pipeline.lookup_references(request.refs)}
+
+@app.get("/corpora", dependencies=[Depends(require_ready)])
+async def get_corpora():
+    return pipeline.describe_sources()
+
+@app.post("/corpora/reload", dependencies=[Depends(require_ready)])
+async def reload_corpora():
+    await pipeline.reload_sources()
+    return pipeline.describe_sources()
+
+@app.post("/corpora/{name}/compact", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_ready)])
+async def compact_corpus(name: str):
+    if name not in corpora:
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    started = pipeline.start_compaction(name)
+    return {"corpus": name, "status": "started" if started else "already running"}
@@ -0,0 +1,212 @@
+"""
+Memory-mapped corpus store.
+
+A corpus ``<name>`` lives in ``EMBEDDINGS_DIR`` as four files:
+
+- ``<name>.vectors``     row-major matrix of pre-normalized vectors (float32 or float16)
+- ``<name>.texts.bin``   UTF-8 texts concatenated back to back
+- ``<name>.offsets.npy`` int64 offsets, text ``i`` is ``texts.bin[offsets[i]:offsets[i + 1]]``
+- ``<name>.meta.json``   row count, dimension, dtype and corpus version
+
+Everything is opened with ``np.memmap``: opening takes milliseconds, nothing is
+unpickled, and all uvicorn workers share the same pages through the OS cache.
+Stores are produced from the legacy ``.npy`` files with ``python -m scripts.convert_corpus``.
+
+A quantized copy of the vectors used for the first-pass scan (see
+``QuantizedIndex``) can sit next to them as ``<name>.<float16|int8>.vectors``, with
+``<name>.int8.scales.npy`` per-dimension scales and a ``.meta.json`` recording the
+corpus version it was derived from.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from .index import normalize, quantize
+
+EMBEDDINGS_DIR = os.getenv("EMBEDDINGS_DIR") or "/sdc/Embedings/site/chat_backend/app"
+
+SUPPORTED_DTYPES = ("float32", "float16")
+
+
+def _paths(directory: str, name: str):
+    base = os.path.join(directory, name)
+    return {
+        "vectors": f"{base}.vectors",
+        "texts": f"{base}.texts.bin",
+        "offsets": f"{base}.offsets.npy",
+        "meta": f"{base}.meta.json",
+    }
+
+
+class TextStore:
+    """Read-only sequence of texts backed by an offsets-indexed UTF-8 blob."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+
+class CorpusStore:
+    """Normalized vectors and their texts for one retrieval source."""
+
+    def __init__(self, name: str, vectors, texts, version: str):
+        self.name = name
+        self.vectors = vectors
+        self.texts = texts
+        self.version = version
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @classmethod
+    def open(cls, directory: str, name: str) -> "CorpusStore":
+        paths = _paths(directory, name)
+        meta = read_meta(directory, name)
+        vectors = np.memmap(paths["vectors"], dtype=meta["dtype"], mode="r", shape=(meta["count"], meta["dim"]))
+        offsets = np.load(paths["offsets"], mmap_mode="r")
+        if offsets[-1] > 0:
+            blob = np.memmap(paths["texts"], dtype=np.uint8, mode="r")
+        else:
+            blob = np.empty(0, dtype=np.uint8)  # np.memmap refuses empty files
+        return cls(name, vectors, TextStore(blob, offsets), meta["version"])
+
+    @classmethod
+    def from_legacy_npy(cls, directory: str, name: str) -> "CorpusStore":
+        """Load the original ``<name>_embeddings.npy`` / ``<name>_texts.npy`` pair fully into memory."""
+        embeddings = np.load(os.path.join(directory, f"{name}_embeddings.npy"))
+        texts = np.load(os.path.join(directory, f"{name}_texts.npy"), allow_pickle=True)
+        return cls(name, normalize(embeddings).astype("float32"), texts, "legacy")
+
+
+def corpus_exists(directory: str, name: str) -> bool:
+    return os.path.exists(_paths(directory, name)["meta"])
+
+
+def read_meta(directory: str, name: str) -> dict:
+    with open(_paths(directory, name)["meta"], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _quantized_paths(directory: str, name: str, dtype: str):
+    base = os.path.join(directory, f"{name}.{dtype}")
+    return {
+        "vectors": f"{base}.vectors",
+        "scales": f"{base}.scales.npy",
+        "meta": f"{base}.meta.json",
+    }
+
+
+def write_quantized(directory: str, name: str, dtype: str) -> dict:
+    """Derive the ``dtype`` quantized copy of an existing memory-mapped corpus."""
+    corpus = CorpusStore.open(directory, name)
+    codes, scales = quantize(corpus.vectors, dtype)
+    paths = _quantized_paths(directory, name, dtype)
+    meta = {
+        "count": int(codes.shape[0]),
+        "dim": int(codes.shape[1]),
+        "dtype": dtype,
+        "corpus_version": corpus.version,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+    codes.tofile(paths["vectors"] + ".tmp")
+    keys = ["vectors", "meta"]
+    if scales is not None:
+        with open(paths["scales"] + ".tmp", "wb") as f:
+            np.save(f, scales)
+        keys.insert(1, "scales")
+    with open(paths["meta"] + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    for key in keys:
+        os.replace(paths[key] + ".tmp", paths[key])
+    return meta
+
+
+def load_quantized(directory: str, name: str, dtype: str, corpus_version: str):
+    """Open the quantized copy as ``(codes, scales)``, or ``None`` if it is missing or stale."""
+    paths = _quantized_paths(directory, name, dtype)
+    if not os.path.exists(paths["meta"]):
+        print(f"No {dtype} vectors for '{name}'; write them with `python -m scripts.convert_corpus --quantize {dtype}`.")
+        return None
+    with open(paths["meta"], encoding="utf-8") as f:
+        meta = json.load(f)
+    if meta["corpus_version"] != corpus_version:
+        print(f"{dtype} vectors for '{name}' were built for version {meta['corpus_version']}, not {corpus_version}; ignoring them.")
+        return None
+    codes = np.memmap(paths["vectors"], dtype=dtype, mode="r", shape=(meta["count"], meta["dim"]))
+    scales = np.load(paths["scales"]) if dtype == "int8" else None
+    return codes, scales
+
+
+def store_files(directory: str, name: str, dtypes=()) -> list:
+    """Paths of the memory-mapped store ``name`` and of its quantized copies in ``dtypes``."""
+    paths = list(_paths(directory, name).values())
+    for dtype in dtypes:
+        paths += list(_quantized_paths(directory, name, dtype).values())
+    return paths
+
+
+def missing_artifacts(directory: str, name: str) -> list:
+    """Paths ``load_corpus`` needs for ``name`` that do not exist."""
+    if corpus_exists(directory, name):
+        required = _paths(directory, name).values()
+    else:
+        required = [os.path.join(directory, f"{name}_embeddings.npy"), os.path.join(directory, f"{name}_texts.npy")]
+    return [path for path in required if not os.path.exists(path)]
+
+
+def load_corpus(directory: str, name: str) -> CorpusStore:
+    """Open the memory-mapped store, falling back to the legacy ``.npy`` files."""
+    if corpus_exists(directory, name):
+        return CorpusStore.open(directory, name)
+    print(
+        f"No memory-mapped store for '{name}' in {directory}, loading legacy .npy files. "
+        "Convert them with `python -m scripts.convert_corpus`."
+    )
+    return CorpusStore.from_legacy_npy(directory, name)
+
+
+def write_corpus(directory: str, name: str, embeddings, texts, dtype: str = "float32") -> dict:
+    """Normalize ``embeddings`` and write them with ``texts`` in the memory-mapped format."""
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"Unsupported dtype '{dtype}', expected one of {SUPPORTED_DTYPES}")
+    if len(embeddings) != len(texts):
+        raise ValueError(f"{len(embeddings)} vectors but {len(texts)} texts")
+
+    paths = _paths(directory, name)
+    vectors = np.ascontiguousarray(normalize(np.asarray(embeddings, dtype=np.float32)).astype(dtype))
+    encoded = [str(t).encode("utf-8") for t in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+
+    digest = hashlib.sha1(vectors.tobytes())
+    digest.update(offsets.tobytes())
+    meta = {
+        "count": int(vectors.shape[0]),
+        "dim": int(vectors.shape[1]),
+        "dtype": dtype,
+        "version": digest.hexdigest()[:12],
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+    # Write everything to temporary files first; the meta file is swapped in
+    # last so readers never see a half-written corpus.
+    vectors.tofile(paths["vectors"] + ".tmp")
+    with open(paths["texts"] + ".tmp", "wb") as f:
+        for b in encoded:
+            f.write(b)
+    with open(paths["offsets"] + ".tmp", "wb") as f:
+        np.save(f, offsets)
+    with open(paths["meta"] + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    for key in ("vectors", "texts", "offsets", "meta"):
+        os.replace(paths[key] + ".tmp", paths[key])
+    return meta
@@ -1,13 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import StreamingResponse
+from typing import List, Dict, Optional
 
-from ..models.models import User, Conversation, UserStats, FeedbackStats
+from ..models.models import User, Conversation, UserStats, FeedbackStats, CorpusSegmentCreate
 from ..core.auth import get_admin_user
+from ..core.lifecycle import require_ready
+from ..retrieval import pipeline
+from ..retrieval.segments import append_segment
+from ..retrieval.corpora import corpora
 from ..db.database import (
     get_all_users,
-    get_all_conversations,
+    iter_all_conversations,
     get_user_statistics,
-    get_feedback_statistics
+    get_feedback_statistics,
+    get_global_statistics,
+    get_question_page,
+    decode_export_cursor,
+    iter_conversations_for_export,
+    iter_questions_for_export
 )
 
 router = APIRouter(prefix="/admin", tags=["admin"])
@@ -26,9 +41,17 @@ async def get_users(current_user: User = Depends(get_admin_user)):
 async def get_all_user_conversations(current_user: User = Depends(get_admin_user)):
     """
     Get all conversations from all users.
-    Only accessible to admin users.
+    Only accessible to admin users. The JSON array is streamed: conversations and
+    their messages are read a batch at a time, never the whole collection at once.
     """
-    return await get_all_conversations()
+    async def body():
+        separator = "["
+        async for conversation in iter_all_conversations():
+            yield separator + conversation.model_dump_json()
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+    return StreamingResponse(body(), media_type="application/json")
 
 # Admin routes for statistics
 @router.get("/stats/users", response_model=List[Dict])
@@ -54,72 +77,191 @@ async def get_dashboard_data(current_user: User = Depends(get_admin_user)):
     Get combined dashboard data for admin.
     Only accessible to admin users.
     """
-    users = await get_all_users()
-    user_stats = await get_user_statistics()
-    feedback_stats = await get_feedback_statistics()
-    
-    # Count total conversations and messages
-    total_conversations = sum(stat.get("conversation_count", 0) for stat in user_stats)
-    total_messages = sum(stat.get("message_count", 0) for stat in user_stats)
+    # Materialized counters: one global document and one per user
+    totals, user_stats = await asyncio.gather(get_global_statistics(), get_user_statistics())
     
     return {
-        "total_users": len(users),
-        "total_conversations": total_conversations,
-        "total_messages": total_messages,
-        "feedback_stats": feedback_stats,
+        "total_users": len(user_stats),
+        "total_conversations": totals["conversations"],
+        "total_messages": totals["messages"],
+        "feedback_stats": await get_feedback_statistics(totals),
         "user_stats": user_stats
     }
 
-@router.get("/questions", response_model=List[Dict])
-async def get_questions_with_feedback(current_user: User = Depends(get_admin_user)):
-    """Get all question-response pairs with their quality and structure feedback."""
-    # Retrieve all conversations
-    conversations = await get_all_conversations()
-    questions = []
-    
-    # Iterate over each conversation
-    for conv in conversations:
-        # Iterate over messages in the conversation
-        for i, msg in enumerate(conv.messages):
-            if msg.role == "user":
-                # Find the first assistant response following the user message
-                response_msg = None
-                for j in range(i + 1, len(conv.messages)):
-                    if conv.messages[j].role == "assistant":
-                        response_msg = conv.messages[j]
-                        break
-                
-                # Add all assistant messages, even without feedback
-                if response_msg is not None:
-                    feedback_data = {
-                        "quality_rating": None,
-                        "structure_rating": None,
-                        "quality_comment": "",
-                        "structure_comment": ""
-                    }
-                    
-                    if response_msg.feedback is not None:
-                        # Convert boolean to 1/0 for frontend display
-                        quality_rating = int(response_msg.feedback.qualityRating) if response_msg.feedback.qualityRating is not None else None
-                        structure_rating = int(response_msg.feedback.structureRating) if response_msg.feedback.structureRating is not None else None
-                        
-                        feedback_data = {
-                            "quality_rating": quality_rating,
-                            "structure_rating": structure_rating,
-                            "quality_comment": response_msg.feedback.qualityComment or "",
-                            "structure_comment": response_msg.feedback.structureComment or ""
-                        }
-                    
-                    questions.append({
-                        "id": response_msg.id,  # Include message ID for reference
-                        "conversation_id": conv.id,
-                        "question": msg.content,
-                        "response": response_msg.content,
-                        "asked_at": conv.created_at,
-                        "has_feedback": response_msg.feedback is not None,
-                        **feedback_data
-                    })
-    
-    # Sort by creation date, newest first
-    questions.sort(key=lambda x: x["asked_at"], reverse=True)
-    return questions
\ No newline at end of file
+@router.get("/questions", response_model=Dict)
+async def get_questions_with_feedback(
+    page_size: int = Query(50, ge=1, le=200),
+    has_feedback: Optional[bool] = None,
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    after: Optional[str] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    One page of question-response pairs with their quality and structure feedback,
+    newest first by default, and the total number of pairs matching has_feedback.
+    Pass the returned next_cursor as after to get the next page.
+    """
+    try:
+        questions, next_cursor, total = await get_question_page(page_size, has_feedback, order == "desc", after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {
+        "questions": questions,
+        "total": total,
+        "next_cursor": next_cursor,
+        "page_size": page_size
+    }
+
+# Admin streaming exports
+CONVERSATION_CSV_FIELDS = [
+    "conversation_id", "title", "user_id", "conversation_created_at", "seq", "message_id", "role", "content",
+    "message_created_at", "quality_rating", "structure_rating", "quality_comment", "structure_comment", "cursor"
+]
+QUESTION_CSV_FIELDS = [
+    "id", "conversation_id", "user_id", "question", "response", "asked_at", "has_feedback",
+    "quality_rating", "structure_rating", "quality_comment", "structure_comment", "cursor"
+]
+
+def conversation_csv_rows(conversation: Dict):
+    """One CSV row per message of an exported conversation."""
+    for message in conversation["messages"]:
+        feedback = message.get("feedback") or {}
+        yield {
+            "conversation_id": conversation["id"],
+            "title": conversation["title"],
+            "user_id": conversation["user_id"],
+            "conversation_created_at": conversation["created_at"],
+            "seq": message.get("seq"),
+            "message_id": message["id"],
+            "role": message["role"],
+            "content": message["content"],
+            "message_created_at": message.get("created_at"),
+            "quality_rating": feedback.get("qualityRating"),
+            "structure_rating": feedback.get("structureRating"),
+            "quality_comment": feedback.get("qualityComment"),
+            "structure_comment": feedback.get("structureComment"),
+            "cursor": conversation["cursor"]
+        }
+
+def export_response(records, export_format: str, fields: List[str], filename: str, rows=lambda record: [record]):
+    """Stream records as NDJSON (one JSON object per line) or CSV, one record at a time."""
+    async def ndjson():
+        async for record in records:
+            yield json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    async def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        async for record in records:
+            for row in rows(record):
+                writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    if export_format == "csv":
+        body, media_type = csv_lines(), "text/csv; charset=utf-8"
+    else:
+        body, media_type = ndjson(), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
+
+def check_export_cursor(after: Optional[str], count: int):
+    # Reject a bad cursor before the response starts streaming
+    if after:
+        try:
+            decode_export_cursor(after, count)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export/conversations")
+async def export_conversations(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Stream every conversation created in [since, until), optionally of one user, with its messages.
+    NDJSON has one conversation per line, CSV one message per row; resume with after=<last cursor>.
+    """
+    check_export_cursor(after, 1)
+    records = iter_conversations_for_export(user_id, since, until, after)
+    return export_response(records, export_format, CONVERSATION_CSV_FIELDS, "conversations", conversation_csv_rows)
+
+@router.get("/export/questions")
+async def export_questions(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    user_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Stream every answer given in [since, until), optionally to one user, with its question and
+    feedback (the pairs listed by /admin/questions). Resume with after=<last cursor>.
+    """
+    check_export_cursor(after, 2)
+    records = iter_questions_for_export(user_id, since, until, after)
+    return export_response(records, export_format, QUESTION_CSV_FIELDS, "questions")
+
+# Admin routes for the retrieval corpora
+@router.get("/corpora", response_model=List[Dict], dependencies=[Depends(require_ready)])
+async def get_corpora(current_user: User = Depends(get_admin_user)):
+    """
+    List the live corpora with their version and segments.
+    Only accessible to admin users.
+    """
+    return await pipeline.describe_corpora()
+
+@router.post("/corpora/reload", response_model=List[Dict], dependencies=[Depends(require_ready)])
+async def reload_corpora(current_user: User = Depends(get_admin_user)):
+    """
+    Hot-swap the corpora of this worker (or of the embedding server) to their
+    current manifests now; the other workers pick the change up within
+    CORPUS_POLL_SECONDS. Only accessible to admin users.
+    """
+    await pipeline.reload_sources()
+    return await pipeline.describe_corpora()
+
+@router.post("/corpora/{name}/segments", response_model=List[Dict], dependencies=[Depends(require_ready)])
+async def append_corpus_segment(
+    name: str,
+    segment: CorpusSegmentCreate,
+    current_user: User = Depends(get_admin_user)
+):
+    """
+    Append documents (texts and their embeddings) to a corpus as a new segment
+    and hot-swap it in without downtime (in the other workers within CORPUS_POLL_SECONDS).
+    Only accessible to admin users.
+    """
+    if name not in corpora:
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    if len(segment.texts) != len(segment.embeddings) or not segment.texts:
+        raise HTTPException(status_code=400, detail="texts and embeddings must be non-empty and of the same length")
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(None, append_segment, corpora[name].directory, name, segment.embeddings, segment.texts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await pipeline.reload_sources()
+    return await pipeline.describe_corpora()
+
+@router.post("/corpora/{name}/compact", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(require_ready)])
+async def compact_corpus(name: str, current_user: User = Depends(get_admin_user)):
+    """
+    Merge the segments of a corpus in the background, then hot-swap the result.
+    Only accessible to admin users.
+    """
+    if name not in corpora:
+        raise HTTPException(status_code=404, detail="Corpus not found")
+    started = await pipeline.compact_source(name)
+    return {"corpus": name, "status": "started" if started else "already running"}
@@ -1,22 +1,26 @@
 from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import httpx
+import json
+import time
 import uuid
-from typing import List
+from typing import List, Optional
 from datetime import datetime
 import os
 from dotenv import load_dotenv
-from sentence_transformers import SentenceTransformer
-import torch
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from openai import AzureOpenAI
 import uvicorn
 
+# Load environment variables from .env file before the package imports: retrieval/pipeline.py
+# and its modules read their settings at import time
+load_dotenv()
+
 # Conversation endpoints models, authentication, and database operations
 from ..models.models import (
     User,
     Conversation,
+    ConversationPage,
+    MessagePage,
     ConversationCreate,
     ConversationUpdate,
     ChatRequest,
@@ -24,31 +28,21 @@ from ..models.models import (
     FeedbackRequest
 )
 from ..core.auth import get_current_active_user
+from ..core.lifecycle import require_ready
+from ..core.metrics import metrics
+from ..retrieval.pipeline import generate_ai_response, stream_ai_response
+from ..db.write_behind import write_behind
 from ..db.database import (
     create_conversation,
     get_conversation,
-    get_user_conversations,
+    get_message_page,
+    get_user_conversation_summaries,
     update_conversation,
     delete_conversation,
     add_messages_to_conversation,
     update_message_feedback
 )
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Retrieve Azure OpenAI credentials from environment variables
-api_key = os.getenv("AZURE_OPENAI_API_KEY")
-api_version = os.getenv("AZURE_OPENAI_API_VERSION")
-azure_endpoint = os.getenv("AZURE_OPENAI_ENDPOINT")
-
-# Initialize the Azure OpenAI client
-client = AzureOpenAI(
-    api_key=api_key,
-    api_version=api_version,
-    azure_endpoint=azure_endpoint
-)
-
 # Create the FastAPI app and configure CORS
 app = FastAPI()
 app.add_middleware(
@@ -59,142 +53,17 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-####################################
-# Response Generation Functionality #
-####################################
-
-TOP_K = 5
-device_emb = "cuda:1" if torch.cuda.is_available() else "cpu"
-
-# Define a singleton for the SentenceTransformer model
-class ModelSingleton:
-    _instance = None
-
-    @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
-            # Optionally, use torch_dtype=torch.float16 (here we convert to half)
-            cls._instance = SentenceTransformer(
-                "Alibaba-NLP/gte-Qwen2-7B-instruct",
-                trust_remote_code=True
-            ).to(device_emb)
-        return cls._instance
-
-# Load precomputed embeddings and texts from .npy files
-hcl_embeddings_matrix = np.load('/sdc/Embedings/site/chat_backend/app/hcl_embeddings.npy')
-hcl_texts = np.load('/sdc/Embedings/site/chat_backend/app/hcl_texts.npy', allow_pickle=True)
-servicii_embeddings_matrix = np.load('/sdc/Embedings/site/chat_backend/app/servicii_embeddings.npy')
-servicii_texts = np.load('/sdc/Embedings/site/chat_backend/app/servicii_texts.npy', allow_pickle=True)
-
-print("NPY embeddings and texts loaded successfully.")
-
-def normalize(embeddings):
-    """Normalize embeddings row-wise."""
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    return embeddings / norms
-
-# Normalize the embeddings
-hcl_embeddings_norm = normalize(hcl_embeddings_matrix).astype('float32')
-servicii_embeddings_norm = normalize(servicii_embeddings_matrix).astype('float32')
-
-general_guidelines = (
-    "In prima parte a raspunsului sa fie rescrisa in intrebarea, iar mai apoi sa vina raspunsul incepand cu urmatorul rand. "
-    "Raspunsul final sa aiba o structura care sa fie usor inteleasa si citita de orice user. "
-    "Mentine in raspunsul final explicit și complet denumirea exactă, numărul/anul și articolele precise ale tuturor actelor legislative și regulamentelor relevante (exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019). "
-    "Mentine in raspunsul final toate linkurile care apar in context fara sa modifici in niciun fel aceste linkuri (exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor). "
-    "Selectează explicit și strict articolele care pot ajuta la raspunsul unei intrebari care aprobă, abrogă sau modifică direct conținutul legislativ, indicatorii tehnico-economici sau regulamentele existente. "
-    "Nu utiliza diacritice, caractere speciale sau spații excesive. "
-    "Nu adăuga observații, comentarii personale sau precizări suplimentare care nu ajută la răspunderea întrebării."
-)
-
-# Define prompt templates for the two sources and their fusion
-HCLS_PROMPT_TEMPLATE = (
-    "Întrebarea: {question}\n"
-    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
-    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
-    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
-    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
-    "Raspunde pe baza acestui context: {docs}"
-)
-SERVICII_PROMPT_TEMPLATE = (
-    "Întrebarea: {question}\n"
-    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
-    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
-    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
-    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
-    "Raspunde pe baza acest context: {docs}" 
-)
-FUSION_PROMPT_TEMPLATE = (
-    "Întrebarea: {question}\n"
-    f"Urmareste cu strictete aceste indrumari:{general_guidelines}\n"
-    "In raspunsul final sa ai 2 rubrici care au ajutat la a formula un raspuns:\n"
-    "**Referinte**:<exemplu: O.G. nr.99/2000, H.G. nr.1739/2006, Legea nr.61/1991, Legea nr.215/2001 art.36 alin.(4) lit.e, alin.(6) lit.a pct.7 și 11, H.C.L. nr.102/2009, H.C.L. nr.290/2022, O.U.G. nr.57/2019\n>"
-    "**Linkuri**:<exemplu: https://www.primariatm.ro/hcl/2009/155, https://servicii.primariatm.ro/dfmt-pj-declararea-instrainarii-terenurilor\n>"
-    "Raspunde la intrebare pe baza acestui context {servicii_response}\n{hcls_response} "
-)
-
-def get_response(question: str, content: str) -> str:
-    """Call Azure OpenAI to generate a response given a prompt built on content."""
-    prompt = (
-        "Tu esti un asistent virtual menit sa raspunda la intrebarile venite de la public."
-        f"Trb sa raspunzi pe baza acestui context={content}"
-    )
-    print(f"prompt:{prompt}")
-    print(f"question:{question}")
-    chat_completion = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": prompt},
-            {"role": "user", "content": question}
-        ]
-    )
-    return chat_completion.choices[0].message.content
-
-def generate_ai_response(question: str) -> str:
-    """Generate an AI response by retrieving similar documents and fusing answers."""
-    # Get the singleton model instance
-    model = ModelSingleton.get_instance()
-    
-    # Compute the embedding for the input question
-    question_embedding = model.encode([question], convert_to_numpy=True, device=device_emb)
-    question_embedding_norm = normalize(question_embedding).astype('float32')
-    
-    # Compute cosine similarities for both sets of embeddings
-    hcl_similarities = cosine_similarity(question_embedding_norm, hcl_embeddings_norm)[0]
-    servicii_similarities = cosine_similarity(question_embedding_norm, servicii_embeddings_norm)[0]
-    
-    # Retrieve top-K similar documents from each set
-    hcl_top_indices = np.argsort(hcl_similarities)[::-1][:TOP_K]
-    servicii_top_indices = np.argsort(servicii_similarities)[::-1][:TOP_K]
-    
-    hcl_docs_str = "\n\n".join([hcl_texts[int(idx)] for idx in hcl_top_indices])
-    servicii_docs_str = "\n\n".join([servicii_texts[int(idx)] for idx in servicii_top_indices])
-    
-    # Build prompts for each source based on retrieved context
-    hcls_prompt = HCLS_PROMPT_TEMPLATE.format(docs=hcl_docs_str, question=question)
-    servicii_prompt = SERVICII_PROMPT_TEMPLATE.format(docs=servicii_docs_str, question=question)
-    # print(hcls_prompt)
-    
-    # Generate responses using the Azure OpenAI client
-    hcls_response = get_response(question, hcls_prompt)
-    servicii_response = get_response(question, servicii_prompt)
-    print(hcls_response)
-    
-    # Fuse responses into a final answer
-    fusion_prompt = FUSION_PROMPT_TEMPLATE.format(
-        question=question,
-        servicii_response=servicii_response,
-        hcls_response=hcls_response,
-    )
-    final_response = get_response(question, fusion_prompt)
-    return final_response
-
 ##################################
 # Conversation CRUD and Chat API #
 ##################################
 
 router = APIRouter()
 
+async def sync_writes(user_id: str):
+    """Write-behind mode: make the user's queued chat turns visible before reading or changing conversations."""
+    if write_behind is not None:
+        await write_behind.sync(user_id)
+
 @router.post("/conversations", response_model=Conversation)
 async def create_new_conversation(
     conversation: ConversationCreate,
@@ -206,26 +75,53 @@ async def create_new_conversation(
         messages=[msg.dict() for msg in conversation.messages]
     )
 
-@router.get("/conversations", response_model=List[Conversation])
-async def read_conversations(current_user: User = Depends(get_current_active_user)):
-    return await get_user_conversations(current_user.id)
+@router.get("/conversations", response_model=ConversationPage)
+async def read_conversations(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user)
+):
+    """Summaries of the user's conversations, most recently updated first; follow next_cursor for more."""
+    await sync_writes(current_user.id)
+    try:
+        summaries, next_cursor = await get_user_conversation_summaries(current_user.id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"conversations": summaries, "next_cursor": next_cursor}
 
 @router.get("/conversations/{conversation_id}", response_model=Conversation)
 async def read_conversation(
     conversation_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
+    await sync_writes(current_user.id)
     conversation = await get_conversation(conversation_id, current_user.id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return conversation
 
+@router.get("/conversations/{conversation_id}/messages", response_model=MessagePage)
+async def read_conversation_messages(
+    conversation_id: str,
+    after: int = Query(-1, ge=-1),
+    limit: int = Query(100, ge=1, le=500),
+    current_user: User = Depends(get_current_active_user)
+):
+    """Messages with a sequence number above `after`, oldest first; follow next_after for more."""
+    await sync_writes(current_user.id)
+    page = await get_message_page(conversation_id, current_user.id, after, limit)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    messages, next_after = page
+    return {"messages": messages, "next_after": next_after}
+
 @router.put("/conversations/{conversation_id}", response_model=Conversation)
 async def update_existing_conversation(
     conversation_id: str,
     conversation_update: ConversationUpdate,
     current_user: User = Depends(get_current_active_user)
 ):
+    await sync_writes(current_user.id)
     conversation = await get_conversation(conversation_id, current_user.id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -248,74 +144,112 @@ async def delete_existing_conversation(
     conversation_id: str,
     current_user: User = Depends(get_current_active_user)
 ):
+    await sync_writes(current_user.id)
     success = await delete_conversation(conversation_id, current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Conversation not found")
     return None
 
-@router.post("/chat", response_model=ChatResponse)
+def new_message(role: str, content: str) -> dict:
+    """Create a message document with a unique ID."""
+    return {
+        "id": str(uuid.uuid4()),
+        "role": role,
+        "content": content,
+        "feedback": None
+    }
+
+async def save_chat_turn(request: ChatRequest, user_message: dict, ai_message: dict, user_id: str) -> str:
+    """Append a question/answer pair to the request's conversation (or a new one); return its ID."""
+    # The text of the first message becomes the title of a conversation still named "New Conversation"
+    title = request.message[:30] + "..." if len(request.message) > 30 else request.message
+    messages = [user_message, ai_message]
+    if write_behind is not None:
+        # Answer now; the turn is written by the next flush
+        conversation_id = request.conversation_id or str(uuid.uuid4())
+        await write_behind.submit(conversation_id, user_id, title, messages)
+        return conversation_id
+    
+    if request.conversation_id and await add_messages_to_conversation(
+        conversation_id=request.conversation_id,
+        messages=messages,
+        user_id=user_id,
+        title=title
+    ):
+        return request.conversation_id
+    
+    # Otherwise, create a new conversation
+    conversation = await create_conversation(
+        user_id=user_id,
+        title=title,
+        messages=messages
+    )
+    return conversation.id
+
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(require_ready)])
 async def chat(
     request: ChatRequest,
     current_user: User = Depends(get_current_active_user)
 ):
-    # Create a user message with a unique ID
-    user_message = {
-        "id": str(uuid.uuid4()),
-        "role": "user",
-        "content": request.message,
-        "feedback": None
-    }
+    user_message = new_message("user", request.message)
     
     # Directly generate the AI response using the integrated functionality
     try:
-        response_text = generate_ai_response(request.message)
+        response_text = await generate_ai_response(request.message)
     except Exception as e:
         response_text = f"AI service error: {e}"
     
-    ai_message = {
-        "id": str(uuid.uuid4()),
-        "role": "assistant",
-        "content": response_text,
-        "feedback": None
-    }
-    
-    # If a conversation_id is provided, try to update existing conversation
-    if request.conversation_id:
-        conversation = await get_conversation(request.conversation_id, current_user.id)
-        if conversation:
-            # If the conversation title is the default, update it with the text of the first message
-            if conversation.title == "New Conversation":
-                new_title = request.message[:30] + "..." if len(request.message) > 30 else request.message
-                await update_conversation(
-                    conversation_id=request.conversation_id,
-                    update_data={"title": new_title},
-                    user_id=current_user.id
-                )
-            await add_messages_to_conversation(
-                conversation_id=request.conversation_id,
-                messages=[user_message, ai_message],
-                user_id=current_user.id
-            )
-            return ChatResponse(
-                message=response_text,
-                conversation_id=request.conversation_id
-            )
-    
-    # Otherwise, create a new conversation
-    title = request.message[:30] + "..." if len(request.message) > 30 else request.message
-    conversation = await create_conversation(
-        user_id=current_user.id,
-        title=title,
-        messages=[]
-    )
-    await add_messages_to_conversation(
-        conversation_id=conversation.id,
-        messages=[user_message, ai_message],
-        user_id=current_user.id
-    )
+    ai_message = new_message("assistant", response_text)
+    conversation_id = await save_chat_turn(request, user_message, ai_message, current_user.id)
     return ChatResponse(
         message=response_text,
-        conversation_id=conversation.id
+        conversation_id=conversation_id
+    )
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@router.post("/chat/stream", dependencies=[Depends(require_ready)])
+async def chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    Streaming variant of /chat.
+    Emits `token` events with the final answer as it is generated, then a `done`
+    event with the conversation and message IDs once the turn has been saved.
+    """
+    user_message = new_message("user", request.message)
+
+    async def event_stream():
+        started = time.perf_counter()
+        parts = []
+        try:
+            async for token in stream_ai_response(request.message):
+                if not parts:
+                    metrics.histogram("chat_stream_ttft_seconds").observe(time.perf_counter() - started)
+                parts.append(token)
+                yield sse_event("token", {"content": token})
+        except Exception as e:
+            print(f"Streaming error: {e}")
+            yield sse_event("error", {"detail": f"AI service error: {e}"})
+            if not parts:
+                parts.append(f"AI service error: {e}")
+        metrics.histogram("chat_stream_total_seconds").observe(time.perf_counter() - started)
+
+        ai_message = new_message("assistant", "".join(parts))
+        conversation_id = await save_chat_turn(request, user_message, ai_message, current_user.id)
+        yield sse_event("done", {
+            "conversation_id": conversation_id,
+            "user_message_id": user_message["id"],
+            "message_id": ai_message["id"]
+        })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
 @router.post("/feedback", status_code=status.HTTP_204_NO_CONTENT)
@@ -323,6 +257,7 @@ async def submit_feedback(
     feedback: FeedbackRequest,
     current_user: User = Depends(get_current_active_user)
 ):
+    await sync_writes(current_user.id)
     print(f"Received feedback request: {feedback}")
     print(f"Feedback data: {feedback.feedback}")
     
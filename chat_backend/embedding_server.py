@@ -0,0 +1,17 @@
+import argparse
+
+import uvicorn
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (EMBEDDINGS_DIR, EMBEDDING_BACKEND, ...)
+load_dotenv()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embedding and search server shared by the API workers")
+    parser.add_argument("--uds", default=None, help="Unix domain socket to listen on (API workers: EMBEDDING_SERVER_URL=unix:<path>)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+
+    # A single worker: this process holds the only copy of the model
+    uvicorn.run("app.retrieval.server:app", uds=args.uds, host=args.host, port=args.port, workers=1)
@@ -0,0 +1,50 @@
+"""
+Append new documents to a corpus as a delta segment.
+
+Usage (from chat_backend/):
+    python -m scripts.append_corpus --corpus hcl --embeddings new_embeddings.npy --texts new_texts.npy
+    python -m scripts.append_corpus --corpus hcl --compact
+
+The segment is published in ``<corpus>.manifest.json``; running backends pick it
+up with ``POST /admin/corpora/reload`` without restarting. ``--compact`` merges
+every segment into one (the backend also compacts on its own once a corpus has
+more than ``CORPUS_MAX_SEGMENTS`` segments).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.retrieval.segments import append_segment, compact
+from app.retrieval.store import EMBEDDINGS_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", required=True)
+    parser.add_argument("--embeddings", help=".npy file with the new documents' embeddings")
+    parser.add_argument("--texts", help=".npy file with the new documents' texts")
+    parser.add_argument("--compact", action="store_true", help="merge all segments instead of appending")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.compact:
+        manifest = compact(args.embeddings_dir, args.corpus)
+    else:
+        if not args.embeddings or not args.texts:
+            parser.error("--embeddings and --texts are required unless --compact is given")
+        embeddings = np.load(args.embeddings)
+        texts = np.load(args.texts, allow_pickle=True)
+        manifest = append_segment(args.embeddings_dir, args.corpus, embeddings, texts)
+    if manifest is None:
+        print(f"{args.corpus}: nothing to compact")
+        return
+    print(
+        f"{args.corpus}: version {manifest['version']}, {len(manifest['segments'])} segment(s), "
+        f"written in {time.perf_counter() - start:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare query encoder backends with the current full-precision model.
+
+Usage (from chat_backend/):
+    python -m scripts.benchmark_encoder --corpus hcl --backends full cpu-int8 distilled \
+        [--questions questions.txt] [--threads 4 8]
+
+The first backend is the reference. For every backend (and every ``--threads``
+setting of the CPU backends) the script reports the load time, p50/p95 latency of
+single questions and of one batch, the mean cosine with the reference vectors and
+the top-k retrieval agreement with the reference on ``--corpus``. Backends are
+loaded one after the other, so only one model is in memory at a time.
+"""
+import argparse
+import gc
+import time
+
+import numpy as np
+import torch
+
+from app.retrieval.encoder import ENCODER_BACKENDS, make_encoder
+from app.retrieval.index import ExactIndex
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+SAMPLE_QUESTIONS = [
+    "Care sunt taxele locale pentru o casa?",
+    "Cum obtin certificatul de urbanism?",
+    "Ce acte sunt necesare pentru autorizatia de construire?",
+    "Unde se plateste impozitul pe autoturism?",
+    "Ce prevede HCL nr. 155/2009?",
+    "Cum se inregistreaza o asociatie de proprietari?",
+    "Care este programul de lucru al serviciului de stare civila?",
+    "Cum pot contesta o amenda de circulatie?",
+    "Ce ajutoare sociale ofera primaria?",
+    "Cum se obtine avizul pentru o terasa?",
+    "Care sunt scutirile de impozit pentru persoanele cu handicap?",
+    "Cum se face programarea pentru casatorie?",
+    "Ce documente trebuie pentru inscrierea la cresa?",
+    "Cum se solicita ridicarea deseurilor voluminoase?",
+    "Care este tariful pentru parcarea de resedinta?",
+    "Unde depun o petitie catre primarie?",
+]
+
+
+def measure(encoder, questions, reference, truth, index, k, label):
+    encoder.encode(questions[:1])  # warm-up
+    latencies = []
+    vectors = []
+    for question in questions:
+        start = time.perf_counter()
+        vectors.append(encoder.encode([question])[0])
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    encoder.encode(questions)
+    batch_ms = (time.perf_counter() - start) * 1000
+    latencies = np.array(latencies) * 1000
+
+    vectors = np.stack(vectors)
+    cosine = float(np.mean(np.sum(vectors * reference, axis=1)))
+    hits = sum(len(set(index.search(v, k)[0].tolist()) & set(t.tolist())) for v, t in zip(vectors, truth))
+    print(
+        f"{label:<28} p50={np.percentile(latencies, 50):.0f}ms  p95={np.percentile(latencies, 95):.0f}ms  "
+        f"batch of {len(questions)}={batch_ms:.0f}ms  cosine={cosine:.3f}  top-{k} agreement={hits / (len(questions) * k):.3f}"
+    )
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", default="hcl")
+    parser.add_argument("--backends", nargs="+", default=["full", "cpu-int8"], choices=ENCODER_BACKENDS)
+    parser.add_argument("--questions", default=None, help="text file with one question per line")
+    parser.add_argument("--threads", type=int, nargs="+", default=[0], help="intra-op threads of CPU backends (0: torch default)")
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+    else:
+        questions = SAMPLE_QUESTIONS
+    index = ExactIndex(np.asarray(load_corpus(args.embeddings_dir, args.corpus).vectors, dtype=np.float32))
+    default_threads = torch.get_num_threads()
+    print(f"{args.corpus}: {len(index)} documents, {len(questions)} questions, reference backend '{args.backends[0]}'")
+
+    reference = truth = None
+    for backend in args.backends:
+        encoder = make_encoder(backend)
+        start = time.perf_counter()
+        encoder.load()
+        print(f"{backend}: {encoder.name} loaded on {encoder.device} in {time.perf_counter() - start:.1f}s")
+
+        if reference is None:
+            reference = encoder.encode(questions)
+            truth = [index.search(v, args.k)[0] for v in reference]
+        for threads in args.threads if encoder.device == "cpu" else [0]:
+            torch.set_num_threads(threads or default_threads)
+            label = f"{backend} ({threads or default_threads} threads)" if encoder.device == "cpu" else backend
+            measure(encoder, questions, reference, truth, index, args.k, label)
+
+        del encoder
+        gc.collect()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Compare retrieval backends against the original brute-force path.
+
+Usage (from chat_backend/):
+    python -m scripts.benchmark_index --corpus hcl [--queries questions.npy] [--nprobe 4 8 16]
+
+The baseline reproduces the previous implementation (cosine similarity against
+every row followed by a full ``np.argsort``). For each backend the script
+reports recall@k against that baseline and p50/p95 latency per query.
+Without ``--queries`` it perturbs random corpus rows to simulate questions.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.retrieval.index import ExactIndex, IVFIndex, index_path, normalize
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+
+def brute_force(embeddings, query, k):
+    scores = embeddings @ query
+    return np.argsort(scores)[::-1][:k]
+
+
+def run(label, search, queries, truth, k):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[:k].tolist()) & set(expected.tolist()))
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{label:<18} recall@{k}={hits / (len(queries) * k):.3f}  "
+        f"p50={np.percentile(latencies, 50):.2f}ms  p95={np.percentile(latencies, 95):.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", default="hcl")
+    parser.add_argument("--queries", default=None, help=".npy file with real question embeddings")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    embeddings = np.asarray(load_corpus(args.embeddings_dir, args.corpus).vectors, dtype=np.float32)
+    if args.queries:
+        queries = normalize(np.load(args.queries)).astype("float32")
+    else:
+        rng = np.random.default_rng(0)
+        rows = embeddings[rng.choice(len(embeddings), args.n_queries)]
+        queries = normalize(rows + rng.normal(scale=0.5 / np.sqrt(rows.shape[1]), size=rows.shape)).astype("float32")
+
+    print(f"{args.corpus}: {len(embeddings)} rows x {embeddings.shape[1]} dims, {len(queries)} queries")
+    truth = [brute_force(embeddings, q, args.k) for q in queries]
+    run("brute-force argsort", lambda q: brute_force(embeddings, q, args.k), queries, truth, args.k)
+
+    exact = ExactIndex(embeddings)
+    run("exact argpartition", lambda q: exact.search(q, args.k)[0], queries, truth, args.k)
+
+    path = index_path(args.embeddings_dir, args.corpus)
+    if not os.path.exists(path):
+        print(f"No IVF index at {path}; run `python -m scripts.build_index --corpus {args.corpus}` first.")
+        return
+    ivf = IVFIndex.load(path, embeddings)
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        run(f"ivf nprobe={nprobe}", lambda q: ivf.search(q, args.k)[0], queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
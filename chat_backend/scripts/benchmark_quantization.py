@@ -0,0 +1,73 @@
+"""
+Compare quantized first-pass scans with the float32 exact path.
+
+Usage (from chat_backend/):
+    python -m scripts.benchmark_quantization --corpus hcl [--queries questions.npy] [--candidates 20 50 100]
+
+For the float32 matrix and its float16 and int8 copies the script reports the
+memory footprint of the scanned vectors, p50/p95 search latency and top-k
+agreement with float32 exact search, both for the quantized scan alone and with
+full-precision re-scoring of the best candidates (``QuantizedIndex``).
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.retrieval.index import QUANTIZED_DTYPES, ExactIndex, QuantizedIndex, normalize, quantize, scan, top_k
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+
+def scan_only(codes, scales, query, k):
+    scaled = query * scales if scales is not None else query
+    return top_k(scan(codes, scaled.astype(np.float32)), k)
+
+
+def run(label, search, queries, truth, k, footprint):
+    latencies, hits = [], 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        found = search(query)
+        latencies.append(time.perf_counter() - start)
+        hits += len(set(found[:k].tolist()) & set(expected.tolist()))
+    latencies = np.array(latencies) * 1000
+    print(
+        f"{label:<26} {footprint / 2**20:>9.1f}MB  top-{k} agreement={hits / (len(queries) * k):.3f}  "
+        f"p50={np.percentile(latencies, 50):.2f}ms  p95={np.percentile(latencies, 95):.2f}ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", default="hcl")
+    parser.add_argument("--queries", default=None, help=".npy file with real question embeddings")
+    parser.add_argument("--n-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 50, 100])
+    args = parser.parse_args()
+
+    embeddings = np.asarray(load_corpus(args.embeddings_dir, args.corpus).vectors, dtype=np.float32)
+    if args.queries:
+        queries = normalize(np.load(args.queries)).astype("float32")
+    else:
+        rng = np.random.default_rng(0)
+        rows = embeddings[rng.choice(len(embeddings), args.n_queries)]
+        queries = normalize(rows + rng.normal(scale=0.5 / np.sqrt(rows.shape[1]), size=rows.shape)).astype("float32")
+
+    print(f"{args.corpus}: {len(embeddings)} rows x {embeddings.shape[1]} dims, {len(queries)} queries")
+    exact = ExactIndex(embeddings)
+    truth = [exact.search(q, args.k)[0] for q in queries]
+    run("float32 exact", lambda q: exact.search(q, args.k)[0], queries, truth, args.k, embeddings.nbytes)
+
+    for dtype in QUANTIZED_DTYPES:
+        codes, scales = quantize(embeddings, dtype)
+        footprint = codes.nbytes + (scales.nbytes if scales is not None else 0)
+        run(f"{dtype} scan only", lambda q: scan_only(codes, scales, q, args.k), queries, truth, args.k, footprint)
+        for candidates in args.candidates:
+            index = QuantizedIndex(embeddings, codes, scales, candidates=candidates)
+            run(f"{dtype} + rescore top-{candidates}", lambda q: index.search(q, args.k)[0], queries, truth, args.k, footprint)
+
+
+if __name__ == "__main__":
+    main()
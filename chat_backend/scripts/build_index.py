@@ -0,0 +1,42 @@
+"""
+Build the IVF retrieval index for one or more corpora.
+
+Usage (from chat_backend/):
+    python -m scripts.build_index --corpus hcl --corpus servicii [--n-lists 256]
+
+The index is written next to the embedding files as ``<corpus>_ivf_index.npz``
+and is picked up by the backend when ``VECTOR_INDEX_BACKEND=ivf``.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.retrieval.index import IVFIndex, index_path
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", action="append", default=None, help="corpus name (default: hcl and servicii)")
+    parser.add_argument("--n-lists", type=int, default=None, help="number of clusters (default: sqrt(N))")
+    parser.add_argument("--n-iter", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name in args.corpus or ["hcl", "servicii"]:
+        embeddings = load_corpus(args.embeddings_dir, name).vectors
+        start = time.perf_counter()
+        index = IVFIndex.build(embeddings, n_lists=args.n_lists, n_iter=args.n_iter, seed=args.seed)
+        path = index_path(args.embeddings_dir, name)
+        index.save(path)
+        sizes = np.diff(index.list_offsets)
+        print(
+            f"{name}: {len(embeddings)} rows, {len(sizes)} lists "
+            f"(min {sizes.min()}, max {sizes.max()}), built in {time.perf_counter() - start:.1f}s -> {path}"
+        )
+
+
+if __name__ == "__main__":
+    main()
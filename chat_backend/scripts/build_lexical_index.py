@@ -0,0 +1,37 @@
+"""
+Build the lexical (BM25 + exact HCL-number) index for one or more corpora.
+
+Usage (from chat_backend/):
+    python -m scripts.build_lexical_index --corpus hcl --corpus servicii
+
+The index is written next to the embedding files as ``<corpus>_lexical_index.npz``
+and is used by the backend when ``RETRIEVAL_MODE=hybrid``.
+"""
+import argparse
+import os
+import time
+
+from app.retrieval.lexical import LexicalIndex, lexical_index_path
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", action="append", default=None, help="corpus name (default: hcl and servicii)")
+    args = parser.parse_args()
+
+    for name in args.corpus or ["hcl", "servicii"]:
+        texts = load_corpus(args.embeddings_dir, name).texts
+        start = time.perf_counter()
+        index = LexicalIndex.build(texts)
+        path = lexical_index_path(args.embeddings_dir, name)
+        index.save(path)
+        print(
+            f"{name}: {len(index)} documents, {len(index.terms)} terms, {len(index.ref_codes)} HCL numbers, "
+            f"built in {time.perf_counter() - start:.1f}s -> {path} ({os.path.getsize(path) / 2**20:.1f}MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Convert the legacy ``<corpus>_embeddings.npy`` / ``<corpus>_texts.npy`` files to
+the memory-mapped corpus store read by the backend.
+
+Usage (from chat_backend/):
+    python -m scripts.convert_corpus --corpus hcl --corpus servicii [--dtype float16] [--quantize int8]
+
+``--quantize`` also writes the float16 and/or int8 copy used for the first-pass
+scan (``VECTOR_QUANTIZATION``); ``--skip-convert`` only (re)writes those copies.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from app.retrieval.index import QUANTIZED_DTYPES
+from app.retrieval.store import EMBEDDINGS_DIR, SUPPORTED_DTYPES, write_corpus, write_quantized
+
+
+def convert(embeddings_dir: str, name: str, dtype: str):
+    start = time.perf_counter()
+    embeddings = np.load(os.path.join(embeddings_dir, f"{name}_embeddings.npy"))
+    texts = np.load(os.path.join(embeddings_dir, f"{name}_texts.npy"), allow_pickle=True)
+    meta = write_corpus(embeddings_dir, name, embeddings, texts, dtype=dtype)
+    print(
+        f"{name}: {meta['count']} x {meta['dim']} {meta['dtype']} vectors, "
+        f"version {meta['version']}, written in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", action="append", default=None, help="corpus name (default: hcl and servicii)")
+    parser.add_argument("--dtype", choices=SUPPORTED_DTYPES, default="float32")
+    parser.add_argument("--quantize", choices=QUANTIZED_DTYPES, nargs="+", default=[])
+    parser.add_argument("--skip-convert", action="store_true", help="only write the quantized copies")
+    args = parser.parse_args()
+
+    for name in args.corpus or ["hcl", "servicii"]:
+        if not args.skip_convert:
+            convert(args.embeddings_dir, name, args.dtype)
+        for dtype in args.quantize:
+            start = time.perf_counter()
+            meta = write_quantized(args.embeddings_dir, name, dtype)
+            print(f"{name}: {meta['dtype']} copy of version {meta['corpus_version']} written in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Fit the linear projection used by the ``distilled`` query encoder.
+
+Usage (from chat_backend/):
+    python -m scripts.fit_query_projection --model intfloat/multilingual-e5-small \
+        --corpus hcl --corpus servicii --output query_projection.npy
+
+A sample of corpus texts is encoded with the small model and a ridge regression
+maps its vectors onto the stored corpus vectors (produced by the full model), so
+no 7B forward pass is needed. The held-out rows report the mean cosine between
+projected and stored vectors and how often the projected vector retrieves its own
+document in the top-k. Serve it with ``EMBEDDING_BACKEND=distilled``,
+``EMBEDDING_DISTILLED_MODEL`` and ``EMBEDDING_PROJECTION_PATH``.
+"""
+import argparse
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from app.retrieval.index import ExactIndex, normalize
+from app.retrieval.store import EMBEDDINGS_DIR, load_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--embeddings-dir", default=EMBEDDINGS_DIR)
+    parser.add_argument("--corpus", action="append", help="corpus to sample (repeatable, default: hcl and servicii)")
+    parser.add_argument("--model", required=True, help="small SentenceTransformer model to project")
+    parser.add_argument("--samples", type=int, default=20000, help="texts sampled per corpus")
+    parser.add_argument("--holdout", type=float, default=0.1)
+    parser.add_argument("--ridge", type=float, default=1e-2)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--output", required=True)
+    args = parser.parse_args()
+
+    model = SentenceTransformer(args.model, trust_remote_code=True).to(args.device)
+    rng = np.random.default_rng(0)
+    inputs, targets, corpora = [], [], []
+    for name in args.corpus or ["hcl", "servicii"]:
+        corpus = load_corpus(args.embeddings_dir, name)
+        rows = np.sort(rng.choice(len(corpus), min(args.samples, len(corpus)), replace=False))
+        print(f"{name}: encoding {len(rows)} of {len(corpus)} texts with {args.model}")
+        texts = [str(corpus.texts[int(i)]) for i in rows]
+        inputs.append(model.encode(texts, convert_to_numpy=True, device=args.device, batch_size=64, show_progress_bar=True))
+        targets.append(np.asarray(corpus.vectors[rows], dtype=np.float32))
+        corpora.append((name, corpus, rows))
+
+    x = normalize(np.concatenate(inputs).astype(np.float32))
+    y = np.concatenate(targets)
+    order = rng.permutation(len(x))
+    n_test = max(1, int(len(x) * args.holdout))
+    test, train = order[:n_test], order[n_test:]
+
+    # Ridge regression: W = (X^T X + lambda I)^-1 X^T Y
+    gram = x[train].T @ x[train] + args.ridge * np.eye(x.shape[1], dtype=np.float32)
+    projection = np.linalg.solve(gram, x[train].T @ y[train]).astype(np.float32)
+    np.save(args.output, projection)
+    print(f"Projection {x.shape[1]} -> {y.shape[1]} written to {args.output}")
+
+    projected = normalize(x[test] @ projection)
+    print(f"Held-out mean cosine with the full-model vectors: {float(np.mean(np.sum(projected * y[test], axis=1))):.3f}")
+
+    # Self-retrieval: does the projected vector find its own document?
+    offset = 0
+    for name, corpus, rows in corpora:
+        in_corpus = test[(test >= offset) & (test < offset + len(rows))]
+        index = ExactIndex(np.asarray(corpus.vectors, dtype=np.float32))
+        hits = sum(int(rows[i - offset]) in index.search(normalize(x[i:i + 1] @ projection)[0], args.k)[0] for i in in_corpus)
+        if len(in_corpus):
+            print(f"{name}: own document in top-{args.k} for {hits / len(in_corpus):.3f} of {len(in_corpus)} held-out texts")
+        offset += len(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Apply the database migrations without starting the backend.
+
+Usage (from chat_backend/):
+    python -m scripts.migrate
+    python -m scripts.migrate --status
+
+The backend applies pending migrations at startup anyway; running them beforehand
+keeps a long data migration (e.g. moving embedded messages to the ``messages``
+collection, migration 5) out of the startup window. ``--status`` only lists the
+applied and pending versions.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.db.database import schema_migrations_collection
+from app.db.migrations import MIGRATIONS, migration_status, run_migrations
+
+
+async def show_status():
+    applied = {doc["_id"]: doc async for doc in schema_migrations_collection.find({})}
+    for migration in MIGRATIONS:
+        doc = applied.get(migration.version)
+        state = f"applied {doc['applied_at']}" if doc else "pending"
+        print(f"{migration.version:>3}  {state:<36} {migration.description}")
+
+
+async def migrate():
+    start = time.perf_counter()
+    await run_migrations()
+    print(json.dumps(migration_status(), indent=2))
+    print(f"Migrations done in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="list the migrations without applying them")
+    args = parser.parse_args()
+    asyncio.run(show_status() if args.status else migrate())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Recompute the materialized admin statistics from the conversations and messages.
+
+Usage (from chat_backend/):
+    python -m scripts.rebuild_stats
+
+The counters in the ``stats`` collection are kept up to date by every write, and
+migration 8 builds them once; run this to backfill after restoring a dump or to
+fix drift (e.g. after writes made outside the backend). Writes that land while the
+rebuild runs may be counted twice or not at all, so prefer a quiet moment.
+"""
+import asyncio
+import time
+
+from app.db.database import rebuild_statistics
+
+
+async def main():
+    start = time.perf_counter()
+    totals = await rebuild_statistics()
+    print(f"Statistics rebuilt in {time.perf_counter() - start:.1f}s")
+    for field, value in totals.items():
+        print(f"{field:>15}: {value}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -52,11 +52,19 @@ function RatingIndicator({ value }: { value: number | null }) {
   );
 }
 
+const QUESTIONS_PAGE_SIZE = 50;
+
 export default function AdminDashboard() {
   const [dashboardData, setDashboardData] = useState<DashboardData | null>(
     null
   );
   const [questions, setQuestions] = useState<QuestionWithFeedback[]>([]);
+  // Cursor of every page up to the current one (null for the first page)
+  const [questionCursors, setQuestionCursors] = useState<(string | null)[]>([null]);
+  const [nextQuestionCursor, setNextQuestionCursor] = useState<string | null>(null);
+  const [questionTotal, setQuestionTotal] = useState(0);
+  const [feedbackFilter, setFeedbackFilter] = useState<"all" | "rated" | "unrated">("all");
+  const [questionsLoading, setQuestionsLoading] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
   const [activeTab, setActiveTab] = useState<
@@ -105,24 +113,31 @@ export default function AdminDashboard() {
     fetchDashboardData();
   }, []);
 
-  // Fetch questions when the "questions" tab is active
+  // Fetch one page of questions when the "questions" tab is active
   useEffect(() => {
     if (activeTab === "questions") {
       const fetchQuestions = async () => {
         try {
-          setLoading(true);
-          const data = await adminApi.getQuestions();
-          setQuestions(data);
-          setLoading(false);
+          setQuestionsLoading(true);
+          const hasFeedback = feedbackFilter === "all" ? undefined : feedbackFilter === "rated";
+          const after = questionCursors[questionCursors.length - 1];
+          const data = await adminApi.getQuestions(after, QUESTIONS_PAGE_SIZE, hasFeedback);
+          setQuestions(data.questions);
+          setQuestionTotal(data.total);
+          setNextQuestionCursor(data.next_cursor);
         } catch (err) {
           console.error("Error fetching questions:", err);
-          setLoading(false);
+        } finally {
+          setQuestionsLoading(false);
         }
       };
 
       fetchQuestions();
     }
-  }, [activeTab]);
+  }, [activeTab, questionCursors, feedbackFilter]);
+
+  const questionPage = questionCursors.length;
+  const questionPageCount = Math.max(1, Math.ceil(questionTotal / QUESTIONS_PAGE_SIZE));
 
   if (loading) {
     return (
@@ -376,11 +391,28 @@ export default function AdminDashboard() {
         {activeTab === "questions" && (
           <div className="questions-tab">
             <h2>Questions and Feedback</h2>
-            <p className="questions-info">
-              Showing {questions.length} question-response pairs. Click "Show More" to expand content.
-            </p>
+            <div className="questions-toolbar">
+              <p className="questions-info">
+                Showing {questions.length} of {questionTotal} question-response pairs. Click "Show More" to expand content.
+              </p>
+              <select
+                value={feedbackFilter}
+                onChange={(e) => {
+                  setFeedbackFilter(e.target.value as "all" | "rated" | "unrated");
+                  setQuestionCursors([null]);
+                }}
+              >
+                <option value="all">All questions</option>
+                <option value="rated">With feedback</option>
+                <option value="unrated">Without feedback</option>
+              </select>
+            </div>
             
-            {questions.length === 0 ? (
+            {questionsLoading ? (
+              <div className="no-questions">
+                <p>Loading questions...</p>
+              </div>
+            ) : questions.length === 0 ? (
               <div className="no-questions">
                 <p>No questions or feedback found.</p>
               </div>
@@ -428,6 +460,24 @@ export default function AdminDashboard() {
                 </table>
               </div>
             )}
+
+            <div className="pagination">
+              <button
+                onClick={() => setQuestionCursors(questionCursors.slice(0, -1))}
+                disabled={questionPage <= 1 || questionsLoading}
+              >
+                Previous
+              </button>
+              <span>
+                Page {questionPage} of {questionPageCount}
+              </span>
+              <button
+                onClick={() => setQuestionCursors([...questionCursors, nextQuestionCursor])}
+                disabled={nextQuestionCursor === null || questionsLoading}
+              >
+                Next
+              </button>
+            </div>
           </div>
         )}
       </div>
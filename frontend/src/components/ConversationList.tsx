@@ -1,9 +1,11 @@
 import "../styles/conversation.css";
-import { Conversation } from "../types";
+import { ConversationSummary } from "../types";
 
 interface ConversationListProps {
-  conversations: Conversation[];
+  conversations: ConversationSummary[];
   activeConversationId: string | null;
+  hasMore: boolean;
+  onLoadMore: () => void;
   onSelectConversation: (conversationId: string) => void;
   onNewConversation: () => void;
 }
@@ -11,6 +13,8 @@ interface ConversationListProps {
 export default function ConversationList({
   conversations,
   activeConversationId,
+  hasMore,
+  onLoadMore,
   onSelectConversation,
   onNewConversation,
 }: ConversationListProps) {
@@ -40,10 +44,8 @@ export default function ConversationList({
             >
               <div className="conversation-title">{conversation.title}</div>
               <div className="conversation-date">
-                {conversation.updatedAt
-                  ? formatDate(typeof conversation.updatedAt === 'string'
-                      ? new Date(conversation.updatedAt)
-                      : conversation.updatedAt)
+                {conversation.updated_at
+                  ? formatDate(new Date(conversation.updated_at))
                   : "No date"}
               </div>
               <div className="conversation-preview">
@@ -52,6 +54,11 @@ export default function ConversationList({
             </div>
           ))
         )}
+        {hasMore && (
+          <button className="load-more-button" onClick={onLoadMore}>
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
@@ -80,13 +87,12 @@ function formatDate(date: Date): string {
 }
 
 // Helper function to get a preview of the conversation
-function getConversationPreview(conversation: Conversation): string {
-  const lastMessage = conversation.messages[conversation.messages.length - 1];
-  if (!lastMessage) return "No messages";
+function getConversationPreview(conversation: ConversationSummary): string {
+  if (conversation.message_count === 0) return "No messages";
 
   // Truncate the message if it's too long
   const maxLength = 30;
-  const content = lastMessage.content;
+  const content = conversation.preview;
 
   if (content.length <= maxLength) {
     return content;
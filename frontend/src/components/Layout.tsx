@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { User, Conversation, Message } from '../types';
+import { User, Conversation, ConversationSummary, Message } from '../types';
 import Login from './Login';
 import Signup from './Signup';
 import Chat from './chat';
@@ -13,13 +13,52 @@ export default function Layout() {
   const [isAuthenticated, setIsAuthenticated] = useState(false);
   const [showSignup, setShowSignup] = useState(false);
   const [user, setUser] = useState<User | null>(null);
-  const [conversations, setConversations] = useState<Conversation[]>([]);
+  const [conversations, setConversations] = useState<ConversationSummary[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
   const [activeConversationId, setActiveConversationId] = useState<string | null>(null);
+  const [activeConversation, setActiveConversation] = useState<Conversation | null>(null);
   const [isMobileMenuOpen, setIsMobileMenuOpen] = useState(false);
   const [isLoading, setIsLoading] = useState(true);
   const [isAdmin, setIsAdmin] = useState(false);
   const [showAdminDashboard, setShowAdminDashboard] = useState(false);
 
+  // Load the first page of conversation summaries
+  const loadConversations = async () => {
+    const page = await conversationApi.getConversations();
+    setConversations(page.conversations);
+    setNextCursor(page.next_cursor);
+    return page.conversations;
+  };
+
+  // Append the next page of conversation summaries
+  const handleLoadMoreConversations = async () => {
+    if (!nextCursor) return;
+    try {
+      const page = await conversationApi.getConversations(nextCursor);
+      setConversations(prev => [...prev, ...page.conversations]);
+      setNextCursor(page.next_cursor);
+    } catch (error) {
+      console.error('Failed to load more conversations:', error);
+    }
+  };
+
+  // Fetch the messages of the selected conversation
+  useEffect(() => {
+    if (!activeConversationId) {
+      setActiveConversation(null);
+      return;
+    }
+    let cancelled = false;
+    conversationApi.getConversation(activeConversationId)
+      .then(conversation => {
+        if (!cancelled) setActiveConversation(conversation);
+      })
+      .catch(error => console.error('Failed to load conversation:', error));
+    return () => {
+      cancelled = true;
+    };
+  }, [activeConversationId]);
+
   // Check authentication status and load user data on mount
   useEffect(() => {
     const checkAuth = async () => {
@@ -34,8 +73,7 @@ export default function Layout() {
           setIsAdmin(adminStatus);
           
           // Load conversations
-          const conversationsData = await conversationApi.getConversations();
-          setConversations(conversationsData);
+          const conversationsData = await loadConversations();
           
           // Set the first conversation as active if there is one
           if (conversationsData.length > 0 && !activeConversationId) {
@@ -62,8 +100,7 @@ export default function Layout() {
       setIsAuthenticated(true);
       
       // Load conversations
-      const conversationsData = await conversationApi.getConversations();
-      setConversations(conversationsData);
+      const conversationsData = await loadConversations();
       
       // Set the first conversation as active if there is one
       if (conversationsData.length > 0) {
@@ -91,6 +128,7 @@ export default function Layout() {
     setIsAuthenticated(false);
     setUser(null);
     setConversations([]);
+    setNextCursor(null);
     setActiveConversationId(null);
   };
 
@@ -98,7 +136,7 @@ export default function Layout() {
   const handleNewConversation = async () => {
     try {
       const newConversation = await conversationApi.createConversation();
-      setConversations([newConversation, ...conversations]);
+      await loadConversations();
       setActiveConversationId(newConversation.id);
       setIsMobileMenuOpen(false); // Close mobile menu when starting new conversation
     } catch (error) {
@@ -112,16 +150,13 @@ export default function Layout() {
     setIsMobileMenuOpen(false); // Close mobile menu when selecting a conversation
   };
 
-  // Handle saving a conversation
+  // Handle a chat turn saved by the server
   const handleSaveConversation = async (messages: Message[]) => {
     if (!activeConversationId) return;
     
     try {
-      await conversationApi.updateConversation(activeConversationId, { messages });
-      
-      // Refresh conversations list
-      const conversationsData = await conversationApi.getConversations();
-      setConversations(conversationsData);
+      // The turn's messages are already stored; only refresh the list (title, preview, order)
+      await loadConversations();
     } catch (error) {
       console.error('Failed to save conversation:', error);
     }
@@ -154,9 +189,6 @@ export default function Layout() {
     return <AdminDashboard />;
   }
 
-  // Get the active conversation
-  const activeConversation = conversations.find(c => c.id === activeConversationId);
-
   return (
     <div className="layout-container">
       {/* Header */}
@@ -194,6 +226,8 @@ export default function Layout() {
           <ConversationList
             conversations={conversations}
             activeConversationId={activeConversationId}
+            hasMore={nextCursor !== null}
+            onLoadMore={handleLoadMoreConversations}
             onSelectConversation={handleSelectConversation}
             onNewConversation={handleNewConversation}
           />
@@ -201,7 +235,7 @@ export default function Layout() {
 
         {/* Chat area */}
         <div className="layout-chat">
-          {activeConversation ? (
+          {activeConversation && activeConversation.id === activeConversationId ? (
             <Chat
               conversationId={activeConversation.id}
               initialMessages={activeConversation.messages}
@@ -49,20 +49,30 @@ export default function Chat({
     setInput("");
     setIsLoading(true);
 
+    const aiMessageId = `${Date.now()}-assistant`;
+
     try {
-      const response = await chatApi.sendMessage(input, conversationId);
-      const aiMessage: Message = {
-        id: `${Date.now()}-assistant`,
-        role: "assistant",
-        content: response.message,
-        feedback: null,
-      };
+      // Render the answer as it streams in
+      const result = await chatApi.streamMessage(input, conversationId, (token) => {
+        setMessages((prev) =>
+          prev.some((msg) => msg.id === aiMessageId)
+            ? prev.map((msg) =>
+                msg.id === aiMessageId ? { ...msg, content: msg.content + token } : msg
+              )
+            : [...prev, { id: aiMessageId, role: "assistant", content: token, feedback: null }]
+        );
+      });
+      // The server stored the turn; use its message IDs so feedback can find them
       setMessages((prev) => {
-         const updatedMessages = [...prev, aiMessage];
+         const saved = prev.map((msg) =>
+           msg.id === userMessage.id ? { ...msg, id: result.user_message_id }
+           : msg.id === aiMessageId ? { ...msg, id: result.message_id }
+           : msg
+         );
          if (onSaveConversation) {
-            onSaveConversation(updatedMessages);
+            onSaveConversation(saved);
          }
-         return updatedMessages;
+         return saved;
       });
     } catch (error) {
       console.error("Error fetching AI response:", error);
@@ -270,7 +280,7 @@ export default function Chat({
           </div>
         ))}
         
-        {isLoading && (
+        {isLoading && messages[messages.length - 1]?.role !== "assistant" && (
           <div className="message assistant-message">
             <div className="message-content">
               <div className="message-role">Assistant</div>
@@ -1,4 +1,4 @@
-import { Conversation, DashboardData, FeedbackStats, User, UserStats, QuestionWithFeedback } from '../types';
+import { Conversation, DashboardData, FeedbackStats, User, UserStats, QuestionPage } from '../types';
 
 // API base URL - using window.location to determine hostname
 const getApiUrl = () => {
@@ -133,13 +133,21 @@ export const adminApi = {
     return handleResponse<DashboardData>(response);
   },
   
-  async getQuestions(): Promise<QuestionWithFeedback[]> {
+  // Get one page of question-response pairs, newest first
+  async getQuestions(after: string | null = null, pageSize: number = 50, hasFeedback?: boolean): Promise<QuestionPage> {
     const token = getToken();
     if (!token) {
       throw new Error('Not authenticated');
     }
     
-    const response = await fetch(`${API_URL}/admin/questions`, {
+    const params = new URLSearchParams({ page_size: String(pageSize) });
+    if (after) {
+      params.append('after', after);
+    }
+    if (hasFeedback !== undefined) {
+      params.append('has_feedback', String(hasFeedback));
+    }
+    const response = await fetch(`${API_URL}/admin/questions?${params}`, {
       method: 'GET',
       headers: {
         'Authorization': `Bearer ${token}`,
@@ -148,7 +156,7 @@ export const adminApi = {
       credentials: 'include',
     });
     
-    return handleResponse<QuestionWithFeedback[]>(response);
+    return handleResponse<QuestionPage>(response);
   },
   // Check if user is admin
   async isAdmin(): Promise<boolean> {
@@ -1,4 +1,4 @@
-import { User, Conversation, Message, Feedback } from '../types';
+import { User, Conversation, ConversationPage, Message, Feedback } from '../types';
 
 // Get the base API URL
 const getBaseUrl = () => {
@@ -106,20 +106,24 @@ export const authApi = {
 
 // Conversation API calls
 export const conversationApi = {
-  // Get all conversations
-  async getConversations(): Promise<Conversation[]> {
+  // Get one page of conversation summaries, most recently updated first
+  async getConversations(cursor?: string | null, limit: number = 50): Promise<ConversationPage> {
     const token = getToken();
     if (!token) {
       throw new Error('Not authenticated');
     }
     
-    const response = await fetch(`${API_BASE_URL}/conversations`, {
+    const params = new URLSearchParams({ limit: String(limit) });
+    if (cursor) {
+      params.append('cursor', cursor);
+    }
+    const response = await fetch(`${API_BASE_URL}/conversations?${params}`, {
       headers: {
         'Authorization': `Bearer ${token}`,
       },
     });
     
-    return handleResponse<Conversation[]>(response);
+    return handleResponse<ConversationPage>(response);
   },
   
   // Get a specific conversation
@@ -214,6 +218,68 @@ export const chatApi = {
     
     return handleResponse<{ message: string, conversation_id: string }>(response);
   },
+
+  // Send a message and receive the answer token by token (Server-Sent Events)
+  async streamMessage(
+    message: string,
+    conversationId: string | undefined,
+    onToken: (token: string) => void
+  ): Promise<{ conversation_id: string, user_message_id: string, message_id: string }> {
+    const token = getToken();
+    if (!token) {
+      throw new Error('Not authenticated');
+    }
+    
+    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+      method: 'POST',
+      headers: {
+        'Authorization': `Bearer ${token}`,
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({ message, conversation_id: conversationId }),
+    });
+    
+    if (!response.ok || !response.body) {
+      await handleResponse(response);
+      throw new Error('Streaming is not supported by this browser');
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let result: { conversation_id: string, user_message_id: string, message_id: string } | null = null;
+    
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      
+      // Events are separated by a blank line
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+        
+        let event = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event: ')) event = line.slice(7);
+          else if (line.startsWith('data: ')) data += line.slice(6);
+        }
+        const payload = data ? JSON.parse(data) : {};
+        
+        if (event === 'token') onToken(payload.content);
+        else if (event === 'error') console.error('Streaming error:', payload.detail);
+        else if (event === 'done') result = payload;
+      }
+    }
+    
+    if (!result) {
+      throw new Error('The response stream ended unexpectedly');
+    }
+    return result;
+  },
 };
 
 // Feedback API calls
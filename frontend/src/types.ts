@@ -21,6 +21,13 @@ export interface QuestionWithFeedback {
   structure_comment: string;
 }
 
+export interface QuestionPage {
+  questions: QuestionWithFeedback[];
+  total: number; // pairs matching the filter, over all pages
+  next_cursor: string | null; // pass as `after` for the next page; null on the last one
+  page_size: number;
+}
+
 export interface Message {
   id: string;
   role: "user" | "assistant";
@@ -37,6 +44,21 @@ export interface Conversation {
   user_id?: string;
 }
 
+// Sidebar entry returned by GET /conversations (no messages)
+export interface ConversationSummary {
+  id: string;
+  title: string;
+  created_at: string;
+  updated_at: string;
+  message_count: number;
+  preview: string;
+}
+
+export interface ConversationPage {
+  conversations: ConversationSummary[];
+  next_cursor: string | null;
+}
+
 export interface User {
   id: string;
   username: string;